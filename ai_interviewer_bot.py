@@ -1,29 +1,42 @@
-import asyncio
 import json
-import websockets
-import speech_recognition as sr
-import pyttsx3
 import threading
 import queue
 import time
 from datetime import datetime
-import wave
-import pyaudio
-import numpy as np
-import random
+from session_records import BotExchange, serialize
+from speech_engines import SpeechEngines
+
+# About 16 seconds of 1024-sample frames at 16 kHz; older audio is dropped once analysis falls behind
+AUDIO_QUEUE_FRAMES = 256
+# Answers waiting for feedback; submit_response blocks once this many are queued
+RESPONSE_QUEUE_SIZE = 32
+
+# Put on a queue to tell its worker to finish what was queued before it and exit
+STOP = object()
 
 class AIInterviewerBot:
-    def __init__(self, room_name, domain="meet.jit.si"):
+    def __init__(self, room_name, domain="meet.jit.si", headless=None,
+                 audio_queue_frames=AUDIO_QUEUE_FRAMES, response_queue_size=RESPONSE_QUEUE_SIZE):
         self.room_name = room_name
         self.domain = domain
         self.websocket = None
         self.is_connected = False
-        self.audio_queue = queue.Queue()
-        self.response_queue = queue.Queue()
+        self.audio_queue = queue.Queue(maxsize=audio_queue_frames)
+        self.response_queue = queue.Queue(maxsize=response_queue_size)
+        
+        # Worker threads of the current connection, stopped and joined by stop_workers()
+        self._workers = {}
+        self._stopping = threading.Event()
         
-        # Initialize speech recognition and synthesis
-        self.recognizer = sr.Recognizer()
-        self.engine = pyttsx3.init()
+        # Queue metrics, reported by queue_stats()
+        self.audio_dropped = 0
+        self.audio_high_water = 0
+        self.responses_blocked = 0
+        self.responses_high_water = 0
+        self.responses_processed = 0
+        
+        # Speech synthesis and the microphone load on first use; headless runs without either
+        self.speech = SpeechEngines(headless)
         
         # Interview state
         self.current_question = None
@@ -31,9 +44,16 @@ class AIInterviewerBot:
         self.is_listening = False
         self.question_index = 0
         
+        # Delivery metrics of the answer being captured, started by its first audio frame. Frames
+        # only count while an answer is open: from the end of a question to the answer's transcript,
+        # so the bot's own speech and the feedback in between are never measured.
+        self.delivery = None
+        self._answer_open = False
+        self._delivery_lock = threading.Lock()
+        
         # Audio settings
         self.CHUNK = 1024
-        self.FORMAT = pyaudio.paFloat32
+        self.FORMAT = "paFloat32"  # PyAudio sample format, looked up when the stream opens
         self.CHANNELS = 1
         self.RATE = 16000
         
@@ -196,18 +216,92 @@ class AIInterviewerBot:
         """Connect to Jitsi Meet room"""
         ws_url = f"wss://{self.domain}/{self.room_name}/ws"
         try:
+            import websockets
             self.websocket = await websockets.connect(ws_url)
             self.is_connected = True
             print(f"Connected to {ws_url}")
             
             # Start audio processing threads
-            threading.Thread(target=self._process_audio, daemon=True).start()
-            threading.Thread(target=self._process_responses, daemon=True).start()
+            self._start_workers()
             
             await self._join_conference()
         except Exception as e:
             print(f"Connection error: {str(e)}")
             
+    def _start_workers(self):
+        """Start the capture, analysis and response workers unless they are already running"""
+        if any(worker.is_alive() for worker in self._workers.values()):
+            return
+        self._stopping.clear()
+        targets = {"responses": self._process_responses}
+        if not self.speech.headless:
+            targets["audio_capture"] = self._process_audio
+            targets["audio_analysis"] = self._analyse_audio
+        # Daemon threads, so a microphone read that never returns cannot keep the process alive
+        self._workers = {name: threading.Thread(target=target, name=f"bot-{name}", daemon=True)
+                         for name, target in targets.items()}
+        for worker in self._workers.values():
+            worker.start()
+            
+    def stop_workers(self, timeout=5.0):
+        """Stop capturing, let the workers finish what is queued, and join them
+
+        Capture stops first so nothing lands behind the audio STOP; each
+        queue's worker then drains it up to its STOP and exits. Returns
+        the names of workers still running after `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        self._stopping.set()
+        capture = self._workers.get("audio_capture")
+        if capture is not None:
+            capture.join(timeout)
+        if "audio_analysis" in self._workers:
+            self._put_audio(STOP)
+        if "responses" in self._workers:
+            try:
+                self.response_queue.put(STOP, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                pass
+        for worker in self._workers.values():
+            worker.join(max(0.0, deadline - time.monotonic()))
+        running = [name for name, worker in self._workers.items() if worker.is_alive()]
+        if running:
+            print(f"Workers still running after {timeout:g}s: {', '.join(running)}")
+        return running
+        
+    def _put_audio(self, data):
+        """Queue a frame, dropping the oldest queued frames while the queue is full"""
+        while True:
+            try:
+                self.audio_queue.put_nowait(data)
+                break
+            except queue.Full:
+                try:
+                    self.audio_queue.get_nowait()
+                    self.audio_dropped += 1
+                except queue.Empty:
+                    pass
+        self.audio_high_water = max(self.audio_high_water, self.audio_queue.qsize())
+        
+    def queue_stats(self):
+        """Depth, capacity and backpressure counters of both queues, and which workers are alive"""
+        return {
+            "audio": {
+                "depth": self.audio_queue.qsize(),
+                "capacity": self.audio_queue.maxsize,
+                "high_water": self.audio_high_water,
+                "dropped": self.audio_dropped
+            },
+            "responses": {
+                "depth": self.response_queue.qsize(),
+                "capacity": self.response_queue.maxsize,
+                "high_water": self.responses_high_water,
+                "blocked": self.responses_blocked,
+                "processed": self.responses_processed
+            },
+            "workers": {name: worker.is_alive() for name, worker in self._workers.items()}
+        }
+            
     async def _join_conference(self):
         """Join the conference and set up bot participant"""
         join_msg = {
@@ -220,33 +314,83 @@ class AIInterviewerBot:
         
     def _process_audio(self):
         """Process incoming audio from the conference"""
-        audio = pyaudio.PyAudio()
-        stream = audio.open(
-            format=self.FORMAT,
-            channels=self.CHANNELS,
-            rate=self.RATE,
-            input=True,
-            frames_per_buffer=self.CHUNK
-        )
+        microphone = self.speech.open_microphone(self.FORMAT, self.CHANNELS, self.RATE, self.CHUNK)
+        if microphone is None:
+            return
+        stream, audio = microphone
         
-        while self.is_connected:
-            if self.is_listening:
-                try:
-                    data = stream.read(self.CHUNK)
-                    self.audio_queue.put(data)
-                except Exception as e:
-                    print(f"Audio processing error: {str(e)}")
-                    
+        while not self._stopping.is_set():
+            if not self.is_listening:
+                self._stopping.wait(0.05)
+                continue
+            try:
+                data = stream.read(self.CHUNK)
+                if self._answer_open:
+                    self._put_audio(data)
+            except Exception as e:
+                print(f"Audio processing error: {str(e)}")
+                
         stream.stop_stream()
         stream.close()
         audio.terminate()
         
+    def _analyse_audio(self):
+        """Fold captured frames into the delivery metrics of the answer in progress"""
+        from speech_analytics import DeliveryAnalyzer
+        
+        while True:
+            data = self.audio_queue.get()
+            if data is STOP:
+                break
+            try:
+                with self._delivery_lock:
+                    # Frames still queued when the answer closed belong to no answer
+                    if not self._answer_open:
+                        continue
+                    if self.delivery is None:
+                        self.delivery = DeliveryAnalyzer(rate=self.RATE)
+                    self.delivery.feed(data)
+            except Exception as e:
+                print(f"Audio analysis error: {str(e)}")
+                
+    def _open_answer(self):
+        """Start measuring a new answer, once its question has been spoken"""
+        with self._delivery_lock:
+            self.delivery = None
+            self._answer_open = True
+            
+    def _finish_delivery(self, transcript):
+        """Close the current answer's delivery metrics, or None if no audio was analysed"""
+        with self._delivery_lock:
+            delivery, self.delivery = self.delivery, None
+            self._answer_open = False
+        return delivery.finish(transcript) if delivery is not None else None
+        
+    def submit_response(self, text, timeout=None):
+        """Queue a candidate answer given as text, the only input in headless mode
+
+        Blocks while the queue is full, raising queue.Full if that lasts
+        longer than `timeout` seconds.
+        """
+        try:
+            self.response_queue.put_nowait(text)
+        except queue.Full:
+            self.responses_blocked += 1
+            self.response_queue.put(text, timeout=timeout)
+        self.responses_high_water = max(self.responses_high_water, self.response_queue.qsize())
+        
     def _process_responses(self):
         """Process candidate responses and generate AI replies"""
-        while self.is_connected:
+        while True:
+            response = self.response_queue.get()
+            if response is STOP:
+                self.response_queue.task_done()
+                break
             try:
-                response = self.response_queue.get()
                 if response:
+                    # The answer is over once its transcript arrives, before any feedback is spoken
+                    delivery = self._finish_delivery(response)
+                    
                     # Generate feedback
                     feedback = self._generate_feedback(response)
                     
@@ -254,17 +398,30 @@ class AIInterviewerBot:
                     self._speak_text(feedback)
                     
                     # Save to interview history
-                    self.interview_history.append({
-                        "timestamp": datetime.now().isoformat(),
-                        "candidate_response": response,
-                        "ai_feedback": feedback
-                    })
+                    self.interview_history.append(BotExchange(response, feedback, delivery=delivery))
                     
                     # Ask next question
                     self._ask_next_question()
             except Exception as e:
                 print(f"Response processing error: {str(e)}")
+            finally:
+                self.responses_processed += 1
+                self.response_queue.task_done()
                 
+    def _wait_for_responses(self, timeout):
+        """Wait until every queued answer has been processed; False if that takes over `timeout` seconds"""
+        worker = self._workers.get("responses")
+        if worker is None or not worker.is_alive():
+            return self.response_queue.empty()
+        deadline = time.monotonic() + timeout
+        with self.response_queue.all_tasks_done:
+            while self.response_queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.response_queue.all_tasks_done.wait(remaining)
+        return True
+        
     def _generate_feedback(self, response):
         """Generate feedback based on response analysis"""
         current_question = self.questions[self.current_type][self.question_index]
@@ -294,8 +451,7 @@ class AIInterviewerBot:
     def _speak_text(self, text):
         """Convert text to speech"""
         try:
-            self.engine.say(text)
-            self.engine.runAndWait()
+            self.speech.speak(text)
         except Exception as e:
             print(f"Text-to-speech error: {str(e)}")
             
@@ -305,6 +461,7 @@ class AIInterviewerBot:
         question = self.questions[self.current_type][self.question_index]["question"]
         self.current_question = question
         self._speak_text(question)
+        self._open_answer()
         
     def start_interview(self, interview_type="Technical"):
         """Start the interview session"""
@@ -318,16 +475,22 @@ class AIInterviewerBot:
         initial_question = "Hello! I'm your AI interviewer today. Could you please introduce yourself and tell me about your background?"
         self.current_question = initial_question
         self._speak_text(initial_question)
+        self._open_answer()
         
-    def stop_interview(self):
-        """Stop the interview session"""
+    def stop_interview(self, drain_timeout=10.0):
+        """Stop the interview session once the answers already given have feedback, and save it"""
         self.is_listening = False
+        if not self._wait_for_responses(drain_timeout):
+            print(f"Saving the interview with {self.response_queue.qsize()} answers still unprocessed")
         self._save_interview_record()
         
     def _save_interview_record(self):
         """Save the interview record to a file"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"interview_record_{timestamp}.json"
+        # Exchanges are only ever appended and never change once added, so a copy of the list taken in
+        # one step is a consistent snapshot even if the response worker appends while this is written
+        history = list(self.interview_history)
         
         try:
             with open(filename, 'w') as f:
@@ -335,14 +498,18 @@ class AIInterviewerBot:
                     "room": self.room_name,
                     "timestamp": timestamp,
                     "type": self.current_type,
-                    "history": self.interview_history
+                    "history": serialize(history)
                 }, f, indent=4)
             print(f"Interview record saved to {filename}")
         except Exception as e:
             print(f"Error saving interview record: {str(e)}")
             
-    async def disconnect(self):
-        """Disconnect from the conference"""
+    async def disconnect(self, timeout=5.0):
+        """Stop and join the worker threads, then disconnect from the conference"""
+        import asyncio
+        
+        self.is_listening = False
+        await asyncio.to_thread(self.stop_workers, timeout)
         if self.websocket:
             try:
                 await self.websocket.close()
@@ -356,6 +523,9 @@ class AIInterviewerBot:
         retry_count = 0
         max_retries = 3
         
+        # asyncio is only needed here, and costs a third of the import time when loaded eagerly
+        import asyncio
+        
         while retry_count < max_retries and not self.is_connected:
             try:
                 print(f"Attempting to reconnect... (Attempt {retry_count + 1}/{max_retries})")
@@ -0,0 +1,682 @@
+import atexit
+import os
+import re
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from itertools import accumulate
+
+from keyword_feedback import tokenize
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    doc_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    type TEXT,
+    answered_at TEXT NOT NULL,
+    question TEXT,
+    response TEXT NOT NULL,
+    indexed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_answers_session ON answers (session_id);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    first_doc INTEGER NOT NULL,
+    last_doc INTEGER NOT NULL,
+    doc_count INTEGER NOT NULL,
+    docs BLOB NOT NULL,
+    positions BLOB NOT NULL,
+    PRIMARY KEY (term, first_doc)
+) WITHOUT ROWID;
+"""
+
+# "quoted phrase", parentheses, or a bare word (possibly -negated or prefix*)
+QUERY_TOKEN = re.compile(r'"([^"]*)"|([()])|(\S+?)(?=[\s()"]|$)')
+
+# Continuation bytes and the final byte of a varint longer than one byte
+MULTI_BYTE_VARINT = re.compile(rb"[\x80-\xff]+[\x00-\x7f]")
+
+# Prefix queries stop expanding after this many distinct terms
+MAX_PREFIX_TERMS = 256
+# Matching document ids are fetched for filtering this many at a time
+FETCH_CHUNK = 500
+SNIPPET_CHARS = 160
+
+
+def encode_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varints(data):
+    """Every varint in data, in order"""
+    if data.isascii():
+        # Every value fits in one byte, which is the common case for dense terms
+        return list(data)
+    # Copy the runs of one-byte values wholesale and assemble only the multi-byte ones
+    values = []
+    start = 0
+    for match in MULTI_BYTE_VARINT.finditer(data):
+        values.extend(data[start:match.start()])
+        value = 0
+        shift = 0
+        for byte in match.group():
+            value |= (byte & 0x7f) << shift
+            shift += 7
+        values.append(value)
+        start = match.end()
+    values.extend(data[start:])
+    return values
+
+
+def encode_postings(postings):
+    """Doc ids and token positions of sorted (doc_id, positions) pairs as two varint-delta blobs"""
+    docs = bytearray()
+    positions = bytearray()
+    previous = 0
+    for doc_id, doc_positions in postings:
+        encode_varint(docs, doc_id - previous)
+        previous = doc_id
+        encode_varint(positions, len(doc_positions))
+        last = 0
+        for position in doc_positions:
+            encode_varint(positions, position - last)
+            last = position
+    return bytes(docs), bytes(positions)
+
+
+def decode_docs(docs):
+    return list(accumulate(decode_varints(docs)))
+
+
+def decode_postings(docs, positions, within=None):
+    """{doc_id: positions} from the blobs written by encode_postings, optionally only for docs in `within`"""
+    doc_ids = decode_docs(docs)
+    values = decode_varints(positions)
+    postings = {}
+    at = 0
+    for doc_id in doc_ids:
+        count = values[at]
+        if within is None or doc_id in within:
+            postings[doc_id] = list(accumulate(values[at + 1:at + 1 + count]))
+        at += 1 + count
+    return postings
+
+
+class Term:
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+
+class Prefix:
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+
+class Phrase:
+    __slots__ = ("terms",)
+
+    def __init__(self, terms):
+        self.terms = terms
+
+
+class Not:
+    __slots__ = ("operand",)
+
+    def __init__(self, operand):
+        self.operand = operand
+
+
+class And:
+    __slots__ = ("operands",)
+
+    def __init__(self, operands):
+        self.operands = operands
+
+
+class Or:
+    __slots__ = ("operands",)
+
+    def __init__(self, operands):
+        self.operands = operands
+
+
+def parse_query(query):
+    """Parse a search query into a tree of And, Or, Not, Phrase, Prefix and Term nodes
+
+    Words are ANDed unless joined by OR; NOT or a leading - excludes a word,
+    phrase or group; "double quotes" match consecutive words; a trailing *
+    matches any word starting with what precedes it; parentheses group.
+    Words are split like the keyword scorer splits answers, so node.js is
+    the phrase "node js".
+    """
+    tokens = []
+    for phrase, paren, word in QUERY_TOKEN.findall(query):
+        if paren:
+            tokens.append(paren)
+        elif word:
+            tokens.append(word)
+        else:
+            tokens.append(Phrase(tokenize(phrase)))
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def parse_or():
+        nonlocal position
+        operands = [parse_and()]
+        while peek() == "OR":
+            position += 1
+            operands.append(parse_and())
+        return operands[0] if len(operands) == 1 else Or(operands)
+
+    def parse_and():
+        nonlocal position
+        operands = []
+        while peek() is not None and peek() not in (")", "OR"):
+            if peek() == "AND":
+                position += 1
+                continue
+            operands.append(parse_unary())
+        if not operands:
+            raise ValueError("Expected a search term")
+        return operands[0] if len(operands) == 1 else And(operands)
+
+    def parse_unary():
+        nonlocal position
+        token = peek()
+        if token == "NOT":
+            position += 1
+            return Not(parse_unary())
+        if isinstance(token, str) and token.startswith("-"):
+            if token == "-":
+                position += 1
+            else:
+                tokens[position] = token[1:]
+            return Not(parse_unary())
+        return parse_primary()
+
+    def parse_primary():
+        nonlocal position
+        token = peek()
+        position += 1
+        if token == "(":
+            node = parse_or()
+            if peek() != ")":
+                raise ValueError("Unbalanced parentheses")
+            position += 1
+            return node
+        if isinstance(token, Phrase):
+            if not token.terms:
+                raise ValueError("Empty phrase")
+            return Term(token.terms[0]) if len(token.terms) == 1 else token
+        if token is None or token == ")":
+            raise ValueError("Expected a search term")
+        if token.endswith("*"):
+            words = tokenize(token[:-1])
+            if len(words) != 1:
+                raise ValueError(f"Invalid prefix: {token}")
+            return Prefix(words[0])
+        words = tokenize(token)
+        if not words:
+            raise ValueError(f"Nothing searchable in: {token}")
+        return Term(words[0]) if len(words) == 1 else Phrase(words)
+
+    node = parse_or()
+    if position < len(tokens):
+        raise ValueError("Unbalanced parentheses")
+    return node
+
+
+def query_terms(node):
+    """The words a query looks for, not counting negated ones, for highlighting"""
+    if isinstance(node, Term):
+        return [node.text]
+    if isinstance(node, Prefix):
+        return [node.text]
+    if isinstance(node, Phrase):
+        return [" ".join(node.terms)]
+    if isinstance(node, (And, Or)):
+        return [term for operand in node.operands for term in query_terms(operand)]
+    return []
+
+
+class AnswerIndex:
+    """Full-text inverted index over candidate answers, updated as answers come in
+
+    Answers are stored once in SQLite and assigned increasing doc ids. Their
+    postings, every doc id and token position of each word, are first held
+    in memory, where this process's searches already see them, and written
+    out by a background thread every `flush_interval` seconds (or sooner
+    after `flush_docs` answers) as one segment row per word. Doc ids and
+    positions are delta-encoded varints, so a posting costs a byte or two.
+    A word whose segment rows pile up past `max_segments` has its smallest
+    rows merged into one. Other processes see an answer after its flush.
+
+    An answer row is marked indexed in the transaction that writes its
+    postings. Rows left unmarked by a process that died before flushing
+    are indexed by recover(), which runs when the flusher starts and
+    before rebuild(); whichever of a flush and a recovery commits first
+    writes an answer's postings, and the other skips it.
+    """
+
+    def __init__(self, path, flush_interval=1.0, flush_docs=256, max_segments=8):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_docs = flush_docs
+        self.max_segments = max_segments
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._pending_docs = 0
+        self._flushing = {}
+        self._wake = threading.Event()
+        self._flusher = None
+        self._counters = {"indexed": 0, "flushes": 0, "merges": 0, "searches": 0}
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    if "indexed" not in {row[1] for row in conn.execute("PRAGMA table_info(answers)")}:
+                        # Answers from before the flag had their postings flushed by the process that added them
+                        try:
+                            conn.execute("ALTER TABLE answers ADD COLUMN indexed INTEGER NOT NULL DEFAULT 1")
+                        except sqlite3.OperationalError as e:
+                            if "duplicate column" not in str(e):
+                                raise
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_unindexed ON answers (doc_id) WHERE indexed = 0")
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def add(self, session_id, interview_type, question, response, answered_at=None):
+        """Index one answer and return its doc id; it is searchable here at once"""
+        positions = term_positions_of(response)
+        conn = self._connect()
+        with conn:
+            # An answer without words has no postings to wait for
+            doc_id = conn.execute(
+                "INSERT INTO answers (session_id, type, answered_at, question, response, indexed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, interview_type, answered_at or datetime.now().isoformat(), question, response,
+                 int(not positions))
+            ).lastrowid
+
+        with self._lock:
+            for term, term_positions in positions.items():
+                self._pending.setdefault(term, []).append((doc_id, term_positions))
+            self._pending_docs += 1
+            self._counters["indexed"] += 1
+            full = self._pending_docs >= self.flush_docs
+        self._start_flusher()
+        if full:
+            self._wake.set()
+        return doc_id
+
+    def _start_flusher(self):
+        if self._flusher is None:
+            with self._lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, daemon=True,
+                                                     name="answer-index-flush")
+                    self._flusher.start()
+                    atexit.register(self.flush)
+
+    def _flush_loop(self):
+        try:
+            self.recover()
+        except Exception as e:
+            print(f"Error recovering unflushed answers: {str(e)}")
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing answer index: {str(e)}")
+
+    def flush(self):
+        """Write the postings held in memory to the database as new segments"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._flushing = self._pending
+                self._pending = {}
+                self._pending_docs = 0
+            try:
+                rows = self._write(self._flushing)
+            except Exception:
+                # Nothing was written; keep the postings searchable and retry them on the next flush
+                with self._lock:
+                    for term, postings in self._flushing.items():
+                        self._pending.setdefault(term, []).extend(postings)
+                    self._flushing = {}
+                raise
+            terms = list(self._flushing)
+            with self._lock:
+                self._flushing = {}
+                self._counters["flushes"] += 1
+            # The postings are committed whatever happens here; a merge that fails is retried
+            # the next time one of its terms is flushed
+            try:
+                self._merge(terms)
+            except Exception as e:
+                print(f"Error merging answer index segments: {str(e)}")
+            return rows
+
+    def _write(self, pending, doc_ids=None):
+        """Write {term: [(doc_id, positions)]} as new segments, skipping docs whose postings are already
+        written, and mark the rest of doc_ids indexed in the same transaction; returns the segment rows written"""
+        if doc_ids is None:
+            doc_ids = {doc_id for postings in pending.values() for doc_id, _ in postings}
+        doc_ids = sorted(doc_ids)
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            claimed = set()
+            for start in range(0, len(doc_ids), FETCH_CHUNK):
+                chunk = doc_ids[start:start + FETCH_CHUNK]
+                claimed.update(doc_id for doc_id, in conn.execute(
+                    f"SELECT doc_id FROM answers WHERE doc_id IN ({','.join('?' * len(chunk))}) AND indexed = 0",
+                    chunk
+                ))
+            rows = []
+            for term, postings in pending.items():
+                postings = sorted(posting for posting in postings if posting[0] in claimed)
+                if postings:
+                    docs, positions = encode_postings(postings)
+                    rows.append((term, postings[0][0], postings[-1][0], len(postings), docs, positions))
+            conn.executemany(
+                "INSERT INTO postings (term, first_doc, last_doc, doc_count, docs, positions) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.executemany("UPDATE answers SET indexed = 1 WHERE doc_id = ?", [(doc_id,) for doc_id in claimed])
+        return len(rows)
+
+    def recover(self):
+        """Index the answers whose postings never reached the database, e.g. because the process that
+        added them died before flushing; returns how many were indexed"""
+        conn = self._connect()
+        recovered = 0
+        after = 0
+        while True:
+            answers = conn.execute(
+                "SELECT doc_id, response FROM answers WHERE indexed = 0 AND doc_id > ? ORDER BY doc_id LIMIT ?",
+                (after, FETCH_CHUNK)
+            ).fetchall()
+            if not answers:
+                return recovered
+            pending = {}
+            for doc_id, response in answers:
+                for term, positions in term_positions_of(response).items():
+                    pending.setdefault(term, []).append((doc_id, positions))
+            if self._write(pending, [doc_id for doc_id, _ in answers]):
+                recovered += len(answers)
+                try:
+                    self._merge(list(pending))
+                except Exception as e:
+                    print(f"Error merging answer index segments: {str(e)}")
+            after = answers[-1][0]
+
+    def _merge(self, terms):
+        """Merge the smallest segments of every term with more than max_segments of them"""
+        conn = self._connect()
+        crowded = []
+        for start in range(0, len(terms), FETCH_CHUNK):
+            chunk = terms[start:start + FETCH_CHUNK]
+            crowded.extend(term for term, in conn.execute(
+                f"SELECT term FROM postings WHERE term IN ({','.join('?' * len(chunk))}) "
+                "GROUP BY term HAVING COUNT(*) > ?",
+                chunk + [self.max_segments]
+            ))
+        for term in crowded:
+            with conn:
+                # Read the segments under the write lock, so two processes never merge the same ones
+                conn.execute("BEGIN IMMEDIATE")
+                count, = conn.execute("SELECT COUNT(*) FROM postings WHERE term = ?", (term,)).fetchone()
+                if count <= self.max_segments:
+                    # Another process merged them first
+                    continue
+                segments = conn.execute(
+                    "SELECT first_doc, docs, positions FROM postings WHERE term = ? ORDER BY doc_count LIMIT ?",
+                    (term, self.max_segments)
+                ).fetchall()
+                merged = {}
+                for _, docs, positions in segments:
+                    merged.update(decode_postings(docs, positions))
+                postings = sorted(merged.items())
+                conn.executemany("DELETE FROM postings WHERE term = ? AND first_doc = ?",
+                                 [(term, first_doc) for first_doc, _, _ in segments])
+                docs, positions = encode_postings(postings)
+                conn.execute(
+                    "INSERT INTO postings (term, first_doc, last_doc, doc_count, docs, positions) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (term, postings[0][0], postings[-1][0], len(postings), docs, positions)
+                )
+            with self._lock:
+                self._counters["merges"] += 1
+
+    def _in_memory(self, term):
+        with self._lock:
+            return self._pending.get(term, []) + self._flushing.get(term, [])
+
+    def _doc_ids(self, term):
+        doc_ids = set()
+        for docs, in self._connect().execute("SELECT docs FROM postings WHERE term = ?", (term,)):
+            doc_ids.update(decode_docs(docs))
+        doc_ids.update(doc_id for doc_id, _ in self._in_memory(term))
+        return doc_ids
+
+    def _positions(self, term, within):
+        postings = {}
+        for docs, positions in self._connect().execute(
+                "SELECT docs, positions FROM postings WHERE term = ?", (term,)):
+            postings.update(decode_postings(docs, positions, within))
+        postings.update((doc_id, positions) for doc_id, positions in self._in_memory(term) if doc_id in within)
+        return postings
+
+    def _prefix_terms(self, prefix):
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        terms = {term for term, in self._connect().execute(
+            "SELECT DISTINCT term FROM postings WHERE term >= ? AND term < ? LIMIT ?",
+            (prefix, upper, MAX_PREFIX_TERMS)
+        )}
+        with self._lock:
+            terms.update(term for term in list(self._pending) + list(self._flushing) if term.startswith(prefix))
+        return sorted(terms)[:MAX_PREFIX_TERMS]
+
+    def _evaluate(self, node):
+        if isinstance(node, Term):
+            return self._doc_ids(node.text)
+        if isinstance(node, Prefix):
+            doc_ids = set()
+            for term in self._prefix_terms(node.text):
+                doc_ids |= self._doc_ids(term)
+            return doc_ids
+        if isinstance(node, Phrase):
+            return self._phrase(node.terms)
+        if isinstance(node, Or):
+            doc_ids = set()
+            for operand in node.operands:
+                doc_ids |= self._evaluate(operand)
+            return doc_ids
+        if isinstance(node, And):
+            included = [operand for operand in node.operands if not isinstance(operand, Not)]
+            excluded = [operand.operand for operand in node.operands if isinstance(operand, Not)]
+        else:
+            included, excluded = [], [node.operand]
+        if not included:
+            raise ValueError("A search needs at least one term that is not excluded")
+        # Cheapest sets first, so a rare word prunes before a phrase check runs
+        included.sort(key=lambda operand: isinstance(operand, Phrase))
+        doc_ids = self._evaluate(included[0])
+        for operand in included[1:]:
+            if not doc_ids:
+                break
+            doc_ids &= self._evaluate(operand)
+        for operand in excluded:
+            if not doc_ids:
+                break
+            doc_ids -= self._evaluate(operand)
+        return doc_ids
+
+    def _phrase(self, terms):
+        # Rarest word first; only documents holding every word have positions compared
+        candidates = None
+        for doc_ids in sorted((self._doc_ids(term) for term in set(terms)), key=len):
+            candidates = doc_ids if candidates is None else candidates & doc_ids
+            if not candidates:
+                return set()
+        positions = {term: self._positions(term, candidates) for term in set(terms)}
+        positions = [positions[term] for term in terms]
+        matches = set()
+        for doc_id in candidates:
+            # Positions where the phrase could start, narrowed by each later word in turn
+            starts = set(positions[0][doc_id])
+            for offset, term_positions in enumerate(positions[1:], 1):
+                starts.intersection_update([position - offset for position in term_positions[doc_id]])
+                if not starts:
+                    break
+            else:
+                matches.add(doc_id)
+        return matches
+
+    def search(self, query, interview_type=None, answered_after=None, answered_before=None,
+               limit=20, cursor=None):
+        """Return one page of answers matching a query, newest first, and the cursor for the next page"""
+        node = parse_query(query)
+        if isinstance(node, Not):
+            raise ValueError("A search needs at least one term that is not excluded")
+        doc_ids = self._evaluate(node)
+        with self._lock:
+            self._counters["searches"] += 1
+        if cursor is not None:
+            try:
+                before = int(cursor)
+            except ValueError:
+                raise ValueError("Invalid cursor")
+            doc_ids = [doc_id for doc_id in doc_ids if doc_id < before]
+        doc_ids = sorted(doc_ids, reverse=True)
+
+        clauses = []
+        params = []
+        if interview_type is not None:
+            clauses.append("type = ?")
+            params.append(interview_type)
+        if answered_after is not None:
+            clauses.append("answered_at >= ?")
+            params.append(answered_after)
+        if answered_before is not None:
+            clauses.append("answered_at < ?")
+            params.append(answered_before)
+        where = "".join(f" AND {clause}" for clause in clauses)
+
+        conn = self._connect()
+        rows = []
+        for start in range(0, len(doc_ids), FETCH_CHUNK):
+            chunk = doc_ids[start:start + FETCH_CHUNK]
+            rows.extend(conn.execute(
+                "SELECT doc_id, session_id, type, answered_at, question, response FROM answers "
+                f"WHERE doc_id IN ({','.join('?' * len(chunk))}){where} ORDER BY doc_id DESC LIMIT ?",
+                chunk + params + [limit + 1 - len(rows)]
+            ).fetchall())
+            if len(rows) > limit:
+                break
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = str(rows[-1][0])
+        highlight = query_terms(node)
+        return [{
+            "doc_id": doc_id,
+            "session_id": session_id,
+            "type": row_type,
+            "answered_at": answered_at,
+            "question": question,
+            "snippet": snippet(response, highlight)
+        } for doc_id, session_id, row_type, answered_at, question, response in rows], next_cursor
+
+    def rebuild(self, record_store):
+        """Index the answers of every interview record whose session is not indexed yet"""
+        conn = self._connect()
+        indexed = self.recover()
+        for key in record_store.keys():
+            try:
+                record = record_store.read(key)
+            except Exception as e:
+                print(f"Skipping record {key}: {str(e)}")
+                continue
+            session_id = record.get("timestamp") or key
+            # Answers already stored are searchable once recover() has run
+            if conn.execute("SELECT 1 FROM answers WHERE session_id = ? LIMIT 1", (session_id,)).fetchone():
+                continue
+            for entry in record.get("history") or []:
+                if isinstance(entry, dict) and entry.get("response"):
+                    self.add(session_id, record.get("type"), entry.get("question"), entry["response"],
+                             answered_at=entry.get("timestamp"))
+                    indexed += 1
+        self.flush()
+        return indexed
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters["pending_docs"] = self._pending_docs
+            counters["pending_terms"] = len(self._pending)
+        return counters
+
+
+def term_positions_of(response):
+    """{term: [token positions]} of an answer"""
+    positions = {}
+    for position, term in enumerate(tokenize(response)):
+        positions.setdefault(term, []).append(position)
+    return positions
+
+
+def snippet(response, terms):
+    """About SNIPPET_CHARS characters of an answer around the first word a query looked for"""
+    collapsed = " ".join(response.split())
+    text = collapsed.lower()
+    at = -1
+    for term in terms:
+        match = re.search(r"\b" + re.escape(term), text)
+        if match and (at < 0 or match.start() < at):
+            at = match.start()
+    start = max(0, at - SNIPPET_CHARS // 3)
+    end = start + SNIPPET_CHARS
+    return ("..." if start else "") + collapsed[start:end] + ("..." if end < len(collapsed) else "")
+
+
+if __name__ == "__main__":
+    # python answer_index.py rebuild [index_path]
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print("Usage: python answer_index.py rebuild [index_path]")
+        sys.exit(1)
+    import session_storage
+    sessions_dir = os.environ.get("SESSIONS_DIR", "sessions")
+    path = sys.argv[2] if len(sys.argv) > 2 else os.environ.get("ANSWER_INDEX_PATH", os.path.join(sessions_dir, "answers.db"))
+    indexed = AnswerIndex(path).rebuild(session_storage.records_store_from_environment())
+    print(f"Indexed {indexed} answers into {path}")
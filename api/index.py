@@ -1,27 +1,34 @@
-import json
+import os
+import sys
 
-def handler(request, context):
-    """
-    Simple serverless function handler
-    """
-    if request.method == "GET":
-        return {
-            "statusCode": 200,
-            "headers": {
-                "Content-Type": "application/json"
-            },
-            "body": json.dumps({"message": "API is online"})
-        }
-    elif request.method == "POST":
-        try:
-            body = json.loads(request.body)
-        except:
-            body = {}
-            
-        return {
-            "statusCode": 200,
-            "headers": {
-                "Content-Type": "application/json"
-            },
-            "body": json.dumps({"status": "success", "message": "Received data"})
-        } 
\ No newline at end of file
+# server.py lives in the repository root, one level up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Only /tmp is writable on Vercel, and the frontend is served as static files
+os.environ.setdefault('SESSIONS_DIR', '/tmp/sessions')
+os.environ.setdefault('PRELOAD_STATIC_ASSETS', '0')
+
+# The Flask app from server.py, imported on the first request and then
+# reused, with its question bank, catalog connection and broker, for every
+# warm invocation of this container.
+#
+# Only that reuse is shared: live interview sessions stay in the memory of
+# the container that started them, and the stores under /tmp are per
+# container too. A submit routed to another instance than start_interview
+# fails with "No active interview session", so interviews only work while
+# one warm container serves them; run server.py under gunicorn for anything
+# beyond that.
+_server_app = None
+
+def get_server_app():
+    """Import server.py once per container"""
+    global _server_app
+    if _server_app is None:
+        os.makedirs(os.environ['SESSIONS_DIR'], exist_ok=True)
+        from server import app as server_app
+        _server_app = server_app
+    return _server_app
+
+def app(environ, start_response):
+    """WSGI entry point that Vercel invokes for /api/* routes"""
+    return get_server_app()(environ, start_response)
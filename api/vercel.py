@@ -1,12 +1,9 @@
-from flask import Flask, request, jsonify
+import os
+import sys
 
-app = Flask(__name__)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-@app.route('/', methods=['GET'])
-def index():
-    return jsonify({"message": "API is online"})
+# Same lazily imported interview API as api/index.py, re-exported for runtimes that load this module
+from index import app
 
-@app.route('/', methods=['POST'])
-def handle_request():
-    data = request.json
-    return jsonify({"status": "success", "message": "Received data"}) 
\ No newline at end of file
+__all__ = ['app']
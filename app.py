@@ -1,22 +1,32 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
 import json
+import sys
 from datetime import datetime
-import speech_recognition as sr
-import pyttsx3
-import threading
-import os
-from dotenv import load_dotenv
-import openai
-from PIL import Image, ImageTk
+from functools import lru_cache
 import threading
 import queue
+from keyword_feedback import generate_feedback, template_question
+from prompt_templates import builder_from_environment
+from speech_engines import SpeechEngines
+
+# Load environment variables from .env when python-dotenv is installed
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+prompt_builder = builder_from_environment()
 
-# Load environment variables
-load_dotenv()
+@lru_cache(maxsize=None)
+def feedback_gateway():
+    """Model feedback goes through the gateway, which falls back to keyword scoring when the model is slow or down
 
-# Initialize OpenAI
-openai.api_key = os.getenv('OPENAI_API_KEY')
+    Built on the first answer, so the window does not wait on the HTTP client imports.
+    """
+    from llm_gateway import gateway_from_environment
+    return gateway_from_environment()
 
 # Pre-defined questions for different interview types
 INTERVIEW_QUESTIONS = {
@@ -65,15 +75,14 @@ INTERVIEW_QUESTIONS = {
 }
 
 class MockInterviewApp:
-    def __init__(self, root):
+    def __init__(self, root, headless=None):
         self.root = root
         self.root.title("PrepMate")
         self.root.geometry("1000x800")
         self.root.configure(bg='#f0f0f0')
         
-        # Initialize speech recognition and text-to-speech
-        self.recognizer = sr.Recognizer()
-        self.engine = pyttsx3.init()
+        # Speech recognition and text-to-speech load on first use; headless runs without either
+        self.speech = SpeechEngines(headless)
         self.is_listening = False
         self.audio_queue = queue.Queue()
         
@@ -138,6 +147,10 @@ class MockInterviewApp:
                                      command=self.speak_question)
         self.speak_button.pack(side=tk.LEFT, padx=5)
         
+        if self.speech.headless:
+            self.mic_button.configure(state='disabled')
+            self.speak_button.configure(state='disabled')
+        
         # Response text area
         self.response_text = scrolledtext.ScrolledText(response_frame, height=8, 
                                                      font=('Helvetica', 10))
@@ -166,12 +179,24 @@ class MockInterviewApp:
             self.mic_button.configure(text="🎤 Start Recording")
     
     def record_audio(self):
-        with sr.Microphone() as source:
-            self.recognizer.adjust_for_ambient_noise(source)
+        recognition = self.speech.recognition()
+        microphone = None
+        if recognition is not None:
+            sr, recognizer = recognition
+            try:
+                microphone = sr.Microphone()
+            except Exception as e:
+                print(f"Error opening microphone: {str(e)}")
+        if microphone is None:
+            self.is_listening = False
+            self.root.after(0, self.disable_voice_controls)
+            return
+        with microphone as source:
+            recognizer.adjust_for_ambient_noise(source)
             while self.is_listening:
                 try:
-                    audio = self.recognizer.listen(source, timeout=1)
-                    text = self.recognizer.recognize_google(audio)
+                    audio = recognizer.listen(source, timeout=1)
+                    text = recognizer.recognize_google(audio)
                     current_text = self.response_text.get('1.0', tk.END).strip()
                     self.response_text.delete('1.0', tk.END)
                     self.response_text.insert('1.0', f"{current_text} {text}")
@@ -187,32 +212,21 @@ class MockInterviewApp:
                           daemon=True).start()
     
     def _speak_text(self, text):
-        self.engine.say(text)
-        self.engine.runAndWait()
+        self.speech.speak(text)
+        if self.speech.headless:
+            self.root.after(0, self.disable_voice_controls)
+    
+    def disable_voice_controls(self):
+        self.mic_button.configure(text="🎤 Start Recording", state='disabled')
+        self.speak_button.configure(state='disabled')
     
     def get_ai_feedback(self, response, question_data):
-        try:
-            prompt = f"""
-            Question: {question_data['question']}
-            Response: {response}
-            Key points to consider: {question_data['feedback_template']}
-            
-            Please provide detailed feedback on this interview response, considering:
-            1. Content relevance and completeness
-            2. Structure and clarity
-            3. Specific improvements needed
-            4. Positive aspects of the response
-            """
-            
-            completion = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=500
-            )
-            
-            return completion.choices[0].message.content
-        except Exception as e:
-            return f"Error generating AI feedback: {str(e)}\n\nGeneral feedback:\n{question_data['feedback_template']}"
+        prompt = prompt_builder.feedback_prompt(question_data['question'], response,
+                                                question_data['feedback_template'])
+        return feedback_gateway().feedback(
+            prompt,
+            lambda: generate_feedback(response, template_question(question_data))
+        )
     
     def start_interview(self):
         self.interview_type = self.type_var.get()
@@ -282,7 +296,7 @@ class MockInterviewApp:
 
 def main():
     root = tk.Tk()
-    app = MockInterviewApp(root)
+    app = MockInterviewApp(root, headless=True if "--headless" in sys.argv[1:] else None)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,108 @@
+"""Indexing throughput and query latency of the answer search index
+
+Run from the repository root:
+
+    python benchmarks/bench_answer_index.py [--answers 100000] [--words 60] [--runs 20]
+
+Indexes --answers synthetic answers of about --words words drawn from a
+Zipf-distributed vocabulary with a few interview keywords sprinkled in,
+so common words have long posting lists and keywords realistic ones.
+Reports answers indexed per second, the index size against the raw text,
+and the median and worst latency of common, rare, phrase, boolean and
+prefix queries, with and without type and date filters.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from answer_index import AnswerIndex, parse_query
+
+TYPES = ("Technical", "Behavioral", "System Design")
+KEYWORDS = ("encapsulation", "inheritance", "polymorphism", "abstraction", "hash table", "binary search",
+            "load balancer", "cache", "sharding", "replication", "certificate", "certificates",
+            "certification", "deadline", "stakeholder", "conflict", "ownership", "latency")
+
+QUERIES = (
+    ("common word", "the"),
+    ("keyword", "polymorphism"),
+    ("two keywords", "encapsulation inheritance"),
+    ("phrase", '"hash table"'),
+    ("boolean", "(polymorphism OR inheritance) -encapsulation"),
+    ("prefix", "certif*"),
+)
+
+
+def vocabulary(size, rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    common = ["the", "a", "and", "to", "of", "i", "we", "it", "is", "that"]
+    words = set(common)
+    while len(words) < size:
+        words.add("".join(rng.choices(letters, k=rng.randint(3, 10))))
+    return common + sorted(words - set(common))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--answers", type=int, default=100000)
+    parser.add_argument("--words", type=int, default=60)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    words = vocabulary(args.vocabulary, rng)
+    cumulative = list(accumulate(1 / (rank + 1) for rank in range(len(words))))
+    responses = []
+    for _ in range(args.answers):
+        text = rng.choices(words, cum_weights=cumulative, k=args.words)
+        for _ in range(rng.randint(0, 3)):
+            text.insert(rng.randrange(len(text) + 1), rng.choice(KEYWORDS))
+        responses.append(" ".join(text))
+    raw_bytes = sum(len(response.encode()) for response in responses)
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_answer_index_"), "answers.db")
+    index = AnswerIndex(path, flush_interval=3600, flush_docs=args.answers + 1)
+    started_day = datetime(2026, 1, 1)
+    indexing = time.perf_counter()
+    for i, response in enumerate(responses):
+        answered_at = (started_day + timedelta(minutes=i)).isoformat()
+        index.add(f"s{i // 10}", TYPES[(i // 10) % len(TYPES)], "question", response, answered_at=answered_at)
+        if (i + 1) % 1000 == 0:
+            index.flush()
+    index.flush()
+    indexing = time.perf_counter() - indexing
+
+    conn = index._connect()
+    postings_bytes = conn.execute("SELECT SUM(LENGTH(docs) + LENGTH(positions)) FROM postings").fetchone()[0]
+    segments, terms = conn.execute("SELECT COUNT(*), COUNT(DISTINCT term) FROM postings").fetchone()
+    print(f"indexed {args.answers} answers ({raw_bytes / 1e6:.1f} MB of text) in {indexing:.1f} s: "
+          f"{args.answers / indexing:,.0f} answers/s, flushing every 1000")
+    print(f"postings {postings_bytes / 1e6:.1f} MB ({postings_bytes / raw_bytes * 100:.0f}% of the text) in "
+          f"{segments} segments for {terms} words; database file {os.path.getsize(path) / 1e6:.1f} MB")
+
+    middle = (started_day + timedelta(minutes=args.answers // 2)).isoformat()
+    filters = (("", {}), ("type", {"interview_type": TYPES[0]}),
+               ("type+date", {"interview_type": TYPES[0], "answered_after": middle}))
+    print(f"{'query':14} {'filter':10} {'matches':>8} {'p50 ms':>8} {'max ms':>8}")
+    for label, query in QUERIES:
+        matches = len(index._evaluate(parse_query(query)))
+        for filter_label, kwargs in filters:
+            timings = []
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                index.search(query, limit=20, **kwargs)
+                timings.append((time.perf_counter() - started) * 1000)
+            print(f"{label:14} {filter_label:10} {matches:>8} {statistics.median(timings):>8.2f} {max(timings):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Space and coverage-query cost of device telemetry, against one JSON object per event
+
+Run from the repository root:
+
+    python benchmarks/bench_device_telemetry.py [--sessions 1000] [--hours 1] [--queries 10000]
+
+Simulates --sessions interviews of --hours each in which the camera,
+microphone and tab focus flip on and off every few seconds to minutes,
+plus bursts of flicker, and records every reported state (including the
+repeats clients send) into a TelemetryStore. Compares the bytes held per
+session with storing each event as a JSON object, as violations are
+stored, then times coverage queries over random ranges. A final session
+running for --long-hours with a flip every second shows downsampling.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from device_telemetry import DEVICES, DeviceTimeline, TelemetryStore
+
+
+def events(rng, start, seconds):
+    """(time, device, state) reports for one session, in time order"""
+    reports = []
+    for device in DEVICES:
+        at = start
+        state = True
+        while at < start + seconds:
+            reports.append((at, device, state))
+            if rng.random() < 0.05:
+                # A burst of flicker: a loose cable or a candidate alt-tabbing quickly
+                for _ in range(rng.randint(5, 30)):
+                    at += rng.uniform(0.05, 0.5)
+                    state = not state
+                    reports.append((at, device, state))
+            at += rng.expovariate(1 / 45)
+            # Clients also re-send the state they are already in
+            state = state if rng.random() < 0.3 else not state
+    return sorted(reports)
+
+
+def timeline_bytes(timeline):
+    return sum(sys.getsizeof(values) for values in (timeline.starts, timeline.on_before, timeline.states)) + \
+        sys.getsizeof(timeline)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--hours", type=float, default=1)
+    parser.add_argument("--queries", type=int, default=10000)
+    parser.add_argument("--long-hours", type=float, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(4)
+    store = TelemetryStore()
+    seconds = args.hours * 3600
+    started = 1_800_000_000.0
+    reports = 0
+    json_bytes = 0
+    for session in range(args.sessions):
+        session_id = f"s{session}"
+        for at, device, state in events(rng, started, seconds):
+            store.record(session_id, device, state, at=at)
+            reports += 1
+            json_bytes += len(json.dumps({"type": f"{device}_{'on' if state else 'off'}",
+                                          "timestamp": datetime.fromtimestamp(at).isoformat()}))
+
+    timelines = [timeline for timelines in store._sessions.values() for timeline in timelines.values()]
+    intervals = sum(len(timeline) for timeline in timelines)
+    array_bytes = sum(timeline_bytes(timeline) for timeline in timelines)
+    snapshot_bytes = sum(len(json.dumps(store.snapshot(session_id))) for session_id in store._sessions)
+    print(f"{args.sessions} sessions x {args.hours:g} h: {reports / args.sessions:.0f} reports and "
+          f"{intervals / args.sessions:.0f} intervals per session")
+    print(f"bytes per session: JSON object per event {json_bytes / args.sessions:,.0f} (text alone), "
+          f"timeline arrays in memory {array_bytes / args.sessions:,.0f}, "
+          f"saved snapshot {snapshot_bytes / args.sessions:,.0f}")
+
+    end = started + seconds
+    timings = []
+    for _ in range(args.queries):
+        timeline = rng.choice(timelines)
+        low, high = sorted(rng.uniform(started, end) for _ in range(2))
+        query_started = time.perf_counter()
+        timeline.coverage(low, high, now=end)
+        timings.append((time.perf_counter() - query_started) * 1e6)
+    print(f"coverage over a random range: p50 {statistics.median(timings):.1f} us, "
+          f"p99 {sorted(timings)[int(len(timings) * 0.99)]:.1f} us")
+
+    long_timeline = DeviceTimeline()
+    long_seconds = args.long_hours * 3600
+    record_started = time.perf_counter()
+    for second in range(int(long_seconds)):
+        long_timeline.record(started + second + rng.uniform(0, 0.5), rng.random() < 0.8)
+    record_time = time.perf_counter() - record_started
+    on, observed = long_timeline.coverage(now=started + long_seconds)
+    print(f"{args.long_hours:g} h session flipping up to once a second: {len(long_timeline)} intervals at "
+          f"{long_timeline.resolution:g} s resolution, {timeline_bytes(long_timeline):,} bytes, "
+          f"{record_time / long_seconds * 1e6:.1f} us per report, coverage {on / observed:.3f} (exact to the "
+          f"kept boundaries)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Backend load and feedback latency with and without micro-batching
+
+Run from the repository root:
+
+    python benchmarks/bench_feedback_batcher.py [--answers 300] [--seconds 2] [--windows 10,20,50]
+
+Simulates a peak where --answers candidates submit within --seconds of
+each other, against benchmarks/mock_llm_server.py with a fixed cost per
+call plus a cost per answer generated. Every configuration shares one
+gateway setting (max in flight, deadline), so "unbatched" is the gateway
+on its own. Prompt tokens are estimated as characters / 4, per answer
+that reached the model.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from feedback_batcher import FeedbackBatcher
+from llm_gateway import LLMGateway
+from mock_llm_server import start_mock_server
+
+QUESTIONS = [
+    (f"Question {i}: explain a design trade-off you made in project {i}.",
+     "scalability, consistency, cost, operability")
+    for i in range(12)
+]
+ANSWER = ("I chose eventual consistency for the feed so writes stayed cheap, accepted a short "
+          "staleness window, and added a read-repair path for the cases users would notice. ")
+
+
+def run(server, url, answers, seconds, window, max_in_flight, slo):
+    gateway = LLMGateway(base_url=url, max_in_flight=max_in_flight, timeout=slo)
+    batcher = FeedbackBatcher(gateway, window=window)
+    random.seed(7)
+    arrivals = sorted(random.uniform(0, seconds) for _ in range(answers))
+    before_requests, before_chars = server.requests, server.prompt_chars
+
+    def submit(_):
+        question, key_points = random.choice(QUESTIONS)
+        used_fallback = []
+
+        def fallback():
+            used_fallback.append(True)
+            return "keyword feedback"
+
+        started = time.perf_counter()
+        batcher.feedback(question, ANSWER, key_points, fallback)
+        return time.perf_counter() - started, not used_fallback
+
+    with ThreadPoolExecutor(answers) as pool:
+        started = time.perf_counter()
+        futures = []
+        for at in arrivals:
+            delay = started + at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(submit, None))
+        results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    backend_requests = server.requests - before_requests
+    # Answers that reached the model; unbatched calls carry one answer each
+    answers_sent = batcher.stats()["answers"] if window > 0 else backend_requests
+    return {
+        "backend_requests": backend_requests,
+        "backend_rps": backend_requests / elapsed,
+        "tokens_per_answer": (server.prompt_chars - before_chars) / 4 / max(1, answers_sent),
+        "model": sum(1 for _, from_model in results if from_model) / answers,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--answers", type=int, default=300)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--windows", default="10,20,50", help="batch windows to try, in milliseconds")
+    parser.add_argument("--max-in-flight", type=int, default=16)
+    parser.add_argument("--slo", type=float, default=3.0)
+    parser.add_argument("--latency-ms", type=float, default=400, help="mock cost per backend call")
+    parser.add_argument("--per-answer-ms", type=float, default=25, help="mock cost per answer in a call")
+    args = parser.parse_args()
+
+    server, url = start_mock_server(latency_ms=args.latency_ms, per_answer_ms=args.per_answer_ms)
+    print(f"{args.answers} answers over {args.seconds:.1f} s; gateway max in flight {args.max_in_flight}, "
+          f"deadline {args.slo:.1f} s")
+    print(f"{'window':10} {'backend reqs':>12} {'backend rps':>11} {'tokens/answer':>13} {'model %':>8} "
+          f"{'p50 s':>7} {'p95 s':>7}")
+    for window_ms in [0] + [float(w) for w in args.windows.split(",")]:
+        row = run(server, url, args.answers, args.seconds, window_ms / 1000, args.max_in_flight, args.slo)
+        label = "unbatched" if window_ms == 0 else f"{window_ms:g} ms"
+        print(f"{label:10} {row['backend_requests']:>12} {row['backend_rps']:>11.1f} {row['tokens_per_answer']:>13.0f} "
+              f"{row['model'] * 100:>7.0f}% {row['p50']:>7.3f} {row['p95']:>7.3f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Answer submission latency with grading inline versus in the grading worker pool
+
+Run from the repository root:
+
+    python benchmarks/bench_grading_queue.py [--rate 30] [--seconds 5] [--costs 50,400,1500]
+
+Grading cost is the latency of benchmarks/mock_llm_server.py with model
+feedback on. Answers arrive at a steady --rate and are served by
+--web-threads request threads, as a threaded web worker would serve them.
+"Inline" grades inside submit_response, as the server does by default.
+"Queued" runs with GRADING_QUEUE=1 next to `grading_queue.py worker`, and
+also reports how long feedback takes to reach the session's event stream.
+Latencies are measured from each answer's arrival, so time spent waiting
+for a free request thread counts.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+ANSWER = "Encapsulation keeps state private, and inheritance lets classes share behaviour."
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else float("nan")
+
+
+def child(args):
+    """One configuration, in its own interpreter since the server reads its settings at import"""
+    os.chdir(ROOT)
+    import server
+    from werkzeug.test import Client
+
+    client = Client(server.app)
+    sessions = [json.loads(client.post('/api/start_interview', json={'type': 'Technical'}).get_data())["session_id"]
+                for _ in range(args.candidates)]
+    arrived = {}
+    feedback_at = {}
+    done = threading.Event()
+    calls = int(args.rate * args.seconds)
+
+    def listen(session_id):
+        subscription = server.event_broker.subscribe(server.session_channel(session_id))
+        while not done.is_set():
+            event = subscription.get(timeout=0.2)
+            if event is not None and event["type"] == "feedback" and "grading_job" in event:
+                feedback_at[event["grading_job"]] = time.perf_counter()
+
+    listeners = [threading.Thread(target=listen, args=(session_id,), daemon=True) for session_id in sessions]
+    for listener in listeners:
+        listener.start()
+
+    def submit(i, arrival):
+        response = client.post('/api/submit_response',
+                               json={'session_id': sessions[i % len(sessions)], 'response': ANSWER})
+        finished = time.perf_counter()
+        job = json.loads(response.get_data()).get("grading_job")
+        if job is not None:
+            arrived[job] = arrival
+        return finished - arrival
+
+    with ThreadPoolExecutor(args.web_threads) as pool:
+        started = time.perf_counter()
+        futures = []
+        for i in range(calls):
+            arrival = started + i / args.rate
+            delay = arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(submit, i, arrival))
+        submit_latencies = [future.result() for future in futures]
+
+    deadline = time.perf_counter() + 30
+    while len(feedback_at) < len(arrived) and time.perf_counter() < deadline:
+        time.sleep(0.05)
+    done.set()
+    feedback_latencies = [feedback_at[job] - arrival for job, arrival in arrived.items() if job in feedback_at]
+    if not arrived:
+        feedback_latencies = submit_latencies
+    print(json.dumps({
+        "submit_p50": statistics.median(submit_latencies),
+        "submit_p99": percentile(submit_latencies, 0.99),
+        "feedback_p50": percentile(feedback_latencies, 0.5),
+        "feedback_p99": percentile(feedback_latencies, 0.99),
+        "feedback_count": len(feedback_latencies),
+        "calls": calls
+    }))
+
+
+def run(mode, url, cost_args, args):
+    workdir = tempfile.mkdtemp(prefix="bench_grading_")
+    env = dict(os.environ, SESSIONS_DIR=workdir, RATE_LIMIT_ENABLED="0", PRELOAD_STATIC_ASSETS="0",
+               LLM_FEEDBACK="1", LLM_BASE_URL=url, LLM_BATCH_WINDOW_MS="0", LLM_TIMEOUT="10",
+               LLM_MAX_IN_FLIGHT="64", GRADING_QUEUE="1" if mode == "queued" else "0")
+    workers = None
+    if mode == "queued":
+        workers = subprocess.Popen([sys.executable, os.path.join(ROOT, "grading_queue.py"), "worker",
+                                    "--processes", str(args.processes), "--threads", str(args.worker_threads),
+                                    "--poll-interval", "0.05"],
+                                   cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+    try:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"] + cost_args,
+                                cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    finally:
+        if workers is not None:
+            workers.terminate()
+            workers.wait()
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=30, help="answers per second")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--costs", default="50,400,1500", help="grading costs to try, in milliseconds")
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--web-threads", type=int, default=8)
+    parser.add_argument("--processes", type=int, default=2, help="grading worker processes")
+    parser.add_argument("--worker-threads", type=int, default=32, help="jobs per worker process at once")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    shared = ["--rate", str(args.rate), "--seconds", str(args.seconds), "--candidates", str(args.candidates),
+              "--web-threads", str(args.web_threads)]
+    if args.child:
+        child(args)
+        return
+
+    from mock_llm_server import start_mock_server
+
+    print(f"{args.rate:g} answers/s for {args.seconds:g} s on {args.web_threads} request threads; "
+          f"{args.processes} grading processes x {args.worker_threads} threads")
+    print(f"{'grading':>8} {'mode':7} {'submit p50':>10} {'submit p99':>10} {'feedback p50':>12} {'feedback p99':>12}")
+    for cost in [float(c) for c in args.costs.split(",")]:
+        server, url = start_mock_server(latency_ms=cost)
+        for mode in ("inline", "queued"):
+            row = run(mode, url, shared, args)
+            print(f"{cost:>6g}ms {mode:7} {row['submit_p50'] * 1000:>8.1f}ms {row['submit_p99'] * 1000:>8.1f}ms "
+                  f"{row['feedback_p50'] * 1000:>10.1f}ms {row['feedback_p99'] * 1000:>10.1f}ms")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
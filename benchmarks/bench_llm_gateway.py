@@ -0,0 +1,134 @@
+"""Feedback latency through the LLM gateway versus direct calls, under injected faults
+
+Run from the repository root:
+
+    python benchmarks/bench_llm_gateway.py [--rate 40] [--phase-seconds 4] [--slo 1.0]
+
+Both clients talk to benchmarks/mock_llm_server.py. "Direct" opens a new
+connection per call and waits up to --direct-timeout seconds, the way the
+desktop app called the SDK. The gateway pools connections and answers
+with the keyword scorer once --slo seconds have passed. Phases run in
+order, so the breaker state carries over between them as it would in
+production. Calls arrive at a steady --rate, as answers from many
+candidates would, rather than in one burst.
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from keyword_feedback import generate_feedback
+from llm_gateway import CircuitBreaker, LLMGateway
+from mock_llm_server import DEFAULT_FAULTS, start_mock_server
+from prompt_templates import LEGACY_PROMPT, PromptBuilder
+
+PHASES = [
+    ("healthy", {"latency_ms": 150, "jitter_ms": 100}),
+    ("slow", {"latency_ms": 3000, "jitter_ms": 500}),
+    ("flaky", {"latency_ms": 150, "jitter_ms": 100, "error_rate": 0.3}),
+    ("hanging", {"latency_ms": 150, "jitter_ms": 100, "hang_rate": 0.2}),
+    ("down", {"down": True}),
+    ("recovered", {"latency_ms": 150, "jitter_ms": 100}),
+]
+
+QUESTION = {
+    "question": "Explain the concept of object-oriented programming and its main principles.",
+    "keywords": ["encapsulation", "inheritance", "polymorphism", "abstraction"],
+    "follow_up": "How would you apply these principles in a real project?"
+}
+ANSWER = "Objects bundle state and behaviour; inheritance lets classes share code."
+
+
+def direct_call(url, timeout):
+    host, port = url.split("//")[1].split(":")
+    connection = http.client.HTTPConnection(host, int(port), timeout=timeout)
+    body = json.dumps({"model": "gpt-3.5-turbo", "max_tokens": 500,
+                       "messages": [{"role": "user", "content": LEGACY_PROMPT.format(
+                           question=QUESTION["question"], response=ANSWER, key_points="")}]})
+    try:
+        connection.request("POST", "/v1/chat/completions", body=body, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        response.read()
+        return response.status == 200
+    except OSError:
+        return False
+    finally:
+        connection.close()
+
+
+def run_phase(call, rate, seconds):
+    def timed():
+        started = time.perf_counter()
+        from_model = call()
+        return time.perf_counter() - started, from_model
+
+    # Open loop: arrivals do not wait for earlier calls, so a slow backend builds a backlog
+    calls = int(rate * seconds)
+    with ThreadPoolExecutor(calls) as pool:
+        started = time.perf_counter()
+        futures = []
+        for i in range(calls):
+            delay = started + i / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(timed))
+        results = [future.result() for future in futures]
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        "p50": statistics.median(latencies),
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "max": latencies[-1],
+        "model": sum(1 for _, from_model in results if from_model) / len(results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=40, help="feedback calls per second")
+    parser.add_argument("--phase-seconds", type=float, default=4)
+    parser.add_argument("--max-in-flight", type=int, default=16)
+    parser.add_argument("--slo", type=float, default=1.0, help="gateway feedback deadline in seconds")
+    parser.add_argument("--direct-timeout", type=float, default=10.0)
+    args = parser.parse_args()
+
+    server, url = start_mock_server()
+    gateway = LLMGateway(base_url=url, max_in_flight=args.max_in_flight, timeout=args.slo,
+                         breaker=CircuitBreaker(failure_threshold=5, reset_timeout=2.0))
+    prompts = PromptBuilder()
+    fallback_marker = threading.local()
+
+    def gateway_call():
+        fallback_marker.used = False
+
+        def fallback():
+            fallback_marker.used = True
+            return generate_feedback(ANSWER, QUESTION)
+
+        gateway.feedback(prompts.feedback_prompt(QUESTION["question"], ANSWER, ", ".join(QUESTION["keywords"])),
+                         fallback)
+        return not fallback_marker.used
+
+    print(f"{'phase':10} {'client':8} {'p50 s':>7} {'p99 s':>7} {'max s':>7} {'model %':>8} {'backend reqs':>13}")
+    for name, faults in PHASES:
+        for client, call in (("direct", lambda: direct_call(url, args.direct_timeout)), ("gateway", gateway_call)):
+            server.faults.clear()
+            server.faults.update(DEFAULT_FAULTS, **faults)
+            before = server.requests
+            row = run_phase(call, args.rate, args.phase_seconds)
+            print(f"{name:10} {client:8} {row['p50']:>7.3f} {row['p99']:>7.3f} {row['max']:>7.3f} "
+                  f"{row['model'] * 100:>7.0f}% {server.requests - before:>13}")
+    print(f"gateway outcomes: {gateway.stats()}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
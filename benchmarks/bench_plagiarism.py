@@ -0,0 +1,95 @@
+"""Plagiarism check latency as past answers pile up, and how many copies it catches
+
+Run from the repository root:
+
+    python benchmarks/bench_plagiarism.py [--answers 100000] [--questions 10] [--copies 0.02]
+
+Feeds --answers synthetic answers of 40-120 Zipf-distributed words to
+PlagiarismDetector.check, spread over --questions questions, one session
+each. A --copies fraction of them are an earlier answer to the same
+question with 5-25% of its words replaced, which should be flagged; the
+rest are independent and should not be. Check latency is reported for
+every tenth of the run, so growth with the number of stored answers
+shows, along with recall on the copies by edit rate and false positives.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from itertools import accumulate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from plagiarism import PlagiarismDetector
+
+
+def vocabulary(size, rng):
+    common = ["the", "a", "and", "to", "of", "i", "we", "it", "is", "that"]
+    words = set(common)
+    while len(words) < size:
+        words.add("".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(3, 10))))
+    return common + sorted(words - set(common))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--answers", type=int, default=100000)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--copies", type=float, default=0.02)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    args = parser.parse_args()
+
+    rng = random.Random(9)
+    words = vocabulary(20000, rng)
+    cumulative = list(accumulate(1 / (rank + 1) for rank in range(len(words))))
+    detector = PlagiarismDetector(os.path.join(tempfile.mkdtemp(prefix="bench_plagiarism_"), "plagiarism.db"),
+                                  threshold=args.threshold)
+
+    answers = {question: [] for question in range(args.questions)}
+    slices = []
+    latencies = []
+    recall = {}
+    false_positives = 0
+    independent = 0
+    for i in range(args.answers):
+        question = rng.randrange(args.questions)
+        earlier = answers[question]
+        edit_rate = None
+        if earlier and rng.random() < args.copies:
+            edit_rate = rng.choice((0.05, 0.10, 0.15, 0.25))
+            text = rng.choice(earlier).split()
+            for position in rng.sample(range(len(text)), int(len(text) * edit_rate)):
+                text[position] = rng.choice(words)
+        else:
+            text = rng.choices(words, cum_weights=cumulative, k=rng.randint(40, 120))
+        response = " ".join(text)
+        earlier.append(response)
+
+        started = time.perf_counter()
+        match = detector.check(f"s{i}", f"question {question}", response)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if edit_rate is None:
+            independent += 1
+            false_positives += match is not None
+        else:
+            found, total = recall.get(edit_rate, (0, 0))
+            recall[edit_rate] = (found + (match is not None), total + 1)
+        if (i + 1) % max(1, args.answers // 10) == 0:
+            slices.append((i + 1, statistics.median(latencies), sorted(latencies)[int(len(latencies) * 0.99)]))
+            latencies = []
+
+    print(f"{args.answers} answers over {args.questions} questions, threshold {args.threshold}")
+    print(f"{'stored answers':>15} {'check p50 ms':>13} {'check p99 ms':>13}")
+    for stored, p50, p99 in slices:
+        print(f"{stored:>15,} {p50:>13.2f} {p99:>13.2f}")
+    for edit_rate, (found, total) in sorted(recall.items()):
+        print(f"copies with {edit_rate:.0%} of words changed: {found}/{total} flagged")
+    print(f"independent answers flagged: {false_positives}/{independent}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Memory of a gunicorn deployment with the app preloaded in the master versus imported per worker
+
+Run from the repository root:
+
+    python benchmarks/bench_preload.py [--workers 4] [--requests 2000]
+
+Starts `gunicorn server:app` with gunicorn.conf.py twice, with
+GUNICORN_PRELOAD=1 and 0, and --workers workers each time. Once the
+workers are up, --requests requests (interviews started and session
+listings) are spread over them, then the proportional (PSS) and private (USS)
+memory of the master and every worker is read from /proc. PSS summed
+over all processes is what the deployment really costs; private memory
+per worker is what each extra worker adds.
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from profiler import child_pids, memory_usage
+
+# The session listing is an admin endpoint
+ADMIN_TOKEN = "bench-preload"
+
+
+def call(port, path, payload=None):
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=data,
+                                     headers={"Content-Type": "application/json", "X-Admin-Token": ADMIN_TOKEN})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def run(preload, workers, requests, port):
+    env = dict(os.environ, GUNICORN_PRELOAD="1" if preload else "0", WEB_CONCURRENCY=str(workers),
+               GUNICORN_BIND=f"127.0.0.1:{port}", SESSIONS_DIR=tempfile.mkdtemp(prefix="bench_preload_"),
+               RATE_LIMIT_ENABLED="0", PLAGIARISM_DETECTION="0", EVENT_BUS_LOCAL_OK="1", ADMIN_TOKEN=ADMIN_TOKEN,
+               SESSION_TOKEN_SECRET="bench-preload")
+    master = subprocess.Popen([sys.executable, "-m", "gunicorn", "server:app"], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 60
+        while len(child_pids(master.pid)) < workers or not ready(port):
+            if time.time() > deadline:
+                raise RuntimeError("gunicorn did not start")
+            time.sleep(0.2)
+
+        # Sessions live in the worker that started them, so only requests any worker can serve are sent
+        for i in range(requests):
+            if i % 2 == 0:
+                call(port, "/api/start_interview", {"type": ("Technical", "Behavioral")[i % 4 // 2]})
+            else:
+                call(port, "/api/sessions?limit=20")
+        time.sleep(1)
+
+        pids = child_pids(master.pid)
+        master_usage = memory_usage(master.pid)
+        worker_usage = [memory_usage(pid) for pid in pids]
+        return master_usage, worker_usage
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=30)
+
+
+def ready(port):
+    try:
+        call(port, "/api/sessions")
+        return True
+    except OSError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers after {args.requests} requests")
+    print(f"{'mode':10} {'total PSS MB':>13} {'worker PSS MB':>14} {'worker private MB':>18} {'worker RSS MB':>14}")
+    for preload in (False, True):
+        master_usage, worker_usage = run(preload, args.workers, args.requests, args.port)
+        total = master_usage["pss"] + sum(usage["pss"] for usage in worker_usage)
+        count = len(worker_usage)
+        print(f"{'preload' if preload else 'per-worker':10} {total / 1e6:>13.1f} "
+              f"{sum(u['pss'] for u in worker_usage) / count / 1e6:>14.1f} "
+              f"{sum(u['uss'] for u in worker_usage) / count / 1e6:>18.1f} "
+              f"{sum(u['rss'] for u in worker_usage) / count / 1e6:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
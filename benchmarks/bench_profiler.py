@@ -0,0 +1,74 @@
+"""Request cost with the sampling profiler and trace spans off and on
+
+Run from the repository root:
+
+    python benchmarks/bench_profiler.py [--requests 1000] [--rounds 15]
+
+The server is imported once with PROFILING=1 and the profiler and tracer
+are switched off and on between alternating rounds, so drift in machine
+load hits both configurations equally. Process CPU time is measured,
+which counts the sampler thread's own work alongside request handling;
+the median round of each configuration is compared. On a busy machine
+that comparison is noisy, so the sampler thread's own CPU time (read from
+its per-thread clock, Linux only) is reported as well.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=15)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_profiler_")
+    os.environ.update(PROFILING="1", RATE_LIMIT_ENABLED="0", SESSIONS_DIR=workdir,
+                      RECORDS_DIR=os.path.join(workdir, "records"))
+    os.chdir(workdir)
+    import server
+
+    client = server.app.test_client()
+    session_id = client.post('/api/start_interview', json={'type': 'Technical'}).get_json()['session_id']
+    answer = 'Encapsulation and inheritance let a class hide state and reuse behaviour. ' * 8
+
+    def run_round():
+        started = time.process_time()
+        for i in range(args.requests):
+            client.post('/api/submit_response', json={'session_id': session_id, 'response': answer})
+            if i % 10 == 0:
+                client.post('/api/anti_cheating/tab_switch', json={'session_id': f"{session_id}-v{i}", 'count': 1})
+        return (time.process_time() - started) / args.requests
+
+    run_round()
+    off, on = [], []
+    sampler_cpu = wall = 0.0
+    for _ in range(args.rounds):
+        server.sampling_profiler.stop()
+        server.tracer.enabled = False
+        off.append(run_round())
+        server.sampling_profiler.start()
+        server.tracer.enabled = True
+        clock = time.pthread_getcpuclockid(server.sampling_profiler._thread.ident)
+        started = time.perf_counter()
+        on.append(run_round())
+        wall += time.perf_counter() - started
+        sampler_cpu += time.clock_gettime(clock)
+
+    median_off, median_on = statistics.median(off), statistics.median(on)
+    print(f"profiling off: {median_off * 1e6:.1f} us CPU/request")
+    print(f"profiling on:  {median_on * 1e6:.1f} us CPU/request "
+          f"({server.sampling_profiler.interval * 1000:.0f} ms sampling interval)")
+    print(f"overhead: {(median_on / median_off - 1) * 100:+.2f}%")
+    print(f"sampler thread CPU: {sampler_cpu / wall * 100:.2f}% of wall time")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Bytes on the wire and modelled time-to-interactive with and without response optimisation
+
+Run from the repository root:
+
+    python benchmarks/bench_response_optimizer.py [--sessions 200]
+
+"Before" is what a client sees without the optimisation layer: identity
+bodies and a full download on every visit. "After" negotiates gzip/br and
+revalidates repeat visits with If-None-Match. Time-to-interactive is
+modelled from a network profile (round trips plus bytes over bandwidth),
+not measured in a browser.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+NETWORK_PROFILES = {
+    # name: (round trip seconds, bytes per second)
+    "slow-3g": (0.4, 400_000 / 8),
+    "fast-3g": (0.15, 1_600_000 / 8),
+    "4g": (0.05, 9_000_000 / 8),
+}
+
+
+def transfer_time(rtt, bandwidth, wire_bytes, round_trips=1):
+    return round_trips * rtt + wire_bytes / bandwidth
+
+
+def measure(client, path, headers):
+    started = time.perf_counter()
+    response = client.get(path, headers=headers)
+    elapsed = time.perf_counter() - started
+    # Status line and headers travel too, so count them
+    header_bytes = sum(len(k) + len(v) + 4 for k, v in response.headers.items())
+    return response, len(response.data) + header_bytes, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200, help="catalog rows behind the JSON endpoint")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_response_")
+    os.environ["SESSIONS_DIR"] = workdir
+    os.environ["RATE_LIMIT_ENABLED"] = "0"
+    # The session listing is an admin endpoint
+    os.environ["ADMIN_TOKEN"] = "bench-response"
+    os.chdir(ROOT)
+    import server
+
+    for i in range(args.sessions):
+        server.session_catalog.upsert(f"bench{i:06d}", "Technical", score=i / args.sessions, answered=5)
+
+    client = server.app.test_client()
+    paths = ["/", "/static/js/anti-cheating.js", "/api/sessions?limit=100"]
+    admin = {"X-Admin-Token": os.environ["ADMIN_TOKEN"]}
+    optimized = dict(admin, **{"Accept-Encoding": "br, gzip"})
+
+    print(f"{'path':36} {'before':>9} {'after':>9} {'revisit':>9} {'server ms':>10}")
+    totals = {"before": 0, "after": 0, "revisit": 0}
+    for path in paths:
+        _, before, _ = measure(client, path, dict(admin, **{"Accept-Encoding": "identity"}))
+        response, after, elapsed = measure(client, path, optimized)
+        _, revisit, _ = measure(client, path, dict(optimized, **{"If-None-Match": response.headers.get("ETag", "")}))
+        totals["before"] += before
+        totals["after"] += after
+        totals["revisit"] += revisit
+        print(f"{path:36} {before:>9} {after:>9} {revisit:>9} {elapsed * 1000:>10.2f}")
+    print(f"{'total bytes':36} {totals['before']:>9} {totals['after']:>9} {totals['revisit']:>9}")
+
+    print()
+    print(f"{'profile':10} {'before s':>9} {'after s':>9} {'revisit s':>10}")
+    for name, (rtt, bandwidth) in NETWORK_PROFILES.items():
+        # One round trip per resource, fetched sequentially as the page boots
+        row = [transfer_time(rtt, bandwidth, totals[key], round_trips=len(paths))
+               for key in ("before", "after", "revisit")]
+        print(f"{name:10} {row[0]:>9.2f} {row[1]:>9.2f} {row[2]:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Cold versus warm invocation latency of the serverless entry point in api/index.py
+
+Run from the repository root:
+
+    python benchmarks/bench_serverless.py [--cold 5] [--warm 200]
+
+A cold invocation is a fresh interpreter that imports api/index.py and
+serves one request, which is what a new container does. Warm invocations
+reuse one process and the state it built on its first request.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executed in a fresh interpreter per cold sample
+COLD_INVOCATION = """
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {api_dir!r})
+import index
+imported = time.perf_counter()
+from werkzeug.test import Client
+response = Client(index.app).post('/api/start_interview', json={{'type': 'Technical'}})
+assert response.status_code == 200, response.status_code
+finished = time.perf_counter()
+print(json.dumps({{'import': imported - started, 'first_request': finished - imported}}))
+"""
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def cold_samples(count, env):
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", COLD_INVOCATION.format(api_dir=os.path.join(ROOT, "api"))],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        wall = time.perf_counter() - started
+        sample = json.loads(output)
+        sample["process"] = wall
+        samples.append(sample)
+    return samples
+
+
+def warm_samples(count):
+    sys.path.insert(0, os.path.join(ROOT, "api"))
+    import index
+    from werkzeug.test import Client
+
+    client = Client(index.app)
+    client.post('/api/start_interview', json={'type': 'Technical'})
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        response = client.post('/api/start_interview', json={'type': 'Technical'})
+        samples.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.status_code
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cold", type=int, default=5, help="fresh-interpreter invocations")
+    parser.add_argument("--warm", type=int, default=200, help="invocations in one warm process")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_serverless_")
+    os.environ["SESSIONS_DIR"] = workdir
+    # Measure the request path, not the limiter rejecting a single client's burst
+    os.environ["RATE_LIMIT_ENABLED"] = "0"
+    env = dict(os.environ)
+
+    cold = cold_samples(args.cold, env)
+    warm = warm_samples(args.warm)
+
+    ms = lambda seconds: f"{seconds * 1000:8.2f} ms"
+    print(f"cold ({args.cold} fresh interpreters)")
+    print(f"  process wall     median {ms(statistics.median(s['process'] for s in cold))}")
+    print(f"  import index     median {ms(statistics.median(s['import'] for s in cold))}")
+    print(f"  first request    median {ms(statistics.median(s['first_request'] for s in cold))}")
+    print(f"warm ({args.warm} requests in one process)")
+    print(f"  request          p50 {ms(percentile(warm, 0.5))}  p95 {ms(percentile(warm, 0.95))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Disk footprint and read latency of archived sessions, against the JSON files they replace
+
+Run from the repository root:
+
+    python benchmarks/bench_session_archive.py [--sessions 5000] [--reads 5000]
+
+Builds --sessions interview records shaped like save_interview's (a few
+answered questions with feedback, the score summary and device
+telemetry), then stores them three ways: pretty-printed JSON files as
+the server wrote them before, compact JSON files, and a SessionArchive.
+Reports the bytes each takes on disk, counting the filesystem blocks
+small files really occupy, how much the preset dictionary saves over
+compressing each record alone, the latency of random reads from each,
+and how long retention GC takes to drop the older half of the archive.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import session_archive
+from device_telemetry import DEVICES, TelemetryStore
+from keyword_feedback import generate_feedback
+from session_archive import SessionArchive
+from session_storage import ShardedJSONStore
+
+QUESTIONS = (
+    {"question": "Can you explain the difference between a process and a thread?",
+     "keywords": ["memory", "scheduling", "context switch", "shared state"],
+     "follow_up": "How would you debug a race condition?"},
+    {"question": "How would you design a URL shortener that serves millions of users?",
+     "keywords": ["hashing", "database", "cache", "load balancer", "replication"],
+     "follow_up": "How would you handle hot keys?"},
+    {"question": "Tell me about a time you disagreed with a teammate.",
+     "keywords": ["listened", "compromise", "outcome", "feedback"],
+     "follow_up": "What would you do differently now?"},
+    {"question": "How do you make sure a service stays reliable under load?",
+     "keywords": ["monitoring", "rate limiting", "retries", "capacity planning"],
+     "follow_up": "Which metrics would you alert on?"},
+)
+
+WORDS = ("i", "we", "the", "a", "and", "to", "of", "that", "it", "is", "was", "would", "with", "for", "our", "team",
+         "project", "data", "service", "users", "first", "then", "because", "so", "make", "sure", "system", "design",
+         "memory", "cache", "database", "load", "test", "tests", "deploy", "feedback", "outcome", "problem",
+         "approach", "customer", "latency", "requests", "monitoring", "scale", "worked", "built", "learned",
+         "manager", "deadline", "decided", "measure", "improved", "percent", "week", "release", "issue", "code")
+
+
+def answer(rng, words):
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def build_record(rng, session_id, started, words):
+    telemetry = TelemetryStore()
+    at = started.timestamp()
+    for device in DEVICES:
+        state = True
+        for offset in sorted(rng.uniform(0, 1800) for _ in range(rng.randint(1, 12))):
+            telemetry.record(session_id, device, state, at=at + offset)
+            state = not state
+    history = []
+    coverage_total = 0.0
+    for i in range(rng.randint(3, 10)):
+        question = rng.choice(QUESTIONS)
+        response = answer(rng, rng.randint(words // 2, words * 2))
+        history.append({
+            "timestamp": (started + timedelta(seconds=90 * i + rng.random())).isoformat(),
+            "question": question["question"],
+            "response": response,
+            "feedback": generate_feedback(response, question)
+        })
+        coverage_total += rng.random()
+    return {
+        "timestamp": session_id,
+        "type": "Technical",
+        "history": history,
+        "summary": {"answered": len(history), "coverage_total": coverage_total,
+                    "mean_coverage": coverage_total / len(history), "last_coverage": rng.random(),
+                    "questions": {str(i): {"attempts": 1, "matched": rng.randint(0, 4), "keywords": 4,
+                                           "coverage": rng.random(), "best_coverage": rng.random()}
+                                  for i in range(len(history))},
+                    "categories": {"Technical": {"answered": len(history), "coverage_total": coverage_total,
+                                                 "mean_coverage": coverage_total / len(history)}},
+                    "violations": {}, "violation_total": 0},
+        "question_version": "c72a243a04e9",
+        "device_telemetry": telemetry.snapshot(session_id)
+    }
+
+
+def disk_usage(root, suffix=""):
+    """(bytes in files, bytes of blocks allocated) under root, of the files ending in suffix"""
+    apparent = allocated = 0
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            if not filename.endswith(suffix):
+                continue
+            stat = os.stat(os.path.join(directory, filename))
+            apparent += stat.st_size
+            allocated += stat.st_blocks * 512
+    return apparent, allocated
+
+
+def latencies(read, keys, rng, reads):
+    timings = []
+    for key in rng.choices(keys, k=reads):
+        started = time.perf_counter()
+        read(key)
+        timings.append((time.perf_counter() - started) * 1e6)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=60)
+    parser.add_argument("--reads", type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(9)
+    workdir = tempfile.mkdtemp(prefix="bench_session_archive_")
+    first = datetime(2026, 1, 1, 9)
+    records = {}
+    for i in range(args.sessions):
+        started = first + timedelta(minutes=17 * i)
+        session_id = started.strftime("%Y%m%d_%H%M%S")
+        records[session_id] = build_record(rng, session_id, started, args.words)
+    keys = list(records)
+    compact_bytes = sum(len(json.dumps(record, separators=(",", ":")).encode()) for record in records.values())
+
+    pretty = ShardedJSONStore(os.path.join(workdir, "pretty"), filename_prefix="interview_record_")
+    compact = ShardedJSONStore(os.path.join(workdir, "compact"), filename_prefix="interview_record_")
+    started = time.perf_counter()
+    for key, record in records.items():
+        pretty.write(key, record, indent=4)
+    pretty_write = time.perf_counter() - started
+    for key, record in records.items():
+        compact.write(key, record)
+
+    # Stored times a day apart per 100 sessions, so retention can expire the older half
+    clock = [0.0]
+    archives = {}
+    for codec in ("deflate", "zstd") if session_archive.zstandard is not None else ("deflate",):
+        archive = SessionArchive(os.path.join(workdir, f"archive-{codec}"), codec=codec,
+                                 segment_bytes=4 * 1024 * 1024, clock=lambda: clock[0])
+        started = time.perf_counter()
+        for i, (key, record) in enumerate(records.items()):
+            archive.put(key, record, stored_at=86400.0 * (i // 100))
+        archives[codec] = (archive, time.perf_counter() - started)
+
+    # What the preset dictionary is worth: the same records deflated alone without it
+    no_dictionary = 0
+    for record in records.values():
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+        no_dictionary += len(compressor.compress(json.dumps(record, separators=(",", ":")).encode()) +
+                             compressor.flush())
+
+    print(f"{args.sessions} records, {compact_bytes / args.sessions:,.0f} bytes of compact JSON each")
+    print(f"{'store':22} {'file bytes MB':>14} {'on disk MB':>11} {'per record':>11} {'write us':>9}")
+    rows = [("pretty JSON files", os.path.join(workdir, "pretty"), pretty_write),
+            ("compact JSON files", os.path.join(workdir, "compact"), None)]
+    rows += [(f"archive ({codec})", archive.root, elapsed) for codec, (archive, elapsed) in archives.items()]
+    for name, root, elapsed in rows:
+        # Archive segments only; the index is reported below
+        apparent, allocated = disk_usage(root, ".seg" if root.startswith(os.path.join(workdir, "archive")) else "")
+        write = f"{elapsed / args.sessions * 1e6:>9.0f}" if elapsed is not None else f"{'':>9}"
+        print(f"{name:22} {apparent / 1e6:>14.2f} {allocated / 1e6:>11.2f} {allocated / args.sessions:>11,.0f} {write}")
+    deflate = archives["deflate"][0].stats()["live_bytes"]
+    index = os.path.getsize(archives["deflate"][0].path)
+    print(f"archive index {index / 1e6:.2f} MB ({index / args.sessions:.0f} bytes per record, WAL not counted)")
+    print(f"deflate frames {deflate / 1e6:.2f} MB with the preset dictionary, {no_dictionary / 1e6:.2f} MB without")
+
+    print(f"random reads ({args.reads}, page cache warm):")
+    for name, read in [("pretty JSON file", pretty.read), ("compact JSON file", compact.read)] + \
+            [(f"archive ({codec})", archive.get) for codec, (archive, _) in archives.items()]:
+        p50, p99 = latencies(read, keys, rng, args.reads)
+        print(f"  {name:20} p50 {p50:7.1f} us   p99 {p99:7.1f} us")
+
+    archive = archives["deflate"][0]
+    archive.retention = 86400.0 * (args.sessions // 200)
+    clock[0] = 86400.0 * (args.sessions // 100)
+    segments_before = disk_usage(archive.root, ".seg")[1]
+    started = time.perf_counter()
+    expired, rewritten, freed = archive.gc()
+    elapsed = time.perf_counter() - started
+    segments_after = disk_usage(archive.root, ".seg")[1]
+    print(f"gc: expired {expired} records, rewrote {rewritten} segments, freed {freed / 1e6:.2f} MB in "
+          f"{elapsed * 1000:.0f} ms; segments {segments_before / 1e6:.2f} -> {segments_after / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Resident memory per live interview session, with history as records versus dicts
+
+Run from the repository root:
+
+    python benchmarks/bench_session_memory.py [--sessions 2000] [--answers 10]
+
+Drives --sessions interviews through submit_response with unique answers
+of --answer-chars characters, then measures everything reachable from
+interview_sessions, not counting the shared question bank. The same
+sessions are measured again after their history entries are turned back
+into the dicts with ISO timestamp strings the server used to keep, and
+once more with the answer text excluded to show the per-entry overhead.
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def deep_size(root, seen):
+    """Bytes of every object reachable from root and not already in seen"""
+    total = 0
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, "__slots__"):
+            stack.extend(getattr(obj, name) for name in obj.__slots__ if hasattr(obj, name))
+    return total
+
+
+def shared_ids(server):
+    """Objects every session points at but none owns: the question bank and small constants"""
+    seen = set()
+    deep_size(server.QUESTION_BANK.questions, seen)
+    deep_size([None, True, False, 0, 0.0, ""], seen)
+    return seen
+
+
+def measure(server, exclude=()):
+    seen = shared_ids(server)
+    seen.update(exclude)
+    return deep_size(server.interview_sessions, seen)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--answers", type=int, default=10)
+    parser.add_argument("--answer-chars", type=int, default=400)
+    args = parser.parse_args()
+
+    os.environ["SESSIONS_DIR"] = tempfile.mkdtemp(prefix="bench_memory_")
+    os.environ["RATE_LIMIT_ENABLED"] = "0"
+    os.environ["PRELOAD_STATIC_ASSETS"] = "0"
+    os.chdir(ROOT)
+    import server
+    from session_records import HistoryEntry
+    from werkzeug.test import Client
+
+    client = Client(server.app)
+    random.seed(3)
+    types = list(server.INTERVIEW_QUESTIONS)
+    for i in range(args.sessions):
+        session_id = client.post('/api/start_interview', json={'type': types[i % len(types)]}).get_json()["session_id"]
+        for _ in range(args.answers):
+            answer = "".join(random.choices(string.ascii_lowercase + " ", k=args.answer_chars))
+            client.post('/api/submit_response', json={'session_id': session_id, 'response': answer})
+
+    sessions = server.interview_sessions.values()
+    answers = [entry.response for session in sessions for entry in session["history"]]
+    records = measure(server)
+    records_overhead = measure(server, exclude={id(answer) for answer in answers})
+
+    for session in sessions:
+        session["history"] = [entry.to_dict() if isinstance(entry, HistoryEntry) else entry
+                              for entry in session["history"]]
+    dicts = measure(server)
+    dicts_overhead = measure(server, exclude={id(answer) for answer in answers})
+
+    count = len(server.interview_sessions)
+    entries = count * args.answers
+    print(f"{count} sessions x {args.answers} answers of {args.answer_chars} characters")
+    print(f"{'history as':12} {'bytes/session':>14} {'without answers':>16} {'per answer':>10}")
+    for label, total, overhead in (("dicts", dicts, dicts_overhead), ("records", records, records_overhead)):
+        print(f"{label:12} {total / count:>14,.0f} {overhead / count:>16,.0f} {overhead / entries:>10,.0f}")
+    print(f"saved {(dicts - records) / count:,.0f} bytes per session: {(dicts - records) / dicts * 100:.1f}% "
+          f"of the total, {(dicts_overhead - records_overhead) / dicts_overhead * 100:.1f}% of what is not answer text")
+
+
+if __name__ == "__main__":
+    main()
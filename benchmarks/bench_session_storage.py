@@ -0,0 +1,102 @@
+"""exists() and open latency of the flat versus sharded session layouts
+
+Run from the repository root:
+
+    python benchmarks/bench_session_storage.py --count 1000000 [--dir /path/on/target/disk]
+
+Writes --count small session files in each layout (this takes a while
+and several GB of inodes at 1M), then times random hits and misses.
+Drop the page cache between runs to see cold-directory behaviour.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_storage import ShardedJSONStore
+
+
+def session_ids(count):
+    # Spread over a year of dates, like real timestamps
+    for i in range(count):
+        day = i % 365
+        yield f"2025{1 + day // 31 % 12:02d}{1 + day % 28:02d}{i:010d}-{i % 10000:04d}"
+
+
+def timed(fn, keys):
+    samples = []
+    for key in keys:
+        started = time.perf_counter()
+        fn(key)
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--dir", default=None, help="parent directory for the test trees")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_storage_", dir=args.dir)
+    flat_dir = os.path.join(workdir, "flat")
+    os.makedirs(flat_dir)
+    sharded = ShardedJSONStore(os.path.join(workdir, "sharded"))
+    flat = ShardedJSONStore(os.path.join(workdir, "unused"), legacy_dir=flat_dir)
+    document = json.dumps({"violations": [{"type": "tab_switch", "timestamp": "2025-04-12T23:47:17"}]})
+
+    try:
+        keys = list(session_ids(args.count))
+        started = time.perf_counter()
+        for key in keys:
+            with open(flat.legacy_path(key), "w") as f:
+                f.write(document)
+        flat_write = time.perf_counter() - started
+        started = time.perf_counter()
+        for key in keys:
+            path = sharded.path_for(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(document)
+        sharded_write = time.perf_counter() - started
+
+        hits = random.sample(keys, min(args.lookups, len(keys)))
+        misses = [f"{key}-missing" for key in hits]
+
+        def read_flat(key):
+            with open(flat.legacy_path(key)) as f:
+                f.read()
+
+        def read_sharded(key):
+            with open(sharded.path_for(key)) as f:
+                f.read()
+
+        rows = [
+            ("exists hit", timed(lambda k: os.path.exists(flat.legacy_path(k)), hits),
+             timed(lambda k: os.path.exists(sharded.path_for(k)), hits)),
+            ("exists miss", timed(lambda k: os.path.exists(flat.legacy_path(k)), misses),
+             timed(lambda k: os.path.exists(sharded.path_for(k)), misses)),
+            ("open+read", timed(read_flat, hits), timed(read_sharded, hits)),
+        ]
+
+        largest, _, directories = sharded.directory_fanout()
+        print(f"{args.count} sessions; sharded tree has {directories} directories, largest holds {largest} entries")
+        print(f"write all: flat {flat_write:.1f} s, sharded {sharded_write:.1f} s")
+        print(f"{'operation':12} {'flat p50':>10} {'flat p99':>10} {'shard p50':>10} {'shard p99':>10}  (microseconds)")
+        for name, (flat_p50, flat_p99), (shard_p50, shard_p99) in rows:
+            print(f"{name:12} {flat_p50 * 1e6:>10.1f} {flat_p99 * 1e6:>10.1f} {shard_p50 * 1e6:>10.1f} {shard_p99 * 1e6:>10.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
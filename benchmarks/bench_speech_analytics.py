@@ -0,0 +1,80 @@
+"""How many rooms of live audio the delivery analytics keep up with on one core
+
+Run from the repository root:
+
+    python benchmarks/bench_speech_analytics.py [--rooms 50] [--seconds 60]
+
+Synthesises --seconds of answer audio per room: noise bursts standing in
+for speech, separated by silences of known length. Frames of 1024 float32
+samples at 16 kHz, as AIInterviewerBot captures them, are fed to one
+DeliveryAnalyzer per room in round-robin, on a single thread. Reports the
+CPU time per second of audio and how many rooms one core could serve in
+real time, and checks the pauses found against the pauses inserted.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from speech_analytics import DeliveryAnalyzer
+
+RATE = 16000
+CHUNK = 1024
+
+
+def synthesize(seconds, rng, min_pause=0.25):
+    """Speech-like audio and the number of pauses of at least min_pause it contains"""
+    parts = []
+    pauses = 0
+    total = 0.0
+    while total < seconds:
+        speech = rng.uniform(0.5, 3.0)
+        parts.append(rng.normal(0, rng.uniform(0.05, 0.3), int(speech * RATE)))
+        silence = rng.choice([0.1, rng.uniform(0.3, 0.8), rng.uniform(1.0, 3.0)])
+        parts.append(rng.normal(0, 0.001, int(silence * RATE)))
+        total += speech + silence
+        pauses += silence >= min_pause
+    # The final silence is trailing, not a pause between words
+    return np.concatenate(parts).astype(np.float32), int(pauses - (silence >= min_pause))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=60)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(11)
+    rooms = [synthesize(args.seconds, rng) for _ in range(args.rooms)]
+    frames = [[audio[i:i + CHUNK].tobytes() for i in range(0, audio.size, CHUNK)] for audio, _ in rooms]
+    analyzers = [DeliveryAnalyzer(rate=RATE) for _ in rooms]
+
+    audio_seconds = sum(audio.size for audio, _ in rooms) / RATE
+    longest = max(len(room_frames) for room_frames in frames)
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    for index in range(longest):
+        for analyzer, room_frames in zip(analyzers, frames):
+            if index < len(room_frames):
+                analyzer.feed(room_frames[index])
+    metrics = [analyzer.finish("um so I think the answer is basically yes") for analyzer in analyzers]
+    cpu = time.process_time() - cpu_started
+    wall = time.perf_counter() - wall_started
+
+    found = sum(m["pauses"]["count"] for m in metrics)
+    inserted = sum(pauses for _, pauses in rooms)
+    frame_count = sum(len(room_frames) for room_frames in frames)
+    print(f"{args.rooms} rooms x {args.seconds:g} s of audio, {frame_count} frames of {CHUNK} samples")
+    print(f"CPU {cpu:.2f} s ({wall:.2f} s wall) for {audio_seconds:.0f} s of audio: "
+          f"{cpu / audio_seconds * 1000:.2f} ms per audio second, {cpu / frame_count * 1e6:.1f} us per frame")
+    print(f"one core keeps up with about {audio_seconds / cpu:.0f} rooms in real time")
+    print(f"pauses found {found} of {inserted} inserted")
+
+
+if __name__ == "__main__":
+    main()
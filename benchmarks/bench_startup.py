@@ -0,0 +1,110 @@
+"""Startup time of the desktop app and the conference bot, against a target
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py [--runs 5] [--target-ms 300] [--top 8]
+
+Each run is a fresh interpreter started with -X importtime. For app.py it
+reports the import time and the time until the first window has been
+drawn (this needs a display; without one only the imports are timed).
+For ai_interviewer_bot.py it reports the import time and the time until a
+headless bot has asked its first question, which is when it is ready for
+its first connection. Both are measured from interpreter start. The
+slowest imports of the last run are listed, and the script exits with
+status 1 if a median misses --target-ms.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executed in a fresh interpreter; time.perf_counter() there starts near process start
+APP_STARTUP = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+result = {"import": imported - started}
+try:
+    import tkinter
+    root = tkinter.Tk()
+    window = app.MockInterviewApp(root)
+    root.update()
+    result["ready"] = time.perf_counter() - started
+    root.destroy()
+except tkinter.TclError as e:
+    result["skipped"] = str(e)
+print(json.dumps(result))
+"""
+
+BOT_STARTUP = """
+import json, time
+started = time.perf_counter()
+import ai_interviewer_bot
+imported = time.perf_counter()
+bot = ai_interviewer_bot.AIInterviewerBot("bench-room", headless=True)
+bot.start_interview("Technical")
+print(json.dumps({"import": imported - started, "ready": time.perf_counter() - started}))
+"""
+
+
+def parse_importtime(stderr):
+    """(module, self microseconds, cumulative microseconds) for every line of -X importtime output"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def run(code):
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True,
+                             text=True, check=True, env=dict(os.environ, INTERVIEW_HEADLESS="1"))
+    wall = time.perf_counter() - started
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result["process"] = wall
+    return result, parse_importtime(process.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target-ms", type=float, default=300, help="time to first window / bot ready")
+    parser.add_argument("--top", type=int, default=8, help="slowest imports to list")
+    args = parser.parse_args()
+
+    missed = False
+    for label, code in (("app.py", APP_STARTUP), ("ai_interviewer_bot.py", BOT_STARTUP)):
+        results = []
+        modules = []
+        for _ in range(args.runs):
+            result, modules = run(code)
+            results.append(result)
+
+        imports = statistics.median(r["import"] for r in results) * 1000
+        print(f"{label}: import {imports:.1f} ms", end="")
+        if "ready" in results[0]:
+            ready = statistics.median(r["ready"] for r in results) * 1000
+            verdict = "ok" if ready <= args.target_ms else "MISSED"
+            missed = missed or ready > args.target_ms
+            print(f", ready {ready:.1f} ms (target {args.target_ms:g} ms: {verdict})", end="")
+        else:
+            print(f", first window not measured: {results[0].get('skipped')}", end="")
+        print(f", whole process {statistics.median(r['process'] for r in results) * 1000:.1f} ms")
+
+        print(f"  {'module':40} {'self ms':>8} {'cumulative ms':>14}")
+        for name, self_us, cumulative_us in sorted(modules, key=lambda m: -m[2])[:args.top]:
+            print(f"  {name:40} {self_us / 1000:>8.1f} {cumulative_us / 1000:>14.1f}")
+    sys.exit(1 if missed else 0)
+
+
+if __name__ == "__main__":
+    main()
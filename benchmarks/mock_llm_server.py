@@ -0,0 +1,132 @@
+"""A local stand-in for the chat completions API that injects latency and errors
+
+Run from the repository root:
+
+    python benchmarks/mock_llm_server.py --port 8089 --latency-ms 800 --jitter-ms 400 --error-rate 0.1
+
+then point the gateway at it with LLM_BASE_URL=http://127.0.0.1:8089.
+Faults can be changed while it runs:
+
+    curl -X POST localhost:8089/faults -d '{"latency_ms": 5000, "error_rate": 0.5}'
+
+Keys: latency_ms, jitter_ms (uniform extra delay), per_answer_ms (extra
+delay per answer in a batched prompt, as longer replies take longer to
+generate), error_rate (HTTP 500), hang_rate (never answer until the
+client gives up) and down (503 for everything). Replies are a canned
+review, or a JSON object of them when the prompt numbers several answers.
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_FAULTS = {"latency_ms": 200, "jitter_ms": 0, "per_answer_ms": 0, "error_rate": 0.0, "hang_rate": 0.0,
+                  "down": False}
+
+CANNED_REVIEW = "Clear structure; add a concrete example."
+
+# Batched feedback prompts number their answers "Answer 1: ...", one per line
+BATCHED_ANSWER = re.compile(r"^Answer (\d+):", re.MULTILINE)
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that gave up on a slow reply are expected; anything else is not
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, document):
+        body = json.dumps(document).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        faults = self.server.faults
+
+        if self.path == "/faults":
+            faults.update(request)
+            self._send(200, faults)
+            return
+
+        prompt = "".join(m.get("content", "") for m in request.get("messages", []))
+        answers = BATCHED_ANSWER.findall(prompt)
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.prompt_chars += len(prompt)
+        if faults["down"]:
+            self._send(503, {"error": {"message": "backend down"}})
+            return
+        if random.random() < faults["hang_rate"]:
+            # Hold the connection open far longer than any client deadline
+            time.sleep(300)
+            return
+        time.sleep((faults["latency_ms"] + random.uniform(0, faults["jitter_ms"])
+                    + faults["per_answer_ms"] * max(1, len(answers))) / 1000)
+        if random.random() < faults["error_rate"]:
+            self._send(500, {"error": {"message": "injected failure"}})
+            return
+
+        content = json.dumps({number: CANNED_REVIEW for number in answers}) if answers else CANNED_REVIEW
+        self._send(200, {
+            "id": "mock",
+            "object": "chat.completion",
+            "model": request.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 9}
+        })
+
+
+def start_mock_server(port=0, **faults):
+    """Serve on a background thread; returns the server and its base URL"""
+    server = MockLLMServer(("127.0.0.1", port), MockLLMHandler)
+    server.faults = dict(DEFAULT_FAULTS, **faults)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.prompt_chars = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_FAULTS["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, url = start_mock_server(args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                    error_rate=args.error_rate, hang_rate=args.hang_rate)
+    print(f"Mock LLM listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
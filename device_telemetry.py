@@ -0,0 +1,338 @@
+import base64
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+# Devices the anti-cheating routes report on; the state is 1 while the device is on or focused
+DEVICES = ("camera", "microphone", "tab_focus")
+
+
+class DeviceTimeline:
+    """One device's on/off history, run-length encoded into parallel arrays
+
+    Interval i starts at starts[i] (epoch seconds) and lasts until the next
+    start; the last one is still open. on_before[i] is the exact on-time
+    accumulated before starts[i], so the on-time up to any instant, and
+    with it the coverage of any range, is one bisect away. Within a closed
+    interval on-time grows at the interval's average rate, which is just
+    its state until downsampling merges intervals.
+
+    Once there are more than `max_intervals` intervals the timeline is
+    downsampled. The newest quarter of the intervals is kept exactly; in
+    the older part, boundaries closer together than `resolution` are
+    dropped, keeping the exact on-time at every boundary that remains.
+    `resolution` is that older span divided by a quarter of
+    `max_intervals`, so it follows how long the session has run rather
+    than how often it was downsampled. Coverage over whole intervals
+    stays exact; only the on/off detail inside a merged interval is lost.
+    """
+
+    __slots__ = ("starts", "on_before", "states", "resolution", "max_intervals")
+
+    def __init__(self, max_intervals=2048):
+        self.starts = array("d")
+        self.on_before = array("d")
+        self.states = array("b")
+        self.resolution = 0.5
+        self.max_intervals = max_intervals
+
+    def __len__(self):
+        return len(self.starts)
+
+    def record(self, at, state):
+        """Note the device's state at time `at`; repeats of the current state cost nothing"""
+        state = 1 if state else 0
+        if not self.starts:
+            self.starts.append(at)
+            self.on_before.append(0.0)
+            self.states.append(state)
+            return
+        if state == self.states[-1]:
+            return
+        at = max(at, self.starts[-1])
+        if at == self.starts[-1]:
+            # The open interval never lasted; flip it, or fold it back into its predecessor
+            if len(self.starts) > 1 and self.states[-2] == state and self._rate(len(self.starts) - 2) == state:
+                self._pop()
+            else:
+                self.states[-1] = state
+            return
+        self.on_before.append(self.on_time(at))
+        self.starts.append(at)
+        self.states.append(state)
+        if len(self.starts) > self.max_intervals:
+            self._downsample()
+
+    def _pop(self):
+        self.starts.pop()
+        self.on_before.pop()
+        self.states.pop()
+
+    def _rate(self, i):
+        """Fraction of closed interval i the device was on"""
+        duration = self.starts[i + 1] - self.starts[i]
+        return (self.on_before[i + 1] - self.on_before[i]) / duration if duration else self.states[i]
+
+    def on_time(self, at):
+        """Seconds the device was on from the first record up to `at`"""
+        i = bisect_right(self.starts, at) - 1
+        if i < 0:
+            return 0.0
+        rate = self.states[i] if i == len(self.starts) - 1 else self._rate(i)
+        return self.on_before[i] + (at - self.starts[i]) * rate
+
+    def coverage(self, start=None, end=None, now=None):
+        """(seconds on, seconds observed) between start and end, clipped to what was recorded"""
+        if not self.starts:
+            return 0.0, 0.0
+        now = time.time() if now is None else now
+        start = self.starts[0] if start is None else max(start, self.starts[0])
+        end = now if end is None else min(end, now)
+        if end <= start:
+            return 0.0, 0.0
+        return self.on_time(end) - self.on_time(start), end - start
+
+    def intervals(self, start=None, end=None, now=None):
+        """[start, end, state, on fraction] of each interval overlapping the range, clipped to it"""
+        if not self.starts:
+            return []
+        now = time.time() if now is None else now
+        end = now if end is None else min(end, now)
+        first = 0 if start is None else max(0, bisect_right(self.starts, start) - 1)
+        last = bisect_left(self.starts, end)
+        result = []
+        for i in range(first, last):
+            interval_start = self.starts[i] if start is None else max(start, self.starts[i])
+            interval_end = min(end, self.starts[i + 1]) if i + 1 < len(self.starts) else end
+            if interval_end > interval_start:
+                fraction = float(self.states[i]) if i == len(self.starts) - 1 else self._rate(i)
+                result.append([interval_start, interval_end, self.states[i], round(fraction, 4)])
+        return result
+
+    def _downsample(self):
+        last = len(self.starts) - 1
+        # Intervals from `recent` on are kept as recorded
+        recent = max(1, len(self.starts) - self.max_intervals // 4)
+        self.resolution = max(self.resolution,
+                              (self.starts[recent] - self.starts[0]) / max(1, self.max_intervals // 4))
+        keep = [0]
+        for i in range(1, recent):
+            if self.starts[i] - self.starts[keep[-1]] >= self.resolution:
+                keep.append(i)
+        # The open interval keeps its boundary and exact state so transitions still append to it
+        keep.extend(range(recent, last + 1))
+
+        starts = array("d")
+        on_before = array("d")
+        states = array("b")
+        for position, i in enumerate(keep):
+            if position + 1 < len(keep):
+                following = keep[position + 1]
+                on = self.on_before[following] - self.on_before[i]
+                state = 1 if 2 * on >= self.starts[following] - self.starts[i] else 0
+            else:
+                state = self.states[i]
+            # Neighbours mostly in the same state merge; the exact on-time stays at the boundaries kept
+            if states and states[-1] == state and i != last:
+                continue
+            starts.append(self.starts[i])
+            on_before.append(self.on_before[i])
+            states.append(state)
+        self.starts, self.on_before, self.states = starts, on_before, states
+
+    def to_dict(self):
+        return {
+            "resolution": self.resolution,
+            "starts": base64.b64encode(self.starts.tobytes()).decode(),
+            "on_before": base64.b64encode(self.on_before.tobytes()).decode(),
+            "states": base64.b64encode(self.states.tobytes()).decode()
+        }
+
+    @classmethod
+    def from_arrays(cls, resolution, starts, on_before, states, max_intervals=2048):
+        """Timeline from the raw bytes of its three arrays"""
+        timeline = cls(max_intervals)
+        timeline.resolution = resolution
+        timeline.starts.frombytes(starts)
+        timeline.on_before.frombytes(on_before)
+        timeline.states.frombytes(states)
+        return timeline
+
+    @classmethod
+    def from_dict(cls, data, max_intervals=2048):
+        return cls.from_arrays(data["resolution"], base64.b64decode(data["starts"]),
+                               base64.b64decode(data["on_before"]), base64.b64decode(data["states"]), max_intervals)
+
+
+def summarize(timelines, start=None, end=None, devices=None, include_intervals=True, now=None):
+    """Per device: the fraction of the range it was on, and its intervals there"""
+    now = time.time() if now is None else now
+    summary = {}
+    for device, timeline in timelines.items():
+        if devices and device not in devices:
+            continue
+        on, observed = timeline.coverage(start, end, now)
+        summary[device] = {
+            "coverage": round(on / observed, 4) if observed else None,
+            "on_seconds": round(on, 3),
+            "observed_seconds": round(observed, 3),
+            "resolution": timeline.resolution,
+            "transitions": len(timeline)
+        }
+        if include_intervals:
+            summary[device]["intervals"] = timeline.intervals(start, end, now)
+    return summary
+
+
+class TelemetryStore:
+    """Device timelines of the sessions this process has seen, oldest evicted first"""
+
+    def __init__(self, max_intervals=2048, max_sessions=100000, clock=time.time):
+        self.max_intervals = max_intervals
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, session_id, device, active, at=None):
+        at = self.clock() if at is None else at
+        with self._lock:
+            timelines = self._sessions.get(session_id)
+            if timelines is None:
+                timelines = self._sessions[session_id] = {}
+                if len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            timeline = timelines.get(device)
+            if timeline is None:
+                timeline = timelines[device] = DeviceTimeline(self.max_intervals)
+            timeline.record(at, active)
+
+    def summary(self, session_id, start=None, end=None, devices=None, include_intervals=True):
+        """Per device: the fraction of the range it was on, and its intervals there; None if unknown"""
+        now = self.clock()
+        with self._lock:
+            timelines = self._sessions.get(session_id)
+            if timelines is None:
+                return None
+            return summarize(timelines, start, end, devices, include_intervals, now)
+
+    def snapshot(self, session_id):
+        """Compact, JSON-ready copy of a session's timelines for its interview record"""
+        with self._lock:
+            timelines = self._sessions.get(session_id)
+            if timelines is None:
+                return None
+            return {device: timeline.to_dict() for device, timeline in timelines.items()}
+
+    def forget(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS timelines (
+    session_id TEXT NOT NULL,
+    device TEXT NOT NULL,
+    resolution REAL NOT NULL,
+    starts BLOB NOT NULL,
+    on_before BLOB NOT NULL,
+    states BLOB NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (session_id, device)
+);
+CREATE INDEX IF NOT EXISTS idx_timelines_updated ON timelines (updated);
+"""
+
+
+class SQLiteTelemetryStore:
+    """Device timelines shared by every worker process through one SQLite file
+
+    Each report is a read-modify-write of one (session, device) row inside
+    an IMMEDIATE transaction, so reports landing on different workers
+    extend the same timeline. Timelines not reported on for `max_age`
+    seconds are pruned; saved interview records keep their own snapshot.
+    """
+
+    def __init__(self, path, max_intervals=2048, max_age=2 * 86400, clock=time.time):
+        self.path = path
+        self.max_intervals = max_intervals
+        self.max_age = max_age
+        self.clock = clock
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._records = 0
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def _timeline(self, row):
+        return DeviceTimeline.from_arrays(row[0], row[1], row[2], row[3], self.max_intervals)
+
+    def record(self, session_id, device, active, at=None):
+        at = self.clock() if at is None else at
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT resolution, starts, on_before, states FROM timelines WHERE session_id = ? AND device = ?",
+                (session_id, device)
+            ).fetchone()
+            timeline = self._timeline(row) if row is not None else DeviceTimeline(self.max_intervals)
+            timeline.record(at, active)
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO timelines (session_id, device, resolution, starts, on_before, states, updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (session_id, device, timeline.resolution, timeline.starts.tobytes(), timeline.on_before.tobytes(),
+                 timeline.states.tobytes(), self.clock())
+            )
+        self._records += 1
+        if self._records % 1024 == 0:
+            self.prune()
+
+    def _timelines(self, session_id):
+        rows = self._connect().execute(
+            "SELECT device, resolution, starts, on_before, states FROM timelines WHERE session_id = ?", (session_id,)
+        ).fetchall()
+        return {row[0]: self._timeline(row[1:]) for row in rows}
+
+    def summary(self, session_id, start=None, end=None, devices=None, include_intervals=True):
+        """Per device: the fraction of the range it was on, and its intervals there; None if unknown"""
+        timelines = self._timelines(session_id)
+        if not timelines:
+            return None
+        return summarize(timelines, start, end, devices, include_intervals, self.clock())
+
+    def snapshot(self, session_id):
+        """Compact, JSON-ready copy of a session's timelines for its interview record"""
+        timelines = self._timelines(session_id)
+        if not timelines:
+            return None
+        return {device: timeline.to_dict() for device, timeline in timelines.items()}
+
+    def forget(self, session_id):
+        self._connect().execute("DELETE FROM timelines WHERE session_id = ?", (session_id,))
+
+    def prune(self):
+        self._connect().execute("DELETE FROM timelines WHERE updated < ?", (self.clock() - self.max_age,))
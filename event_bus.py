@@ -0,0 +1,126 @@
+import abc
+import json
+import os
+import queue
+import threading
+
+
+REDIS_SCHEMES = ("redis://", "rediss://", "unix://")
+
+
+class Subscription(abc.ABC):
+    """A stream of events published to one channel"""
+
+    @abc.abstractmethod
+    def get(self, timeout=None):
+        """Return the next event, or None if nothing arrived within timeout"""
+
+    @abc.abstractmethod
+    def close(self):
+        """Stop receiving events"""
+
+
+class _LocalSubscription(Subscription):
+    def __init__(self, broker, channel, max_pending):
+        self._broker = broker
+        self.channel = channel
+        self._queue = queue.Queue(maxsize=max_pending)
+
+    def _deliver(self, event):
+        # A slow reader loses its oldest events rather than blocking the publisher
+        while True:
+            try:
+                self._queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._broker._unsubscribe(self)
+
+
+class InProcessBroker:
+    """Pub/sub between threads of a single worker process"""
+
+    def __init__(self, max_pending=256):
+        self.max_pending = max_pending
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event):
+        """Deliver an event to every current subscriber and return how many there were"""
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription._deliver(event)
+        return len(subscribers)
+
+    def subscribe(self, channel):
+        subscription = _LocalSubscription(self, channel, self.max_pending)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+
+class _RedisSubscription(Subscription):
+    def __init__(self, client, channel):
+        self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(channel)
+
+    def get(self, timeout=None):
+        message = self._pubsub.get_message(timeout=timeout if timeout is not None else 60.0)
+        if message is None or message.get("type") != "message":
+            return None
+        return json.loads(message["data"])
+
+    def close(self):
+        self._pubsub.close()
+
+
+class RedisBroker:
+    """Pub/sub over any Redis-protocol server, for fan-out across workers and hosts"""
+
+    def __init__(self, url):
+        import redis
+        self._client = redis.Redis.from_url(url)
+
+    def publish(self, channel, event):
+        return self._client.publish(channel, json.dumps(event))
+
+    def subscribe(self, channel):
+        return _RedisSubscription(self._client, channel)
+
+
+def is_cross_process(url=None):
+    """Whether EVENT_BUS_URL names a broker that fans events out across worker processes"""
+    url = url if url is not None else os.environ.get("EVENT_BUS_URL", "")
+    return url.startswith(REDIS_SCHEMES)
+
+
+def create_broker(url=None):
+    """Pick the broker for EVENT_BUS_URL: redis:// URLs fan out across workers, anything else stays in-process"""
+    url = url if url is not None else os.environ.get("EVENT_BUS_URL", "")
+    if is_cross_process(url):
+        return RedisBroker(url)
+    return InProcessBroker()
+
+
+def session_channel(session_id):
+    return f"session:{session_id}"
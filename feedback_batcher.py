@@ -0,0 +1,129 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_gateway import LLMUnavailable
+from prompt_templates import PromptBuilder
+
+
+class _PendingFeedback:
+    __slots__ = ("question", "response", "key_points", "arrived", "deadline", "done", "reply")
+
+    def __init__(self, question, response, key_points, arrived, deadline):
+        self.question = question
+        self.response = response
+        self.key_points = key_points
+        self.arrived = arrived
+        self.deadline = deadline
+        self.done = threading.Event()
+        self.reply = None
+
+
+class FeedbackBatcher:
+    """Coalesces feedback requests that arrive close together into one model call
+
+    Requests are collected for up to `window` seconds after the first one
+    (or until `max_batch` are waiting) and sent as a single prompt built by
+    PromptBuilder.batch_prompt, with numbered answers. The model's JSON
+    reply is split back to the waiting callers. A caller whose answer is
+    missing from the reply, or who is still waiting at its deadline, gets
+    its fallback instead.
+    """
+
+    def __init__(self, gateway, prompts=None, window=0.02, max_batch=16, max_batch_tokens=4000,
+                 clock=time.monotonic):
+        self.gateway = gateway
+        self.prompts = prompts or PromptBuilder()
+        self.window = window
+        self.max_batch = max_batch
+        self.max_batch_tokens = max_batch_tokens
+        self.clock = clock
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._executor = None
+        self._counts = {"batches": 0, "answers": 0, "model": 0, "fallback": 0}
+        self._counts_lock = threading.Lock()
+
+    def feedback(self, question, response, key_points, fallback):
+        """The model's feedback on one answer, or fallback() if it cannot arrive in time"""
+        if self.window <= 0 or self.max_batch <= 1:
+            return self.gateway.feedback(self.prompts.feedback_prompt(question, response, key_points), fallback)
+
+        now = self.clock()
+        item = _PendingFeedback(question, response, key_points, now, now + self.gateway.timeout)
+        with self._cond:
+            if self._thread is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.gateway.max_in_flight,
+                                                    thread_name_prefix="feedback-batch")
+                self._thread = threading.Thread(target=self._collect, name="feedback-batcher", daemon=True)
+                self._thread.start()
+            self._pending.append(item)
+            self._cond.notify()
+
+        if item.done.wait(max(0.0, item.deadline - self.clock())) and item.reply is not None:
+            self._count(model=1)
+            return item.reply
+        self._count(fallback=1)
+        return fallback()
+
+    def _collect(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                flush_at = self._pending[0].arrived + self.window
+                while len(self._pending) < self.max_batch:
+                    remaining = flush_at - self.clock()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                self._pending = self._pending[self.max_batch:]
+            self._executor.submit(self._send, batch)
+
+    def _send(self, batch):
+        deadline = min(item.deadline for item in batch)
+        if len(batch) == 1:
+            item = batch[0]
+            prompt = self.prompts.feedback_prompt(item.question, item.response, item.key_points)
+        else:
+            prompt = self.prompts.batch_prompt([(item.question, item.key_points, item.response) for item in batch])
+        self._count(batches=1, answers=len(batch))
+        try:
+            reply = self.gateway.complete(prompt, deadline=deadline,
+                                          max_tokens=min(self.gateway.max_tokens * len(batch), self.max_batch_tokens))
+            replies = [reply] if len(batch) == 1 else split_batch_reply(reply, len(batch))
+        except LLMUnavailable:
+            replies = [None] * len(batch)
+        for item, item_reply in zip(batch, replies):
+            item.reply = item_reply
+            item.done.set()
+
+    def _count(self, **increments):
+        with self._counts_lock:
+            for key, value in increments.items():
+                self._counts[key] += value
+
+    def stats(self):
+        with self._counts_lock:
+            counts = dict(self._counts)
+        counts["mean_batch_size"] = counts["answers"] / counts["batches"] if counts["batches"] else 0.0
+        return counts
+
+
+def split_batch_reply(reply, count):
+    """Per-answer feedback from a batched reply, with None where an answer is missing"""
+    start, end = reply.find("{"), reply.rfind("}")
+    try:
+        parsed = json.loads(reply[start:end + 1]) if start != -1 else {}
+    except ValueError:
+        parsed = {}
+    if not isinstance(parsed, dict):
+        parsed = {}
+    replies = []
+    for number in range(1, count + 1):
+        feedback = parsed.get(str(number))
+        replies.append(feedback if isinstance(feedback, str) and feedback.strip() else None)
+    return replies
@@ -0,0 +1,614 @@
+"""Grading jobs queued by the web tier and worked off by a separate process pool
+
+Run the workers alongside the server, as many processes as grading needs:
+
+    python grading_queue.py worker [--processes 2] [--threads 4]
+    python grading_queue.py stats
+
+Both sides find the queue through GRADING_QUEUE_URL: a redis:// URL for
+any Redis-protocol server, otherwise a SQLite file (SESSIONS_DIR/grading.db
+by default) that every process on the host shares.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import sqlite3
+import threading
+import time
+import uuid
+
+from keyword_feedback import generate_feedback, score_response
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Answers from candidates still in their interview go ahead of regrades and backfills
+PRIORITY_LIVE = 10
+PRIORITY_BACKGROUND = 0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS grading_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_after REAL NOT NULL,
+    lease_until REAL,
+    worker TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_grading_ready ON grading_jobs (state, priority DESC, id);
+CREATE INDEX IF NOT EXISTS idx_grading_lease ON grading_jobs (state, lease_until);
+CREATE TABLE IF NOT EXISTS grading_finished (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id INTEGER NOT NULL,
+    finished_at REAL NOT NULL
+);
+"""
+
+
+class Job:
+    """A claimed job, as a worker sees it"""
+
+    __slots__ = ("id", "kind", "payload", "priority", "attempts", "max_attempts", "worker")
+
+    def __init__(self, job_id, kind, payload, priority, attempts, max_attempts, worker):
+        self.id = job_id
+        self.kind = kind
+        self.payload = payload
+        self.priority = priority
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.worker = worker
+
+
+class SQLiteJobQueue:
+    """Priority job queue in a SQLite file shared by the web and worker processes
+
+    A claimed job is leased to its worker for `lease` seconds; a job whose
+    worker died is handed out again once the lease runs out. Failed jobs
+    are retried after `retry_delay` seconds, doubling each time, until
+    `max_attempts` is used up. Every job that finishes, either way, is
+    appended to a log the web tier reads to notify sessions.
+    """
+
+    def __init__(self, path, lease=60.0, retry_delay=1.0, max_attempts=3, ttl=24 * 3600):
+        self.path = path
+        self.lease = lease
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self.ttl = ttl
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._next_sweep = 0.0
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, kind, payload, priority=PRIORITY_BACKGROUND, max_attempts=None):
+        """Add a job and return its id"""
+        now = time.time()
+        return self._connect().execute(
+            """
+            INSERT INTO grading_jobs (kind, payload, priority, state, max_attempts, run_after, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (kind, json.dumps(payload), priority, QUEUED, max_attempts or self.max_attempts, now, now)
+        ).lastrowid
+
+    def claim(self, worker):
+        """Lease the most urgent runnable job to `worker`, or return None if there is none"""
+        conn = self._connect()
+        now = time.time()
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.lease / 4
+            self._recover_expired(conn, now)
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                """
+                SELECT id, kind, payload, priority, attempts, max_attempts FROM grading_jobs
+                WHERE state = ? AND run_after <= ? ORDER BY priority DESC, id LIMIT 1
+                """,
+                (QUEUED, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            job_id, kind, payload, priority, attempts, max_attempts = row
+            conn.execute(
+                "UPDATE grading_jobs SET state = ?, attempts = ?, lease_until = ?, worker = ? WHERE id = ?",
+                (RUNNING, attempts + 1, now + self.lease, worker, job_id)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return Job(job_id, kind, json.loads(payload), priority, attempts + 1, max_attempts, worker)
+
+    def complete(self, job, result):
+        self._finish(job, DONE, result=json.dumps(result))
+
+    def fail(self, job, error):
+        """Record a failed attempt; return True if the job will be retried"""
+        if job.attempts < job.max_attempts:
+            retried = self._connect().execute(
+                """
+                UPDATE grading_jobs SET state = ?, run_after = ?, lease_until = NULL, worker = NULL, error = ?
+                WHERE id = ? AND state = ? AND worker = ?
+                """,
+                (QUEUED, time.time() + self.retry_delay * 2 ** (job.attempts - 1), error, job.id, RUNNING, job.worker)
+            ).rowcount
+            return bool(retried)
+        self._finish(job, FAILED, error=error)
+        return False
+
+    def _finish(self, job, state, result=None, error=None):
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # A worker whose lease ran out has lost the job to another one
+            updated = conn.execute(
+                """
+                UPDATE grading_jobs SET state = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL
+                WHERE id = ? AND state = ? AND worker = ?
+                """,
+                (state, result, error, now, job.id, RUNNING, job.worker)
+            ).rowcount
+            if updated:
+                conn.execute("INSERT INTO grading_finished (job_id, finished_at) VALUES (?, ?)", (job.id, now))
+
+    def _recover_expired(self, conn, now):
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                """
+                INSERT INTO grading_finished (job_id, finished_at)
+                SELECT id, ? FROM grading_jobs WHERE state = ? AND lease_until < ? AND attempts >= max_attempts
+                """,
+                (now, RUNNING, now)
+            )
+            conn.execute(
+                """
+                UPDATE grading_jobs SET state = ?, error = 'lease expired', finished_at = ?, lease_until = NULL
+                WHERE state = ? AND lease_until < ? AND attempts >= max_attempts
+                """,
+                (FAILED, now, RUNNING, now)
+            )
+            conn.execute(
+                "UPDATE grading_jobs SET state = ?, lease_until = NULL, worker = NULL WHERE state = ? AND lease_until < ?",
+                (QUEUED, RUNNING, now)
+            )
+
+    def get(self, job_id):
+        row = self._connect().execute(
+            "SELECT id, kind, payload, priority, state, attempts, result, error FROM grading_jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        return _job_record(*row) if row else None
+
+    def finished_cursor(self):
+        """Cursor at the end of the finished-job log, so a reader sees only jobs finishing from now on"""
+        return self._connect().execute("SELECT COALESCE(MAX(seq), 0) FROM grading_finished").fetchone()[0]
+
+    def finished(self, cursor, limit=100):
+        """Jobs that finished after `cursor`, and the cursor to read on from"""
+        rows = self._connect().execute(
+            """
+            SELECT f.seq, j.id, j.kind, j.payload, j.priority, j.state, j.attempts, j.result, j.error
+            FROM grading_finished f JOIN grading_jobs j ON j.id = f.job_id
+            WHERE f.seq > ? ORDER BY f.seq LIMIT ?
+            """,
+            (cursor, limit)
+        ).fetchall()
+        if not rows:
+            return [], cursor
+        return [_job_record(*row[1:]) for row in rows], rows[-1][0]
+
+    def prune(self):
+        """Forget finished jobs older than the TTL"""
+        cutoff = time.time() - self.ttl
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM grading_jobs WHERE state IN (?, ?) AND finished_at < ?", (DONE, FAILED, cutoff))
+            conn.execute("DELETE FROM grading_finished WHERE finished_at < ?", (cutoff,))
+
+    def stats(self):
+        conn = self._connect()
+        counts = dict(conn.execute("SELECT state, COUNT(*) FROM grading_jobs GROUP BY state").fetchall())
+        oldest = conn.execute("SELECT MIN(created_at) FROM grading_jobs WHERE state = ?", (QUEUED,)).fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "states": {state: counts.get(state, 0) for state in (QUEUED, RUNNING, DONE, FAILED)},
+            "oldest_queued_seconds": round(time.time() - oldest, 3) if oldest else 0.0
+        }
+
+
+class RedisJobQueue:
+    """The same queue over any Redis-protocol server, for workers on other hosts
+
+    Runnable jobs sit in a sorted set ordered by priority then id, retries
+    wait in a second one ordered by due time, and leases in a third.
+    Finished jobs are appended to a capped stream. Only single commands
+    are relied on, no scripting, so compatible servers work too.
+    """
+
+    def __init__(self, url, prefix="grading:", lease=60.0, retry_delay=1.0, max_attempts=3, ttl=24 * 3600,
+                 finished_log=10000):
+        import redis
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.lease = lease
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self.ttl = ttl
+        self.finished_log = finished_log
+
+    def _key(self, name):
+        return self.prefix + name
+
+    def _rank(self, job_id, priority):
+        return -int(priority) * 1e12 + int(job_id)
+
+    def enqueue(self, kind, payload, priority=PRIORITY_BACKGROUND, max_attempts=None):
+        job_id = self._client.incr(self._key("next_id"))
+        pipe = self._client.pipeline()
+        pipe.hset(self._key(f"job:{job_id}"), mapping={
+            "kind": kind, "payload": json.dumps(payload), "priority": priority, "state": QUEUED,
+            "attempts": 0, "max_attempts": max_attempts or self.max_attempts, "created_at": time.time()
+        })
+        pipe.zadd(self._key("ready"), {job_id: self._rank(job_id, priority)})
+        pipe.execute()
+        return job_id
+
+    def claim(self, worker):
+        now = time.time()
+        self._promote_due(now)
+        popped = self._client.zpopmin(self._key("ready"))
+        if not popped:
+            return None
+        job_id = int(popped[0][0])
+        key = self._key(f"job:{job_id}")
+        attempts = self._client.hincrby(key, "attempts", 1)
+        pipe = self._client.pipeline()
+        pipe.hset(key, mapping={"state": RUNNING, "worker": worker})
+        pipe.zadd(self._key("running"), {job_id: now + self.lease})
+        pipe.hmget(key, "kind", "payload", "priority", "max_attempts")
+        kind, payload, priority, max_attempts = pipe.execute()[-1]
+        return Job(job_id, kind, json.loads(payload), int(priority), attempts, int(max_attempts), worker)
+
+    def _promote_due(self, now):
+        # Whoever removes a job from the delayed or running set is the one to move it
+        for job_id in self._client.zrangebyscore(self._key("delayed"), 0, now, start=0, num=100):
+            if self._client.zrem(self._key("delayed"), job_id):
+                priority = self._client.hget(self._key(f"job:{job_id}"), "priority") or 0
+                self._client.zadd(self._key("ready"), {job_id: self._rank(job_id, priority)})
+        for job_id in self._client.zrangebyscore(self._key("running"), 0, now, start=0, num=100):
+            if self._client.zrem(self._key("running"), job_id):
+                key = self._key(f"job:{job_id}")
+                attempts, max_attempts, priority = self._client.hmget(key, "attempts", "max_attempts", "priority")
+                if int(attempts or 0) >= int(max_attempts or 0):
+                    self._mark_finished(job_id, FAILED, error="lease expired")
+                else:
+                    self._client.hset(key, mapping={"state": QUEUED, "worker": ""})
+                    self._client.zadd(self._key("ready"), {job_id: self._rank(job_id, priority)})
+
+    def _release(self, job):
+        """Take a job back from its worker; False if its lease already passed to another one"""
+        if self._client.hget(self._key(f"job:{job.id}"), "worker") != job.worker:
+            return False
+        return bool(self._client.zrem(self._key("running"), job.id))
+
+    def complete(self, job, result):
+        if self._release(job):
+            self._mark_finished(job.id, DONE, result=json.dumps(result))
+
+    def fail(self, job, error):
+        if not self._release(job):
+            return False
+        if job.attempts < job.max_attempts:
+            self._client.hset(self._key(f"job:{job.id}"), mapping={"state": QUEUED, "worker": "", "error": error})
+            self._client.zadd(self._key("delayed"), {job.id: time.time() + self.retry_delay * 2 ** (job.attempts - 1)})
+            return True
+        self._mark_finished(job.id, FAILED, error=error)
+        return False
+
+    def _mark_finished(self, job_id, state, result=None, error=None):
+        key = self._key(f"job:{job_id}")
+        pipe = self._client.pipeline()
+        fields = {"state": state, "finished_at": time.time()}
+        if result is not None:
+            fields["result"] = result
+        if error is not None:
+            fields["error"] = error
+        pipe.hset(key, mapping=fields)
+        pipe.expire(key, int(self.ttl))
+        pipe.xadd(self._key("finished"), {"job_id": job_id}, maxlen=self.finished_log, approximate=True)
+        pipe.execute()
+
+    def get(self, job_id):
+        fields = self._client.hgetall(self._key(f"job:{job_id}"))
+        if not fields:
+            return None
+        return _job_record(int(job_id), fields["kind"], fields["payload"], int(fields["priority"]), fields["state"],
+                           int(fields["attempts"]), fields.get("result"), fields.get("error"))
+
+    def finished_cursor(self):
+        last = self._client.xrevrange(self._key("finished"), count=1)
+        return last[0][0] if last else "0-0"
+
+    def finished(self, cursor, limit=100):
+        streams = self._client.xread({self._key("finished"): cursor}, count=limit)
+        if not streams:
+            return [], cursor
+        entries = streams[0][1]
+        jobs = [job for job in (self.get(fields["job_id"]) for _, fields in entries) if job is not None]
+        return jobs, entries[-1][0]
+
+    def prune(self):
+        # Finished jobs expire on their own and the log is capped
+        pass
+
+    def stats(self):
+        pipe = self._client.pipeline()
+        pipe.zcard(self._key("ready"))
+        pipe.zcard(self._key("delayed"))
+        pipe.zcard(self._key("running"))
+        ready, delayed, running = pipe.execute()
+        return {"backend": "redis", "states": {QUEUED: ready + delayed, RUNNING: running}}
+
+
+def _job_record(job_id, kind, payload, priority, state, attempts, result, error):
+    return {
+        "id": job_id,
+        "kind": kind,
+        "payload": json.loads(payload),
+        "priority": priority,
+        "state": state,
+        "attempts": attempts,
+        "result": json.loads(result) if result else None,
+        "error": error
+    }
+
+
+def create_job_queue(url=None):
+    """Pick the queue for GRADING_QUEUE_URL: redis:// URLs use Redis, anything else is a SQLite path"""
+    url = url if url is not None else os.environ.get("GRADING_QUEUE_URL", "")
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisJobQueue(url)
+    return SQLiteJobQueue(url or os.path.join(os.environ.get("SESSIONS_DIR", "sessions"), "grading.db"))
+
+
+def _question_data(payload):
+    return {"question": payload["question"], "keywords": payload["keywords"],
+            "follow_up": payload.get("follow_up", "")}
+
+
+def keyword_grade(payload):
+    """Keyword coverage and feedback for one answer; cheap enough to run anywhere"""
+    question_data = _question_data(payload)
+    matched, _ = score_response(payload["response"], question_data)
+    return {
+        "feedback": generate_feedback(payload["response"], question_data),
+        "matched": len(matched),
+        "keywords": len(question_data["keywords"])
+    }
+
+
+_model = {"batcher": None}
+_model_lock = threading.Lock()
+
+
+def _feedback_batcher():
+    """This process's model feedback client, or None unless LLM_FEEDBACK=1"""
+    if os.environ.get("LLM_FEEDBACK", "0") != "1":
+        return None
+    with _model_lock:
+        if _model["batcher"] is None:
+            from feedback_batcher import FeedbackBatcher
+            from llm_gateway import gateway_from_environment
+            from prompt_templates import builder_from_environment
+            _model["batcher"] = FeedbackBatcher(gateway_from_environment(), prompts=builder_from_environment(),
+                                                window=float(os.environ.get("LLM_BATCH_WINDOW_MS", "20")) / 1000,
+                                                max_batch=int(os.environ.get("LLM_BATCH_MAX", "16")))
+        return _model["batcher"]
+
+
+def grade_answer(payload):
+    """Score an answer and write its feedback, with the model when LLM_FEEDBACK=1"""
+    result = keyword_grade(payload)
+    batcher = _feedback_batcher()
+    if batcher is not None:
+        keyword_feedback = result["feedback"]
+        result["feedback"] = batcher.feedback(payload["question"], payload["response"],
+                                              ", ".join(payload["keywords"]), lambda: keyword_feedback)
+    return result
+
+
+HANDLERS = {"grade_answer": grade_answer}
+
+
+class GradingWorker:
+    """Claims jobs and runs their handlers on `threads` threads until stopped
+
+    Idle threads poll the queue, backing off from 20 ms to
+    `poll_interval` while nothing is waiting.
+    """
+
+    def __init__(self, queue, handlers=None, threads=1, poll_interval=0.25):
+        self.queue = queue
+        self.handlers = handlers or HANDLERS
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.name = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    def run(self, stop):
+        threads = [threading.Thread(target=self._loop, args=(stop, f"{self.name}-{i}"), daemon=True)
+                   for i in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _loop(self, stop, worker):
+        idle_wait = 0.02
+        while not stop.is_set():
+            try:
+                job = self.queue.claim(worker)
+            except Exception as e:
+                print(f"Error claiming grading job: {str(e)}")
+                job = None
+            if job is None:
+                stop.wait(idle_wait)
+                idle_wait = min(idle_wait * 2, self.poll_interval)
+                continue
+            idle_wait = 0.02
+            self.run_job(job)
+
+    def run_job(self, job):
+        handler = self.handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise ValueError(f"no handler for job kind {job.kind!r}")
+            result = handler(job.payload)
+        except Exception as e:
+            print(f"Error running grading job {job.id}: {str(e)}")
+            try:
+                self.queue.fail(job, f"{e.__class__.__name__}: {e}")
+            except Exception as e:
+                print(f"Error recording grading job failure: {str(e)}")
+            return
+        try:
+            self.queue.complete(job, result)
+        except Exception as e:
+            print(f"Error completing grading job {job.id}: {str(e)}")
+
+
+class GradingListener:
+    """Hands every finished job to `on_finished` in the process that enqueued work
+
+    Start it in each worker process before that process enqueues
+    anything: the cursor it reads at start skips jobs finished earlier.
+    """
+
+    def __init__(self, queue, on_finished, poll_interval=0.05, prune_interval=3600):
+        self.queue = queue
+        self.on_finished = on_finished
+        self.poll_interval = poll_interval
+        self.prune_interval = prune_interval
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                cursor = self.queue.finished_cursor()
+                self._thread = threading.Thread(target=self._run, args=(cursor,), name="grading-listener",
+                                                daemon=True)
+                self._thread.start()
+
+    def _run(self, cursor):
+        next_prune = time.monotonic() + self.prune_interval
+        while True:
+            try:
+                jobs, cursor = self.queue.finished(cursor)
+                if time.monotonic() >= next_prune:
+                    next_prune = time.monotonic() + self.prune_interval
+                    self.queue.prune()
+            except Exception as e:
+                print(f"Error reading finished grading jobs: {str(e)}")
+                jobs = []
+            for job in jobs:
+                try:
+                    self.on_finished(job)
+                except Exception as e:
+                    print(f"Error applying grading job {job['id']}: {str(e)}")
+            if not jobs:
+                time.sleep(self.poll_interval)
+
+
+def _worker_process(url, threads, poll_interval, stop):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    GradingWorker(create_job_queue(url), threads=threads, poll_interval=poll_interval).run(stop)
+
+
+def run_worker_pool(url=None, processes=2, threads=1, poll_interval=0.25):
+    """Run `processes` worker processes until SIGINT or SIGTERM, replacing any that die"""
+    stop = multiprocessing.Event()
+    # Setting the shared event inside a signal handler can deadlock against a
+    # wait on it in progress, so the handler only records the signal
+    stopping = []
+
+    def shutdown(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    def spawn():
+        process = multiprocessing.Process(target=_worker_process, args=(url, threads, poll_interval, stop),
+                                          daemon=True)
+        process.start()
+        return process
+
+    workers = [spawn() for _ in range(processes)]
+    print(f"Grading workers started: {processes} processes x {threads} threads")
+    while not stopping:
+        time.sleep(0.2)
+        for i, process in enumerate(workers):
+            if stopping:
+                break
+            if not process.is_alive():
+                print(f"Grading worker {process.pid} exited with {process.exitcode}; restarting")
+                workers[i] = spawn()
+    stop.set()
+    for process in workers:
+        process.join(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("worker", "stats"))
+    parser.add_argument("--queue", default=None, help="queue URL or SQLite path (default: GRADING_QUEUE_URL)")
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=1, help="jobs each process works on at once")
+    parser.add_argument("--poll-interval", type=float, default=0.25, help="longest idle wait between claims")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        print(json.dumps(create_job_queue(args.queue).stats(), indent=2))
+    else:
+        run_worker_pool(args.queue, processes=args.processes, threads=args.threads,
+                        poll_interval=args.poll_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""gunicorn settings for server.py, picked up automatically when started from the repository root:
+
+    gunicorn server:app
+
+The app is imported once in the master and every worker is forked from
+it, so the question bank, compiled matchers, prompt templates and the
+precompressed static assets exist once in memory and are shared
+copy-on-write. The collector is kept off those shared objects with
+gc.freeze(), as scanning them would dirty every page they sit on.
+GUNICORN_PRELOAD=0 goes back to importing the app in each worker.
+"""
+import gc
+import os
+import sys
+
+import event_bus
+import profiler
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+# One worker by default: live interview sessions are kept in the memory of the worker that
+# started them, so a second worker would reject answers for sessions it never saw
+workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+# Threaded workers, so a long-lived event stream does not hold a whole worker
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+if preload_app:
+    os.environ["PRELOADED_APP"] = "1"
+    # Nothing is collected while the app is imported, so the objects it builds pack tightly
+    # into pages that are never written again; each worker re-enables collection after fork
+    gc.disable()
+
+
+def log_memory(log, label, pid="self"):
+    usage = profiler.memory_usage(pid)
+    if usage is not None:
+        log.info("%s memory: rss %.1f MB, pss %.1f MB, shared %.1f MB, private %.1f MB", label,
+                 usage["rss"] / 1e6, usage["pss"] / 1e6,
+                 (usage["shared_clean"] + usage["shared_dirty"]) / 1e6, usage["uss"] / 1e6)
+
+
+def on_starting(server):
+    # An in-process event bus only reaches streams held open by the worker that published,
+    # so a client streaming from one worker would never see another worker's events;
+    # EVENT_BUS_LOCAL_OK=1 is for deployments that route every request of a session to one worker
+    if server.cfg.workers > 1 and not event_bus.is_cross_process() and \
+            os.environ.get("EVENT_BUS_LOCAL_OK", "0") != "1":
+        raise RuntimeError(f"{server.cfg.workers} workers need EVENT_BUS_URL set to a redis:// URL, "
+                           "or set WEB_CONCURRENCY=1")
+    # Workers that import the app themselves would each sign session tokens with their own random secret
+    if server.cfg.workers > 1 and not server.cfg.preload_app and not os.environ.get("SESSION_TOKEN_SECRET"):
+        raise RuntimeError(f"{server.cfg.workers} workers without GUNICORN_PRELOAD need SESSION_TOKEN_SECRET set")
+
+
+def when_ready(server):
+    if preload_app:
+        sys.modules["server"].warm_shared_state()
+        log_memory(server.log, "master")
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        gc.enable()
+
+
+def post_worker_init(worker):
+    # After the worker has installed its own signal handlers, which would replace the app's
+    if preload_app:
+        sys.modules["server"].start_worker()
+    log_memory(worker.log, f"worker {worker.pid}")
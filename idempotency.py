@@ -0,0 +1,192 @@
+import functools
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from flask import current_app, jsonify, request
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    state TEXT NOT NULL,
+    claimed_at REAL NOT NULL,
+    status_code INTEGER,
+    mimetype TEXT,
+    body BLOB
+);
+CREATE INDEX IF NOT EXISTS idx_idempotency_claimed ON idempotency_keys (claimed_at);
+"""
+
+PENDING = "pending"
+DONE = "done"
+
+
+class KeyConflict(Exception):
+    """The key was already used for a request with a different body"""
+
+
+class KeyInProgress(Exception):
+    """Another request holding the key did not finish in time"""
+
+
+class IdempotencyStore:
+    """Bounded, TTL'd table of request keys and the responses they produced
+
+    The table lives in SQLite so that every worker process sees the same
+    claims: the first request to insert a key runs, and duplicates either
+    replay its stored response or wait for it to be stored.
+    """
+
+    def __init__(self, path, ttl=24 * 3600, max_entries=100000, lease=30.0,
+                 wait_timeout=10.0, poll_interval=0.05):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lease = lease
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._claims = 0
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def claim(self, key, fingerprint):
+        """Claim a key, returning None to go ahead or the stored (status, mimetype, body) to replay"""
+        conn = self._connect()
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            now = time.time()
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO idempotency_keys (key, fingerprint, state, claimed_at) VALUES (?, ?, ?, ?)",
+                (key, fingerprint, PENDING, now)
+            ).rowcount
+            if inserted:
+                self._maybe_prune()
+                return None
+
+            row = conn.execute(
+                "SELECT fingerprint, state, claimed_at, status_code, mimetype, body FROM idempotency_keys WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                # Pruned or released between the insert and the read; try again
+                continue
+            stored_fingerprint, state, claimed_at, status_code, mimetype, body = row
+            if stored_fingerprint != fingerprint:
+                raise KeyConflict(key)
+            if state == DONE:
+                if now - claimed_at <= self.ttl:
+                    return status_code, mimetype, body
+                conn.execute("DELETE FROM idempotency_keys WHERE key = ? AND claimed_at = ?", (key, claimed_at))
+                continue
+            if now - claimed_at > self.lease:
+                # The worker holding the claim died; take it over
+                taken = conn.execute(
+                    "UPDATE idempotency_keys SET claimed_at = ? WHERE key = ? AND state = ? AND claimed_at = ?",
+                    (now, key, PENDING, claimed_at)
+                ).rowcount
+                if taken:
+                    return None
+                continue
+            if time.monotonic() >= deadline:
+                raise KeyInProgress(key)
+            time.sleep(self.poll_interval)
+
+    def complete(self, key, status_code, mimetype, body):
+        self._connect().execute(
+            "UPDATE idempotency_keys SET state = ?, status_code = ?, mimetype = ?, body = ? WHERE key = ?",
+            (DONE, status_code, mimetype, body, key)
+        )
+
+    def release(self, key):
+        """Forget a claim so a retry runs the request again"""
+        self._connect().execute("DELETE FROM idempotency_keys WHERE key = ? AND state = ?", (key, PENDING))
+
+    def _maybe_prune(self):
+        self._claims += 1
+        if self._claims % 256:
+            return
+        conn = self._connect()
+        conn.execute("DELETE FROM idempotency_keys WHERE claimed_at < ?", (time.time() - self.ttl,))
+        conn.execute(
+            """
+            DELETE FROM idempotency_keys WHERE claimed_at < (
+                SELECT claimed_at FROM idempotency_keys ORDER BY claimed_at DESC LIMIT 1 OFFSET ?
+            )
+            """,
+            (self.max_entries - 1,)
+        )
+
+
+def request_key():
+    """The client's idempotency key, from the Idempotency-Key header or the JSON body"""
+    key = request.headers.get("Idempotency-Key")
+    if not key:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            key = data.get("idempotency_key")
+    return key
+
+
+def idempotent(store):
+    """Make a POST route replay its first response for repeated idempotency keys"""
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request_key()
+            if not key:
+                return view(*args, **kwargs)
+
+            scoped_key = f"{request.path}:{key}"
+            fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+            try:
+                stored = store.claim(scoped_key, fingerprint)
+            except KeyConflict:
+                return jsonify({"error": "Idempotency key reused with a different request"}), 422
+            except KeyInProgress:
+                response = jsonify({"error": "A request with this idempotency key is still in progress"})
+                response.status_code = 409
+                response.headers["Retry-After"] = "1"
+                return response
+
+            if stored is not None:
+                status_code, mimetype, body = stored
+                response = current_app.response_class(body, status=status_code, mimetype=mimetype)
+                response.headers["Idempotent-Replayed"] = "true"
+                return response
+
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+            except Exception:
+                store.release(scoped_key)
+                raise
+            if response.status_code >= 500:
+                # Server errors are worth retrying, so do not pin them to the key
+                store.release(scoped_key)
+            else:
+                store.complete(scoped_key, response.status_code, response.mimetype, response.get_data())
+            return response
+
+        return wrapper
+
+    return decorator
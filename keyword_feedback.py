@@ -0,0 +1,65 @@
+import re
+
+# "Look for: encapsulation, inheritance, polymorphism" in the desktop app's question templates
+TEMPLATE_PREFIX = re.compile(r"^\s*look for:\s*", re.IGNORECASE)
+
+# Runs of letters and digits in normalised text; answer_index splits answers with this too
+TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text):
+    """Lowercase text with every whitespace run folded to one space, as keywords are matched"""
+    return " ".join(text.lower().split())
+
+
+def tokenize(text):
+    return TOKEN.findall(normalize(text))
+
+
+def score_response(response, question_data):
+    """Split the question keywords into those covered and missed by a response"""
+    response_lower = normalize(response)
+    keywords_lower = question_data.get("keywords_lower") or [normalize(k) for k in question_data["keywords"]]
+    matched = []
+    missing = []
+    for keyword, keyword_lower in zip(question_data["keywords"], keywords_lower):
+        if keyword_lower in response_lower:
+            matched.append(keyword)
+        else:
+            missing.append(keyword)
+    return matched, missing
+
+
+def generate_feedback(response, question_data):
+    """Generate feedback based on response analysis"""
+    keywords = question_data["keywords"]
+
+    # Count keyword matches
+    matched, missing_keywords = score_response(response, question_data)
+    matches = len(matched)
+
+    # Generate feedback based on matches
+    if matches >= len(keywords) * 0.7:
+        feedback = "Excellent answer! You've covered the key concepts well. "
+    elif matches >= len(keywords) * 0.4:
+        feedback = "Good answer! You've touched on several important points. "
+    else:
+        feedback = "Thank you for your response. Let's explore this topic further. "
+
+    # Add specific feedback based on missing keywords
+    if missing_keywords:
+        feedback += f"Consider discussing: {', '.join(missing_keywords)}. "
+
+    # Add follow-up question
+    feedback += question_data.get("follow_up", "")
+
+    return feedback
+
+
+def template_question(question_data):
+    """Give a question written with a "Look for:" feedback template the keywords the scorer needs"""
+    if "keywords" in question_data:
+        return question_data
+    template = TEMPLATE_PREFIX.sub("", question_data.get("feedback_template", ""))
+    keywords = [keyword.strip() for keyword in template.split(",") if keyword.strip()]
+    return dict(question_data, keywords=keywords, follow_up="")
@@ -0,0 +1,252 @@
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+DEFAULT_BASE_URL = "https://api.openai.com"
+
+
+class LLMUnavailable(Exception):
+    """The model could not answer before the deadline, or is not being called at all"""
+
+
+class CircuitBreaker:
+    """Stops calling a failing backend until it has had time to recover
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    refuses every call for `reset_timeout` seconds. Then a single probe is
+    let through: success closes the breaker, failure reopens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._probing or self.clock() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self):
+        """Whether a call may go ahead; the caller must then report its outcome"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._probing and self.clock() - self._opened_at >= self.reset_timeout:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = self.clock()
+                self._probing = False
+
+
+class ConnectionPool:
+    """Keep-alive HTTP connections to one host, reused across calls"""
+
+    def __init__(self, base_url, size=8):
+        parts = urlsplit(base_url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.host = parts.hostname
+        self.port = parts.port
+        self.size = size
+        self._idle = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout):
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        if connection is None:
+            return self.connection_class(self.host, self.port, timeout=timeout), False
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        return connection, True
+
+    def release(self, connection, reusable=True):
+        if reusable:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(connection)
+                    return
+        connection.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for connection in idle:
+            connection.close()
+
+
+class LLMGateway:
+    """Chat completions with a latency budget, degrading to a local fallback
+
+    Every call gets a deadline (`timeout` seconds unless given). A call
+    degrades to its fallback instead of waiting when the deadline passes,
+    when `max_in_flight` calls are already out, or when the circuit
+    breaker is open after repeated failures. Connections are pooled and
+    kept alive, so a healthy backend costs one round trip per call.
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, api_key=None, model="gpt-3.5-turbo", max_in_flight=8,
+                 timeout=3.0, max_tokens=500, breaker=None, clock=time.monotonic):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.max_tokens = max_tokens
+        self.max_in_flight = max_in_flight
+        self.breaker = breaker or CircuitBreaker(clock=clock)
+        self.clock = clock
+        self.path = urlsplit(base_url).path.rstrip("/") + "/v1/chat/completions"
+        self.pool = ConnectionPool(base_url, size=max_in_flight)
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._counts = {}
+        self._counts_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        # The public API needs a key; a self-hosted or mock endpoint may not
+        return bool(self.api_key) or self.base_url != DEFAULT_BASE_URL
+
+    def complete(self, prompt, deadline=None, max_tokens=None):
+        """Return the model's reply, or raise LLMUnavailable"""
+        if not self.enabled:
+            raise LLMUnavailable("no API key configured")
+        if deadline is None:
+            deadline = self.clock() + self.timeout
+        if not self._slots.acquire(timeout=max(0.0, deadline - self.clock())):
+            raise LLMUnavailable("too many calls in flight")
+        try:
+            if not self.breaker.allow():
+                raise LLMUnavailable("circuit open")
+            try:
+                reply = self._request(prompt, deadline, max_tokens or self.max_tokens)
+            except LLMUnavailable:
+                self.breaker.record_failure()
+                raise
+            self.breaker.record_success()
+            return reply
+        finally:
+            self._slots.release()
+
+    def feedback(self, prompt, fallback, deadline=None):
+        """The model's reply to a prompt, or fallback() when it cannot arrive in time"""
+        try:
+            reply = self.complete(prompt, deadline)
+        except LLMUnavailable as e:
+            self._count(f"fallback: {e}")
+            return fallback()
+        self._count("model")
+        return reply
+
+    def _request(self, prompt, deadline, max_tokens):
+        body = json.dumps({
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens
+        }).encode()
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+
+        # A second attempt covers a pooled connection the server has since
+        # closed, or a transient 5xx, when the deadline still leaves room
+        for attempt in range(2):
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                raise LLMUnavailable("deadline exceeded")
+            connection, reused = self.pool.acquire(remaining)
+            try:
+                connection.request("POST", self.path, body=body, headers=headers)
+                # getresponse() drops the connection's socket when the server will close it
+                sock = connection.sock
+                response = connection.getresponse()
+                data = self._read_body(sock, response, deadline)
+            except (socket.timeout, LLMUnavailable):
+                self.pool.release(connection, reusable=False)
+                raise LLMUnavailable("deadline exceeded")
+            except (OSError, http.client.HTTPException) as e:
+                self.pool.release(connection, reusable=False)
+                if reused and attempt == 0:
+                    continue
+                raise LLMUnavailable(f"connection failed: {e.__class__.__name__}")
+            self.pool.release(connection, reusable=not response.will_close)
+
+            if response.status >= 500 and attempt == 0:
+                continue
+            if response.status != 200:
+                raise LLMUnavailable(f"HTTP {response.status}")
+            try:
+                return json.loads(data)["choices"][0]["message"]["content"]
+            except (ValueError, KeyError, IndexError, TypeError):
+                raise LLMUnavailable("malformed response")
+        raise LLMUnavailable("retries exhausted")
+
+    def _read_body(self, sock, response, deadline):
+        """Read the body a piece at a time, each read bounded by what is left of the deadline
+
+        The socket timeout alone bounds a single read, so a server trickling
+        its body could otherwise hold the call, its slot and its connection
+        well past the deadline.
+        """
+        chunks = []
+        while True:
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                raise LLMUnavailable("deadline exceeded")
+            sock.settimeout(remaining)
+            chunk = response.read1(16384)
+            if not chunk:
+                # read1() leaves a fully read response open, and the pool would reuse it as busy
+                response.close()
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+    def _count(self, outcome):
+        with self._counts_lock:
+            self._counts[outcome] = self._counts.get(outcome, 0) + 1
+
+    def stats(self):
+        with self._counts_lock:
+            counts = dict(self._counts)
+        return {"outcomes": counts, "breaker": self.breaker.state}
+
+
+def gateway_from_environment():
+    """Gateway configured from OPENAI_API_KEY and the LLM_* environment variables"""
+    return LLMGateway(
+        base_url=os.environ.get("LLM_BASE_URL", DEFAULT_BASE_URL),
+        api_key=os.environ.get("OPENAI_API_KEY"),
+        model=os.environ.get("LLM_MODEL", "gpt-3.5-turbo"),
+        max_in_flight=int(os.environ.get("LLM_MAX_IN_FLIGHT", "8")),
+        # Feedback latency budget in seconds; past it the keyword scorer answers
+        timeout=float(os.environ.get("LLM_TIMEOUT", "3")),
+        breaker=CircuitBreaker(
+            failure_threshold=int(os.environ.get("LLM_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.environ.get("LLM_BREAKER_RESET", "30"))
+        )
+    )
@@ -0,0 +1,161 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+
+from keyword_feedback import tokenize
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    answer_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    question INTEGER NOT NULL,
+    session_id TEXT NOT NULL,
+    signature BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    question INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    answer_id INTEGER NOT NULL,
+    PRIMARY KEY (question, bucket, answer_id)
+) WITHOUT ROWID;
+"""
+
+# Word n-grams compared between answers
+SHINGLE_WORDS = 3
+# Answers shorter than this many words are too generic to call copied
+MIN_WORDS = 20
+# Each MinHash value is a 32-bit unsigned integer
+SIGNATURE_BYTES = 4
+# Signatures compared per check at most, should one answer have been copied very widely
+MAX_CANDIDATES = 1000
+
+
+def shingles(text, size=SHINGLE_WORDS):
+    """The distinct word n-grams of a text, split the way the keyword scorer reads it"""
+    words = tokenize(text)
+    return {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))} if words else set()
+
+
+def minhash(text_shingles, permutations):
+    """MinHash signature: per hash function, the smallest hash of any shingle
+
+    SHAKE-128 output serves as `permutations` independent 32-bit hash
+    functions at once, so each shingle costs one hashlib call and the
+    minimum is taken column-wise in C.
+    """
+    digests = [array("I", hashlib.shake_128(shingle.encode()).digest(permutations * SIGNATURE_BYTES))
+               for shingle in text_shingles]
+    return array("I", map(min, *digests)) if len(digests) > 1 else digests[0]
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity: the fraction of hash functions whose minimums agree"""
+    return sum(a == b for a, b in zip(signature, other)) / len(signature)
+
+
+def question_key(question):
+    return int.from_bytes(hashlib.blake2b(question.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+class PlagiarismDetector:
+    """Near-duplicate answers to the same question, found with MinHash and LSH
+
+    Every answer long enough to judge gets a MinHash signature over its
+    word 3-grams. The signature is cut into `bands` bands of `rows` values
+    and each band hashed to a bucket; answers sharing any bucket become
+    candidates, and only candidates have their signatures compared. With
+    40 bands of 3 rows an answer pair with Jaccard similarity 0.5 shares a
+    bucket with probability 0.995, and one at 0.05 with probability 0.005,
+    so a check costs one indexed lookup of `bands` buckets plus a handful
+    of signature comparisons, however many answers came before.
+    """
+
+    def __init__(self, path, threshold=0.5, bands=40, rows=3, min_words=MIN_WORDS):
+        self.path = path
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        self.permutations = bands * rows
+        self.min_words = min_words
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def signature(self, text):
+        """The MinHash signature of an answer, or None if it is too short to judge"""
+        if len(tokenize(text)) < self.min_words:
+            return None
+        return minhash(shingles(text), self.permutations)
+
+    def buckets(self, signature):
+        band_bytes = self.rows * SIGNATURE_BYTES
+        data = signature.tobytes()
+        return [int.from_bytes(hashlib.blake2b(data[i * band_bytes:(i + 1) * band_bytes],
+                                               digest_size=8, person=i.to_bytes(2, "big")).digest(),
+                               "big", signed=True)
+                for i in range(self.bands)]
+
+    def check(self, session_id, question, response):
+        """Record an answer and return its closest earlier match from another session, if any
+
+        A match is a dict with the matching answer's session_id, answer_id
+        and estimated similarity, at or above `threshold`.
+        """
+        signature = self.signature(response)
+        if signature is None:
+            return None
+        key = question_key(question)
+        buckets = self.buckets(signature)
+        conn = self._connect()
+        candidates = conn.execute(
+            f"""
+            SELECT DISTINCT s.answer_id, s.session_id, s.signature FROM buckets b
+            JOIN signatures s ON s.answer_id = b.answer_id
+            WHERE b.question = ? AND b.bucket IN ({','.join('?' * len(buckets))}) AND s.session_id != ?
+            LIMIT ?
+            """,
+            [key] + buckets + [session_id, MAX_CANDIDATES]
+        ).fetchall()
+
+        best = None
+        for answer_id, other_session, other_signature in candidates:
+            score = similarity(signature, array("I", other_signature))
+            if score >= self.threshold and (best is None or score > best["similarity"]):
+                best = {"answer_id": answer_id, "session_id": other_session, "similarity": round(score, 3)}
+
+        with conn:
+            answer_id = conn.execute(
+                "INSERT INTO signatures (question, session_id, signature) VALUES (?, ?, ?)",
+                (key, session_id, signature.tobytes())
+            ).lastrowid
+            conn.executemany(
+                "INSERT OR IGNORE INTO buckets (question, bucket, answer_id) VALUES (?, ?, ?)",
+                [(key, bucket, answer_id) for bucket in buckets]
+            )
+        return best
+
+    def stats(self):
+        conn = self._connect()
+        return {
+            "answers": conn.execute("SELECT COALESCE(MAX(answer_id), 0) FROM signatures").fetchone()[0],
+            "threshold": self.threshold,
+            "bands": self.bands,
+            "rows": self.rows
+        }
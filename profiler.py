@@ -0,0 +1,232 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import nullcontext
+
+# Returned by span() while tracing is off, so a disabled span costs one call
+_NO_SPAN = nullcontext()
+
+
+class SamplingProfiler:
+    """Samples every thread's stack on a timer thread and keeps per-second counts
+
+    Stacks are stored collapsed (root;...;leaf), the input format of
+    flamegraph.pl and speedscope. Counts are bucketed by second and kept
+    for `retention` seconds, so any recent window can be read back after
+    a latency spike without having had to start a capture beforehand.
+    """
+
+    def __init__(self, interval=0.02, retention=300, max_depth=64):
+        self.interval = interval
+        self.retention = retention
+        self.max_depth = max_depth
+        self._buckets = deque()
+        self._codes = {}
+        self._labels = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        max_depth = self.max_depth
+        codes = self._codes
+        while not self._stop.wait(self.interval):
+            second = int(time.time())
+            samples = []
+            # Stacks are keyed by code object ids, which hash far cheaper than
+            # the code objects themselves; labels are built when a window is read
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < max_depth:
+                    code = frame.f_code
+                    code_id = id(code)
+                    if code_id not in codes:
+                        # Holding the code object keeps its id from being reused
+                        codes[code_id] = code
+                    stack.append(code_id)
+                    frame = frame.f_back
+                samples.append(tuple(stack))
+
+            with self._lock:
+                if not self._buckets or self._buckets[-1][0] != second:
+                    self._buckets.append((second, Counter()))
+                    while self._buckets[0][0] <= second - self.retention:
+                        self._buckets.popleft()
+                self._buckets[-1][1].update(samples)
+
+    def _label(self, code_id):
+        label = self._labels.get(code_id)
+        if label is None:
+            code = self._codes[code_id]
+            label = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+            self._labels[code_id] = label
+        return label
+
+    def collapsed(self, seconds=60):
+        """Return the collapsed stacks sampled over the last `seconds` seconds"""
+        since = int(time.time()) - seconds
+        totals = Counter()
+        label = self._label
+        with self._lock:
+            for second, counts in self._buckets:
+                if second >= since:
+                    totals.update(counts)
+        return "".join(
+            f"{';'.join(label(code_id) for code_id in reversed(stack))} {count}\n"
+            for stack, count in totals.most_common()
+        )
+
+
+class Tracer:
+    """Named timing spans around hot-path stages of a request
+
+    Durations are collected per request and reported in a Server-Timing
+    header, and folded into process-wide totals for the admin endpoint.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._totals = {}
+        self._lock = threading.Lock()
+        # Spans of the request being handled on this thread; a plain thread
+        # local is several times cheaper to reach than flask.g
+        self._current = threading.local()
+
+    def span(self, name):
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, name)
+
+    def _record(self, name, duration):
+        spans = getattr(self._current, "spans", None)
+        if spans is not None:
+            spans.append((name, duration))
+        with self._lock:
+            count, total, worst = self._totals.get(name, (0, 0.0, 0.0))
+            self._totals[name] = (count + 1, total + duration, max(worst, duration))
+
+    def totals(self):
+        with self._lock:
+            return {
+                name: {"count": count, "total_ms": total * 1000, "mean_ms": total * 1000 / count,
+                       "max_ms": worst * 1000}
+                for name, (count, total, worst) in self._totals.items()
+            }
+
+    def init_app(self, app):
+        if not self.enabled:
+            return
+
+        @app.before_request
+        def start_trace():
+            self._current.spans = []
+
+        @app.after_request
+        def add_server_timing(response):
+            spans = getattr(self._current, "spans", None)
+            self._current.spans = None
+            if spans:
+                response.headers["Server-Timing"] = ", ".join(
+                    f"{name};dur={duration * 1000:.3f}" for name, duration in spans
+                )
+            return response
+
+        # Time JSON serialisation inside every jsonify() call
+        tracer = self
+        if hasattr(app, "json") and hasattr(app.json, "dumps"):
+            provider_dumps = app.json.dumps
+
+            def dumps(obj, **kwargs):
+                with tracer.span("json"):
+                    return provider_dumps(obj, **kwargs)
+
+            app.json.dumps = dumps
+        else:
+            base_encoder = app.json_encoder
+
+            class TracedJSONEncoder(base_encoder):
+                def encode(self, o):
+                    with tracer.span("json"):
+                        return super().encode(o)
+
+            app.json_encoder = TracedJSONEncoder
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "started")
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer._record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+# smaps_rollup fields reported by memory_usage, in the order the kernel writes them
+MEMORY_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty", "Swap")
+
+
+def memory_usage(pid="self"):
+    """Resident memory of a process in bytes, split into shared and private pages, or None off Linux
+
+    `uss` (private pages) is what the process would give back if it
+    exited; `pss` charges each shared page in equal parts to the processes
+    sharing it, so summing it over workers gives their true total.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", 'r') as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    usage = {}
+    for line in lines:
+        name, _, value = line.partition(":")
+        if name in MEMORY_FIELDS:
+            usage[name.lower()] = int(value.split()[0]) * 1024
+    usage["uss"] = usage.get("private_clean", 0) + usage.get("private_dirty", 0)
+    return usage
+
+
+def child_pids(parent):
+    """Pids of the live children of a process, read from /proc"""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", 'r') as f:
+                # The command name may hold spaces and parentheses; ppid is the second field after it
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == parent:
+            children.append(int(entry))
+    return sorted(children)
@@ -0,0 +1,210 @@
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# Words, digit runs, line breaks or runs of spaces, and single punctuation marks:
+# roughly the pieces a BPE tokenizer starts from. A single space rides along with a word.
+TOKEN_PIECE = re.compile(r"[A-Za-z]+|\d+|[ \t]*\n\s*|[ \t]{2,}|[^\sA-Za-z\d]")
+
+REVIEW_CRITERIA = """Please provide detailed feedback on this interview response, considering:
+1. Content relevance and completeness
+2. Structure and clarity
+3. Specific improvements needed
+4. Positive aspects of the response"""
+
+BATCH_INSTRUCTIONS = """Review each numbered interview answer below. For every answer give detailed feedback covering:
+1. Content relevance and completeness
+2. Structure and clarity
+3. Specific improvements needed
+4. Positive aspects of the response
+Reply with only a JSON object mapping each answer number to its feedback, e.g. {"1": "...", "2": "..."}."""
+
+# The prompt the desktop app used to build, kept to measure what the templates save
+LEGACY_PROMPT = """
+            Question: {question}
+            Response: {response}
+            Key points to consider: {key_points}
+
+            Please provide detailed feedback on this interview response, considering:
+            1. Content relevance and completeness
+            2. Structure and clarity
+            3. Specific improvements needed
+            4. Positive aspects of the response
+            """
+
+
+def estimate_tokens(text):
+    """Approximate BPE token count without a tokenizer
+
+    Common English words are one token and longer words one more per six
+    letters; digits go in threes, and punctuation marks, line breaks and
+    indentation runs count one each.
+    Good to about a tenth on interview prose, which is enough to budget by.
+    """
+    return sum(map(_piece_tokens, TOKEN_PIECE.findall(text)))
+
+
+def _piece_tokens(piece):
+    length = len(piece)
+    if length == 1 or piece[0].isspace():
+        return 1
+    if piece[0].isdigit():
+        return (length + 2) // 3
+    return 1 + (length - 1) // 6
+
+
+LEGACY_OVERHEAD_TOKENS = estimate_tokens(LEGACY_PROMPT.format(question="", response="", key_points=""))
+
+
+class FeedbackTemplate:
+    """The prompt for one question, with everything but the answer rendered once
+
+    The static text comes first and the answer last, so every prompt for a
+    question shares one byte-identical prefix that a provider's prompt
+    cache can reuse.
+    """
+
+    __slots__ = ("prefix", "prefix_tokens", "legacy_tokens")
+
+    def __init__(self, question, key_points):
+        self.prefix = f"{REVIEW_CRITERIA}\n\nQuestion: {question}\nKey points to consider: {key_points}\nResponse: "
+        self.prefix_tokens = estimate_tokens(self.prefix)
+        self.legacy_tokens = LEGACY_OVERHEAD_TOKENS + estimate_tokens(question) + estimate_tokens(key_points)
+
+    def render(self, response):
+        return self.prefix + response
+
+
+class PromptBuilder:
+    """Builds feedback prompts from cached per-question templates and trims long answers
+
+    Answers over `response_budget` estimated tokens keep their opening
+    and closing parts with the middle elided. Counters record the tokens
+    sent and the tokens saved against the old prompt: by trimming, and by
+    the leaner template layout (and shared instructions, for batches).
+    """
+
+    def __init__(self, response_budget=600, max_templates=1024):
+        self.response_budget = response_budget
+        self.max_templates = max_templates
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"prompts": 0, "answers": 0, "prompt_tokens": 0, "trimmed_answers": 0,
+                        "tokens_saved_trimming": 0, "tokens_saved_template": 0,
+                        "templates_compiled": 0, "template_hits": 0}
+
+    def template(self, question, key_points):
+        key = (question, key_points)
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                self._counts["template_hits"] += 1
+                return template
+        template = FeedbackTemplate(question, key_points)
+        with self._lock:
+            self._templates[key] = template
+            self._counts["templates_compiled"] += 1
+            while len(self._templates) > self.max_templates:
+                self._templates.popitem(last=False)
+        return template
+
+    def trim(self, response):
+        """Return the answer cut to the token budget, its estimated tokens and the untrimmed count"""
+        tokens = estimate_tokens(response)
+        if tokens <= self.response_budget:
+            return response, tokens, tokens
+
+        # Keep the opening two thirds of the budget and the closing third
+        head_budget = self.response_budget * 2 // 3
+        tail_budget = self.response_budget - head_budget
+        head_end = _cut_after(response, head_budget)
+        tail_start = max(head_end, _cut_before(response, tail_budget))
+        omitted = tokens - estimate_tokens(response[:head_end]) - estimate_tokens(response[tail_start:])
+        trimmed = f"{response[:head_end]} [... {omitted} tokens omitted ...] {response[tail_start:]}"
+        return trimmed, estimate_tokens(trimmed), tokens
+
+    def feedback_prompt(self, question, response, key_points):
+        template = self.template(question, key_points)
+        trimmed, response_tokens, original_tokens = self.trim(response)
+        prompt_tokens = template.prefix_tokens + response_tokens
+        self._count(prompts=1, answers=1, prompt_tokens=prompt_tokens,
+                    trimmed_answers=int(trimmed is not response),
+                    tokens_saved_trimming=original_tokens - response_tokens,
+                    tokens_saved_template=template.legacy_tokens - template.prefix_tokens)
+        return template.render(trimmed)
+
+    def batch_prompt(self, items):
+        """One prompt for several (question, key points, answer) items, answers numbered in order
+
+        Instructions are written once and each question once, with its
+        answers beneath as JSON strings so one candidate's text cannot
+        pose as another's answer.
+        """
+        groups = OrderedDict()
+        trimmed_answers = saved_trimming = legacy_tokens = 0
+        for number, (question, key_points, response) in enumerate(items, 1):
+            trimmed, response_tokens, original_tokens = self.trim(response)
+            trimmed_answers += int(trimmed is not response)
+            saved_trimming += original_tokens - response_tokens
+            # What this answer would have cost as its own old-style prompt, after trimming
+            legacy_tokens += self.template(question, key_points).legacy_tokens + response_tokens
+            groups.setdefault((question, key_points), []).append(f"Answer {number}: {json.dumps(trimmed)}")
+
+        sections = [BATCH_INSTRUCTIONS]
+        for (question, key_points), answers in groups.items():
+            sections.append("\n".join([f"Question: {question}", f"Key points to consider: {key_points}"] + answers))
+        prompt = "\n\n".join(sections)
+
+        prompt_tokens = estimate_tokens(prompt)
+        answer_count = sum(len(answers) for answers in groups.values())
+        self._count(prompts=1, answers=answer_count, prompt_tokens=prompt_tokens,
+                    trimmed_answers=trimmed_answers, tokens_saved_trimming=saved_trimming,
+                    tokens_saved_template=legacy_tokens - prompt_tokens)
+        return prompt
+
+    def _count(self, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                self._counts[key] += value
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        counts["tokens_saved"] = counts["tokens_saved_trimming"] + counts["tokens_saved_template"]
+        return counts
+
+
+def _cut_after(text, budget):
+    """Character offset just past the leading pieces that fit in `budget` tokens"""
+    spent = 0
+    end = 0
+    for match in TOKEN_PIECE.finditer(text):
+        spent += _piece_tokens(match.group())
+        if spent > budget:
+            break
+        end = match.end()
+    return end
+
+
+def _cut_before(text, budget):
+    """Character offset of the first of the trailing pieces that fit in `budget` tokens"""
+    # A token covers at most a few characters outside whitespace runs, so only
+    # a bounded window at the end needs scanning, however long the text is
+    window_start = max(0, len(text) - budget * 16)
+    pieces = list(TOKEN_PIECE.finditer(text, window_start))
+    spent = 0
+    start = len(text)
+    for match in reversed(pieces):
+        spent += _piece_tokens(match.group())
+        if spent > budget:
+            break
+        start = match.start()
+    return start
+
+
+def builder_from_environment():
+    """Prompt builder with the answer budget from LLM_RESPONSE_TOKEN_BUDGET"""
+    return PromptBuilder(response_budget=int(os.environ.get("LLM_RESPONSE_TOKEN_BUDGET", "600")))
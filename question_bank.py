@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import signal
+import threading
+
+from keyword_feedback import normalize
+
+
+class QuestionBank:
+    """Interview questions by type, with each question's keyword matcher compiled once
+
+    Compiled questions are copies of the source dicts carrying an extra
+    `keywords_lower` tuple, so scoring an answer never re-lowercases the
+    keywords. Build one per process and share it across requests. A bank
+    is never modified once built; `version` is a hash of its content, the
+    same in every worker that loaded the same questions.
+    """
+
+    def __init__(self, questions, version=None):
+        self.questions = {
+            interview_type: [compile_question(question) for question in type_questions]
+            for interview_type, type_questions in questions.items()
+        }
+        self.version = version or content_version(questions)
+
+    def __contains__(self, interview_type):
+        return interview_type in self.questions
+
+    def __getitem__(self, interview_type):
+        return self.questions[interview_type]
+
+    def types(self):
+        return list(self.questions)
+
+
+def compile_question(question):
+    return dict(question, keywords_lower=tuple(normalize(keyword) for keyword in question["keywords"]))
+
+
+def content_version(questions):
+    return hashlib.blake2b(json.dumps(questions, sort_keys=True).encode(), digest_size=6).hexdigest()
+
+
+def validate_questions(questions):
+    """Raise ValueError unless questions maps each type to a non-empty list of questions with keywords"""
+    if not isinstance(questions, dict) or not questions:
+        raise ValueError("Questions must be an object mapping interview types to question lists")
+    for interview_type, type_questions in questions.items():
+        if not isinstance(type_questions, list) or not type_questions:
+            raise ValueError(f"{interview_type}: needs a non-empty list of questions")
+        for index, question in enumerate(type_questions):
+            if not isinstance(question, dict) or not isinstance(question.get("question"), str):
+                raise ValueError(f"{interview_type}[{index}]: needs a \"question\" string")
+            keywords = question.get("keywords")
+            if not isinstance(keywords, list) or not all(isinstance(keyword, str) for keyword in keywords):
+                raise ValueError(f"{interview_type}[{index}]: needs a \"keywords\" list of strings")
+
+
+class ReloadingQuestionBank:
+    """The current QuestionBank, replaced whole when its JSON source file changes
+
+    A watcher thread checks the file's modification time and size every
+    `interval` seconds, or at once when `reload_signal` arrives. A changed
+    file is parsed, validated and compiled on that thread, `on_reload` is
+    given the new bank to warm anything derived from it, and only then is
+    `current` pointed at it. Requests read `current` once and keep using
+    what they got, so nothing on the request path waits for a reload, and
+    sessions that hold question lists from an older bank keep them.
+
+    Without a path, or until the file first loads, the bank is built from
+    `default`. A file that fails to load leaves the current bank in place.
+    """
+
+    def __init__(self, path=None, default=None, interval=2.0, on_reload=None):
+        self.path = path
+        self.interval = interval
+        self.on_reload = on_reload
+        self.reloads = 0
+        self._signature = None
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.current = None
+        if path is not None:
+            self.reload()
+        if self.current is None:
+            if default is None:
+                raise ValueError("No questions: the question file did not load and there is no default")
+            self.current = QuestionBank(default)
+
+    def __contains__(self, interview_type):
+        return interview_type in self.current
+
+    def __getitem__(self, interview_type):
+        return self.current[interview_type]
+
+    @property
+    def questions(self):
+        return self.current.questions
+
+    @property
+    def version(self):
+        return self.current.version
+
+    def types(self):
+        return self.current.types()
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload(self):
+        """Load the source file if it changed since the last load; return the new bank, or None"""
+        with self._lock:
+            signature = self._file_signature()
+            if signature is None or signature == self._signature:
+                return None
+            try:
+                with open(self.path, 'r') as f:
+                    questions = json.load(f)
+                validate_questions(questions)
+                bank = QuestionBank(questions)
+            except (OSError, ValueError) as e:
+                print(f"Error loading questions from {self.path}: {str(e)}")
+                self._signature = signature
+                return None
+            self._signature = signature
+            if self.current is not None and bank.version == self.current.version:
+                return None
+            if self.on_reload is not None:
+                try:
+                    self.on_reload(bank)
+                except Exception as e:
+                    print(f"Error preparing question bank {bank.version}: {str(e)}")
+            previous = self.current
+            self.current = bank
+            if previous is not None:
+                self.reloads += 1
+                print(f"Question bank reloaded: version {previous.version} -> {bank.version}")
+            return bank
+
+    def start(self, reload_signal=None):
+        """Start watching the source file, and reload on `reload_signal` too if one is given"""
+        if self.path is None:
+            return
+        if reload_signal is not None:
+            try:
+                signal.signal(reload_signal, lambda signum, frame: self._wake.set())
+            except ValueError:
+                # Handlers can only be installed from the main thread
+                print("Question bank reload signal not installed outside the main thread")
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._watch, name="question-bank-watcher", daemon=True)
+            self._thread.start()
+
+    def _watch(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Error reloading question bank: {str(e)}")
+
+    def stats(self):
+        return {"version": self.current.version, "source": self.path or "built-in", "reloads": self.reloads,
+                "types": len(self.current.questions)}
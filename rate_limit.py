@@ -0,0 +1,230 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, jsonify, request
+
+
+class MemoryBuckets:
+    """Token buckets for one worker process, in an LRU-bounded table"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, capacity, now=None):
+        """Spend one token; return 0 if allowed, else the seconds until a token is available"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = capacity
+                if len(self._buckets) >= self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                self._buckets.move_to_end(key)
+            wait = spend(tokens, rate)
+            self._buckets[key] = (tokens - 1 if not wait else tokens, now)
+        return wait
+
+
+class SQLiteBuckets:
+    """Token buckets shared by every worker process through one SQLite file
+
+    Idle buckets refill to capacity, so rows untouched for longer than a
+    full refill carry no state and are pruned; the newest max_keys rows
+    are kept beyond that.
+
+    Every take holds the write lock for a moment, so requests waiting on
+    it would serialise the workers behind each other. A take that cannot
+    get the lock within busy_timeout is metered by this process's own
+    buckets instead, counted in busy_fallbacks, so a flood contending
+    for the lock is still limited, per worker, rather than let through.
+    """
+
+    def __init__(self, path, max_keys=100000, busy_timeout=0.05):
+        self.path = path
+        self.max_keys = max_keys
+        self.busy_timeout = busy_timeout
+        self.busy_fallbacks = 0
+        self._fallback = MemoryBuckets(max_keys)
+        self._local = threading.local()
+        self._takes = 0
+        self._longest_refill = 0.0
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Bucket state is disposable, so skip fsync entirely
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_buckets_updated ON buckets (updated)")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, rate, capacity, now=None):
+        now = time.time() if now is None else now
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e) and "busy" not in str(e):
+                raise
+            self.busy_fallbacks += 1
+            return self._fallback.take(key, rate, capacity, now)
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+            wait = spend(tokens, rate)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens - 1 if not wait else tokens, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._takes += 1
+        self._longest_refill = max(self._longest_refill, capacity / rate)
+        if self._takes % 1024 == 0:
+            self.prune(now)
+        return wait
+
+    def prune(self, now):
+        conn = self._connect()
+        conn.execute("DELETE FROM buckets WHERE updated < ?", (now - self._longest_refill,))
+        conn.execute(
+            "DELETE FROM buckets WHERE updated < (SELECT updated FROM buckets ORDER BY updated DESC LIMIT 1 OFFSET ?)",
+            (self.max_keys - 1,)
+        )
+
+
+def spend(tokens, rate):
+    """Return 0 if a token can be spent, else how long until one has refilled"""
+    if tokens >= 1:
+        return 0
+    return (1 - tokens) / rate
+
+
+class RateLimit:
+    __slots__ = ("name", "rate", "capacity")
+
+    def __init__(self, name, rate, capacity):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+
+
+class AdmissionController:
+    """Per-IP and per-session token buckets plus a cap on requests in flight
+
+    Requests over a bucket's rate, or arriving while the worker already has
+    max_in_flight requests running, are shed with 429 and Retry-After
+    instead of queueing until latency collapses. A worker runs no more
+    requests at once than it has threads, so max_in_flight only sheds
+    when it is below the thread count; the threads above it stay free to
+    turn the excess away quickly and to serve the exempt endpoints.
+
+    With trusted_proxies set, the client address is the one that many
+    hops from the right of X-Forwarded-For, the last one a trusted proxy
+    appended; entries further left come from the client and are ignored.
+    """
+
+    def __init__(self, buckets, ip_limit, session_limit, max_in_flight=4,
+                 exempt_endpoints=(), trusted_proxies=0):
+        self.buckets = buckets
+        self.ip_limit = ip_limit
+        self.session_limit = session_limit
+        self.max_in_flight = max_in_flight
+        self.exempt_endpoints = set(exempt_endpoints)
+        self.trusted_proxies = trusted_proxies
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+
+    def client_ip(self):
+        if self.trusted_proxies and request.headers.get("X-Forwarded-For"):
+            forwarded = [address.strip() for address in request.headers["X-Forwarded-For"].split(",")]
+            return forwarded[-min(self.trusted_proxies, len(forwarded))]
+        return request.remote_addr or "unknown"
+
+    def session_id(self):
+        if request.view_args and request.view_args.get("session_id"):
+            return request.view_args["session_id"]
+        data = request.get_json(silent=True)
+        if isinstance(data, dict) and data.get("session_id"):
+            return str(data["session_id"])
+        return None
+
+    def check(self):
+        """Return how long the client must wait, or 0 if the request may proceed"""
+        wait = self.buckets.take(f"ip:{self.client_ip()}", self.ip_limit.rate, self.ip_limit.capacity)
+        if wait:
+            return wait
+        session_id = self.session_id()
+        if session_id:
+            return self.buckets.take(f"session:{session_id}", self.session_limit.rate, self.session_limit.capacity)
+        return 0
+
+    def init_app(self, app):
+        @app.before_request
+        def admit_request():
+            if request.endpoint in self.exempt_endpoints:
+                return None
+            if not self._in_flight.acquire(blocking=False):
+                return too_many_requests(1, "Server is busy")
+            g.admission_slot = True
+            try:
+                wait = self.check()
+            except Exception as e:
+                # A broken limiter store must not take the API down with it
+                print(f"Error checking rate limits: {str(e)}")
+                wait = 0
+            if wait:
+                return too_many_requests(wait, "Too many requests")
+            return None
+
+        @app.teardown_request
+        def release_slot(exc=None):
+            if g.pop("admission_slot", False):
+                self._in_flight.release()
+
+
+def too_many_requests(wait, message):
+    response = jsonify({"error": message})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(max(1, math.ceil(wait)))
+    return response
+
+
+def from_environment(sessions_dir, exempt_endpoints=()):
+    """Build the admission controller configured by the RATE_LIMIT_* environment variables"""
+    max_keys = int(os.environ.get("RATE_LIMIT_MAX_KEYS", "100000"))
+    threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+    if os.environ.get("RATE_LIMIT_BACKEND", "sqlite") == "memory":
+        buckets = MemoryBuckets(max_keys)
+    else:
+        buckets = SQLiteBuckets(os.environ.get("RATE_LIMIT_DB_PATH", os.path.join(sessions_dir, "rate_limits.db")),
+                                max_keys, busy_timeout=float(os.environ.get("RATE_LIMIT_BUSY_TIMEOUT_MS", "50")) / 1000)
+    return AdmissionController(
+        buckets,
+        ip_limit=RateLimit("ip", float(os.environ.get("RATE_LIMIT_IP_RATE", "20")),
+                           float(os.environ.get("RATE_LIMIT_IP_BURST", "60"))),
+        session_limit=RateLimit("session", float(os.environ.get("RATE_LIMIT_SESSION_RATE", "2")),
+                                float(os.environ.get("RATE_LIMIT_SESSION_BURST", "20"))),
+        # Half the threads by default, so the rest can shed the excess and hold event streams
+        max_in_flight=int(os.environ.get("MAX_CONCURRENT_REQUESTS", max(1, threads // 2))),
+        exempt_endpoints=exempt_endpoints,
+        # Vercel puts one proxy in front of every function; count the proxies elsewhere, e.g. 1 behind nginx
+        trusted_proxies=int(os.environ.get("TRUST_X_FORWARDED_FOR", "1" if os.environ.get("VERCEL") else "0"))
+    )
@@ -0,0 +1,139 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this gain less from compression than it costs
+DEFAULT_MIN_SIZE = 1024
+
+COMPRESSIBLE_TYPES = ("application/json", "text/html", "text/css", "text/plain",
+                      "application/javascript", "text/javascript", "image/svg+xml")
+
+
+def negotiate_encoding(available):
+    """Pick the best of the available content codings the client accepts"""
+    accepted = request.accept_encodings
+    best, best_quality = None, 0
+    for encoding in available:
+        quality = accepted.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body, encoding, static=False):
+    """Compress a body, spending more effort on static assets that are compressed once"""
+    if encoding == "br":
+        return brotli.compress(body, quality=11 if static else 4)
+    return gzip.compress(body, compresslevel=9 if static else 6, mtime=0)
+
+
+def supported_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+class StaticAsset:
+    __slots__ = ("path", "mtime", "mimetype", "etag", "variants")
+
+    def __init__(self, path):
+        stat = os.stat(path)
+        with open(path, "rb") as f:
+            body = f.read()
+        self.path = path
+        self.mtime = stat.st_mtime
+        self.mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.etag = hashlib.sha1(body).hexdigest()[:20]
+        self.variants = {None: body}
+        if self.mimetype.startswith(COMPRESSIBLE_TYPES) and len(body) >= DEFAULT_MIN_SIZE:
+            for encoding in supported_encodings():
+                compressed = compress(body, encoding, static=True)
+                if len(compressed) < len(body):
+                    self.variants[encoding] = compressed
+
+
+class StaticAssetCache:
+    """Static files held in memory with their compressed variants built ahead of time"""
+
+    def __init__(self):
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def preload(self, paths):
+        """Load and precompress files, skipping any that are missing"""
+        for path in paths:
+            try:
+                self._load(path)
+            except OSError:
+                pass
+
+    def preload_directory(self, directory):
+        for root, _, filenames in os.walk(directory):
+            self.preload(os.path.join(root, filename) for filename in filenames)
+
+    def _load(self, path):
+        asset = StaticAsset(path)
+        with self._lock:
+            self._assets[path] = asset
+        return asset
+
+    def get(self, path):
+        """Return the cached asset, rebuilding it if the file changed on disk"""
+        asset = self._assets.get(path)
+        if asset is None or os.stat(path).st_mtime != asset.mtime:
+            asset = self._load(path)
+        return asset
+
+    def send(self, path, max_age=0):
+        """Serve an asset, answering 304 to a matching If-None-Match"""
+        asset = self.get(path)
+        encoding = negotiate_encoding([e for e in asset.variants if e is not None])
+        etag = f"{asset.etag}-{encoding}" if encoding else asset.etag
+
+        headers = {"Vary": "Accept-Encoding", "Cache-Control": f"public, max-age={max_age}"}
+        if request.if_none_match.contains(etag):
+            response = Response(status=304, headers=headers)
+        else:
+            response = Response(asset.variants[encoding], mimetype=asset.mimetype, headers=headers)
+            if encoding:
+                response.headers["Content-Encoding"] = encoding
+        response.set_etag(etag)
+        return response
+
+
+def init_app(app, min_size=DEFAULT_MIN_SIZE):
+    """Add ETags, conditional GETs and negotiated compression to dynamic responses"""
+
+    @app.after_request
+    def optimize_response(response):
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code != 200
+                or "Content-Encoding" in response.headers
+                or not response.mimetype.startswith(COMPRESSIBLE_TYPES)):
+            return response
+
+        # Conditional GET on the uncompressed body; the weak ETag holds for every coding
+        if request.method == "GET" and "ETag" not in response.headers:
+            response.set_etag(hashlib.sha1(response.get_data()).hexdigest()[:20], weak=True)
+            response.make_conditional(request)
+            if response.status_code == 304:
+                return response
+
+        response.vary.add("Accept-Encoding")
+        body = response.get_data()
+        if len(body) < min_size:
+            return response
+
+        encoding = negotiate_encoding(supported_encodings())
+        if encoding is None:
+            return response
+        response.set_data(compress(body, encoding))
+        response.headers["Content-Encoding"] = encoding
+        return response
@@ -1,10 +1,128 @@
-from flask import Flask, send_file, jsonify, request
+from flask import Flask, Response, abort, jsonify, request
+from werkzeug.utils import safe_join
+import hmac
 import json
 import os
+import signal
+import threading
 from datetime import datetime
+import grading_queue
+import llm_gateway
+import profiler
+import rate_limit
+import response_optimizer
+import session_storage
+from question_bank import ReloadingQuestionBank
+from event_bus import create_broker, session_channel
+from feedback_batcher import FeedbackBatcher
+from prompt_templates import builder_from_environment
+from idempotency import IdempotencyStore, idempotent
+from keyword_feedback import generate_feedback, score_response
+from answer_index import AnswerIndex
+from device_telemetry import DEVICES, SQLiteTelemetryStore
+from plagiarism import PlagiarismDetector
+from session_catalog import SessionCatalog
+from session_records import HistoryEntry, ViolationRecord, isoformat, serialize
+from violation_rules import ViolationRulesEngine
 
 app = Flask(__name__)
 
+# Where per-session violation files and the catalog live; only /tmp is writable on serverless hosts
+SESSIONS_DIR = os.environ.get('SESSIONS_DIR', 'sessions')
+
+# Sharded file stores for anti-cheating session files and saved interview records. Finished
+# sessions move to compressed archive segments under ARCHIVE_DIR (SESSION_ARCHIVE=0 keeps files).
+session_store = session_storage.sessions_store_from_environment()
+record_store = session_storage.records_store_from_environment()
+
+# Precompressed static assets plus ETags and negotiated compression for API responses.
+# Serverless entry points skip the preload since they never serve the frontend.
+static_assets = response_optimizer.StaticAssetCache()
+# Resolved against the app, not the working directory, like Flask's own static folder
+FRONTEND_INDEX = os.path.join(app.root_path, 'frontend', 'index.html')
+if os.environ.get('PRELOAD_STATIC_ASSETS', '1') == '1':
+    static_assets.preload([FRONTEND_INDEX])
+    static_assets.preload_directory(app.static_folder)
+response_optimizer.init_app(app)
+
+# Set by gunicorn.conf.py: this module is imported once in the gunicorn master and its workers
+# are forked from it. Threads do not survive fork, so each worker starts its own in start_worker().
+PRELOADED = os.environ.get('PRELOADED_APP', '0') == '1'
+
+# Opt-in stack sampling and per-request trace spans; both cost nothing unless PROFILING=1
+PROFILING = os.environ.get('PROFILING', '0') == '1'
+sampling_profiler = profiler.SamplingProfiler(interval=float(os.environ.get('PROFILER_INTERVAL', '0.02')))
+tracer = profiler.Tracer(enabled=PROFILING)
+tracer.init_app(app)
+if PROFILING and not PRELOADED:
+    sampling_profiler.start()
+
+# Token-bucket rate limits per IP and per session, and a cap on requests in flight.
+# Long-lived event streams and static files are not counted.
+admission = rate_limit.from_environment(SESSIONS_DIR, exempt_endpoints=('index', 'static', 'session_events'))
+if os.environ.get('RATE_LIMIT_ENABLED', '1') == '1':
+    admission.init_app(app)
+
+# Index of every session written, backing the /api/sessions query endpoint
+session_catalog = SessionCatalog(os.environ.get('SESSION_CATALOG_PATH', os.path.join(SESSIONS_DIR, 'catalog.db')))
+
+# Full-text index over every submitted answer, backing /api/search
+answer_index = AnswerIndex(os.environ.get('ANSWER_INDEX_PATH', os.path.join(SESSIONS_DIR, 'answers.db')),
+                           flush_interval=float(os.environ.get('ANSWER_INDEX_FLUSH_SECONDS', '1')))
+
+# Camera, microphone and tab focus on/off history per session, run-length encoded and shared by every worker
+device_telemetry = SQLiteTelemetryStore(
+    os.environ.get('TELEMETRY_DB_PATH', os.path.join(SESSIONS_DIR, 'telemetry.db')),
+    max_intervals=int(os.environ.get('TELEMETRY_MAX_INTERVALS', '2048'))
+)
+
+# Near-duplicate answers to the same question across sessions are recorded as plagiarism violations
+PLAGIARISM_DETECTION = os.environ.get('PLAGIARISM_DETECTION', '1') == '1'
+plagiarism_detector = PlagiarismDetector(
+    os.environ.get('PLAGIARISM_DB_PATH', os.path.join(SESSIONS_DIR, 'plagiarism.db')),
+    threshold=float(os.environ.get('PLAGIARISM_THRESHOLD', '0.5'))
+)
+
+# Responses remembered per Idempotency-Key so client retries are replayed, not re-applied
+idempotency_store = IdempotencyStore(os.environ.get('IDEMPOTENCY_DB_PATH', os.path.join(SESSIONS_DIR, 'idempotency.db')))
+
+# Server-side anti-cheating rules; VIOLATION_RULES may hold a JSON rule list or a path to one
+rules_engine = ViolationRulesEngine(os.environ.get('VIOLATION_RULES'))
+
+# Per-session push channel; set EVENT_BUS_URL to a redis:// URL to fan out across workers
+event_broker = create_broker()
+SSE_KEEPALIVE_SECONDS = 15
+# An open stream holds one of the worker's GUNICORN_THREADS threads for the whole interview, so only
+# SSE_MAX_STREAMS are served at once (a quarter of the threads by default), leaving the rest for
+# answers and anti-cheating reports; clients turned away poll /api/grading/<job_id> instead
+SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', max(1, int(os.environ.get('GUNICORN_THREADS', '8')) // 4)))
+stream_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS)
+# Signs the per-session tokens that let a candidate's page read its own event stream and summary.
+# A random secret only holds within one process and the workers forked from it, so it must be set
+# whenever separate processes serve sessions: gunicorn.conf.py checks for workers without preload,
+# and serverless instances each import the app themselves.
+SESSION_TOKEN_SECRET = os.environ.get('SESSION_TOKEN_SECRET', '').encode()
+if not SESSION_TOKEN_SECRET:
+    if os.environ.get('VERCEL'):
+        raise RuntimeError("SESSION_TOKEN_SECRET must be set on serverless hosts, where every instance signs alone")
+    SESSION_TOKEN_SECRET = os.urandom(32)
+
+# Model-written feedback is opt-in; the keyword scorer answers whenever the model
+# cannot within LLM_TIMEOUT seconds, or its circuit breaker is open
+LLM_FEEDBACK = os.environ.get('LLM_FEEDBACK', '0') == '1'
+feedback_gateway = llm_gateway.gateway_from_environment()
+# Prompts come from per-question templates, with answers trimmed to LLM_RESPONSE_TOKEN_BUDGET
+prompt_builder = builder_from_environment()
+# Answers submitted within LLM_BATCH_WINDOW_MS of each other share one model call; 0 turns batching off
+feedback_batcher = FeedbackBatcher(feedback_gateway, prompts=prompt_builder,
+                                   window=float(os.environ.get('LLM_BATCH_WINDOW_MS', '20')) / 1000,
+                                   max_batch=int(os.environ.get('LLM_BATCH_MAX', '16')))
+
+# GRADING_QUEUE=1 hands answers to the grading worker pool (python grading_queue.py worker)
+# instead of grading them inside the request; feedback then arrives as a session event
+GRADING_QUEUE = os.environ.get('GRADING_QUEUE', '0') == '1'
+grading_jobs = grading_queue.create_job_queue()
+
 # Interview questions and feedback templates
 INTERVIEW_QUESTIONS = {
     "Technical": [
@@ -333,35 +451,128 @@ INTERVIEW_QUESTIONS = {
     ]
 }
 
+def warm_question_bank(bank):
+    """Build a bank's prompt templates and exercise its keyword matchers before requests use it"""
+    for interview_type in bank.types():
+        for question in bank[interview_type]:
+            prompt_builder.template(question["question"], ", ".join(question["keywords"]))
+            score_response(question["question"], question)
+
+# Questions with their keyword matchers compiled once per process. With QUESTION_BANK_PATH set they
+# come from that JSON file (shaped like INTERVIEW_QUESTIONS) and are reloaded whenever it changes or
+# the process receives QUESTION_BANK_RELOAD_SIGNAL; sessions keep the questions they started with.
+QUESTION_BANK = ReloadingQuestionBank(os.environ.get('QUESTION_BANK_PATH'), default=INTERVIEW_QUESTIONS,
+                                      interval=float(os.environ.get('QUESTION_BANK_POLL_SECONDS', '2')),
+                                      on_reload=warm_question_bank)
+QUESTION_BANK_RELOAD_SIGNAL = getattr(signal, os.environ.get('QUESTION_BANK_RELOAD_SIGNAL', 'SIGUSR2'), None)
+if not PRELOADED:
+    QUESTION_BANK.start(QUESTION_BANK_RELOAD_SIGNAL)
+
+def warm_shared_state():
+    """Build the read-only state requests would otherwise build lazily, once per process
+
+    A preloading master calls this before forking so every worker shares
+    one copy: the feedback prompt template of every question, and the
+    keyword tokenizer's and scorer's regular expressions.
+    """
+    warm_question_bank(QUESTION_BANK.current)
+
+def start_worker():
+    """Start this process's background threads and signal handlers; gunicorn.conf.py calls it in each worker"""
+    if PROFILING:
+        sampling_profiler.start()
+    QUESTION_BANK.start(QUESTION_BANK_RELOAD_SIGNAL)
+    if GRADING_QUEUE:
+        grading_listener.start()
+
 # Store interview sessions
 interview_sessions = {}
 
+def push_event(session_id, event_type, **payload):
+    """Publish an event on a session's push channel without failing the request"""
+    try:
+        event_broker.publish(session_channel(session_id), dict(payload, type=event_type))
+    except Exception as e:
+        print(f"Error publishing {event_type} event: {str(e)}")
+
+def update_catalog(update, *args, **kwargs):
+    """Apply a session catalog update without failing the request on catalog errors"""
+    try:
+        with tracer.span("catalog"):
+            update(*args, **kwargs)
+    except Exception as e:
+        print(f"Error updating session catalog: {str(e)}")
+
+def record_telemetry(session_id, device, active):
+    """Extend a device's on/off timeline without failing the anti-cheating report on storage errors"""
+    try:
+        with tracer.span("store"):
+            device_telemetry.record(session_id, device, active)
+    except Exception as e:
+        print(f"Error recording device telemetry: {str(e)}")
+
+def index_answer(session_id, interview_type, entry):
+    """Make an answer searchable without failing the request on index errors"""
+    try:
+        with tracer.span("index"):
+            answer_index.add(session_id, interview_type, entry.question, entry.response,
+                             answered_at=isoformat(entry.timestamp))
+    except Exception as e:
+        print(f"Error indexing answer: {str(e)}")
+
 @app.route('/')
 def index():
-    return send_file('frontend/index.html')
+    if not os.path.isfile(FRONTEND_INDEX):
+        abort(404)
+    return static_assets.send(FRONTEND_INDEX)
+
+def serve_static(filename):
+    """Serve files under static/ from the precompressed asset cache"""
+    path = safe_join(app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    return static_assets.send(path, max_age=3600)
+
+app.view_functions['static'] = serve_static
 
 @app.route('/api/start_interview', methods=['POST'])
 def start_interview():
     data = request.json
     interview_type = data.get('type', 'Technical')
     
-    if interview_type not in INTERVIEW_QUESTIONS:
+    # The session keeps this version's questions even if the bank is reloaded while it runs
+    bank = QUESTION_BANK.current
+    if interview_type not in bank:
         return jsonify({"error": "Invalid interview type"}), 400
     
-    session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
-    interview_sessions[session_id] = {
+    session = {
         "type": interview_type,
         "current_question": 0,
-        "questions": INTERVIEW_QUESTIONS[interview_type],
-        "history": []
+        "questions": bank[interview_type],
+        "question_version": bank.version,
+        "history": [],
+        "summary": new_session_summary(interview_type)
     }
     
+    # Sessions started within the same second get a numeric suffix
+    started = datetime.now().strftime("%Y%m%d_%H%M%S")
+    session_id = started
+    suffix = 1
+    while interview_sessions.setdefault(session_id, session) is not session:
+        suffix += 1
+        session_id = f"{started}-{suffix}"
+    update_catalog(session_catalog.upsert, session_id, interview_type,
+                   started_at=datetime.now().isoformat())
+    
     return jsonify({
         "session_id": session_id,
-        "question": INTERVIEW_QUESTIONS[interview_type][0]["question"]
+        "question": session["questions"][0]["question"],
+        "question_version": bank.version,
+        "events_token": session_token(session_id)
     })
 
 @app.route('/api/submit_response', methods=['POST'])
+@idempotent(idempotency_store)
 def submit_response():
     data = request.json
     response = data.get('response', '')
@@ -370,55 +581,316 @@ def submit_response():
     if not session_id or session_id not in interview_sessions:
         return jsonify({"error": "No active interview session"}), 400
     
+    if rules_engine.is_terminated(session_id):
+        return jsonify({
+            "error": "Interview terminated",
+            "reason": rules_engine.termination_reason(session_id)
+        }), 403
+    
     session = interview_sessions[session_id]
     current_q = session["current_question"]
     question_data = session["questions"][current_q]
     
-    # Generate feedback
-    feedback = generate_feedback(response, question_data)
+    entry = HistoryEntry(question_data["question"], response)
     
-    # Save to history
-    session["history"].append({
-        "timestamp": datetime.now().isoformat(),
-        "question": question_data["question"],
-        "response": response,
-        "feedback": feedback
-    })
+    if GRADING_QUEUE:
+        # Scored and given feedback by a grading worker; see apply_grading_result. The entry is in
+        # the history and holds its job id before the listener can look for it.
+        with tracer.span("enqueue"), grading_lock:
+            session["history"].append(entry)
+            entry.grading_job = grading_jobs.enqueue("grade_answer", {
+                "session_id": session_id,
+                "question_index": current_q,
+                "question": question_data["question"],
+                "keywords": question_data["keywords"],
+                "follow_up": question_data.get("follow_up", ""),
+                "response": response
+            }, priority=grading_queue.PRIORITY_LIVE)
+    else:
+        # Generate feedback
+        with tracer.span("feedback"):
+            if LLM_FEEDBACK:
+                entry.feedback = feedback_batcher.feedback(
+                    question_data["question"], response, ", ".join(question_data["keywords"]),
+                    lambda: generate_feedback(response, question_data)
+                )
+            else:
+                entry.feedback = generate_feedback(response, question_data)
+            matched, _ = score_response(response, question_data)
+        
+        # Update running score aggregates
+        update_session_summary(session["summary"], current_q, len(matched), len(question_data["keywords"]))
+        update_catalog(session_catalog.upsert, session_id, score=session["summary"]["mean_coverage"],
+                       answered=session["summary"]["answered"])
+    
+        # Save to history
+        session["history"].append(entry)
+    
+    index_answer(session_id, session["type"], entry)
+    if PLAGIARISM_DETECTION:
+        check_plagiarism(session_id, entry)
+    feedback = entry.feedback
     
     # Move to next question
     session["current_question"] = (current_q + 1) % len(session["questions"])
     next_question = session["questions"][session["current_question"]]["question"]
     
-    return jsonify({
+    if not GRADING_QUEUE:
+        push_event(session_id, "feedback", feedback=feedback,
+                   coverage=session["summary"]["last_coverage"])
+    push_event(session_id, "next_question", question=next_question,
+               index=session["current_question"])
+    
+    result = {
         "feedback": feedback,
         "next_question": next_question,
         "session_id": session_id
+    }
+    if GRADING_QUEUE:
+        result["grading_job"] = entry.grading_job
+    return jsonify(result)
+
+def apply_grading_result(job):
+    """Fold a finished grading job into its session, if the session lives in this process"""
+    payload = job["payload"]
+    session_id = payload["session_id"]
+    session = interview_sessions.get(session_id)
+    if session is None:
+        return
+    
+    # A job that failed every attempt still gets the keyword scorer's feedback
+    result = job["result"] if job["state"] == grading_queue.DONE else grading_queue.keyword_grade(payload)
+    with grading_lock:
+        for entry in reversed(session["history"]):
+            if entry.grading_job == job["id"]:
+                entry.feedback = result["feedback"]
+                break
+    
+    update_session_summary(session["summary"], payload["question_index"], result["matched"], result["keywords"])
+    update_catalog(session_catalog.upsert, session_id, score=session["summary"]["mean_coverage"],
+                   answered=session["summary"]["answered"])
+    push_event(session_id, "feedback", feedback=result["feedback"],
+               coverage=session["summary"]["last_coverage"], grading_job=job["id"])
+
+# Reads finished jobs back from the queue. It starts before the first enqueue, at import or in
+# start_worker() under a preloading master, so its cursor is behind every job this process enqueues.
+grading_listener = grading_queue.GradingListener(grading_jobs, apply_grading_result)
+grading_lock = threading.Lock()
+if GRADING_QUEUE and not PRELOADED:
+    grading_listener.start()
+
+@app.route('/api/grading/<int:job_id>', methods=['GET'])
+def get_grading_job(job_id):
+    """State and result of a grading job, for clients that poll instead of listening for events"""
+    job = grading_jobs.get(job_id) if GRADING_QUEUE else None
+    if job is None or job["payload"]["session_id"] != request.args.get('session_id'):
+        return jsonify({"error": "No such grading job"}), 404
+    
+    return jsonify({
+        "job_id": job_id,
+        "state": job["state"],
+        "attempts": job["attempts"],
+        "feedback": job["result"]["feedback"] if job["result"] else None
     })
 
-def generate_feedback(response, question_data):
-    """Generate feedback based on response analysis"""
-    keywords = question_data["keywords"]
+def new_session_summary(interview_type):
+    """Create the running score aggregates kept alongside a session"""
+    return {
+        "answered": 0,
+        "coverage_total": 0.0,
+        "mean_coverage": 0.0,
+        "last_coverage": None,
+        "questions": {},
+        "categories": {
+            interview_type: {"answered": 0, "coverage_total": 0.0, "mean_coverage": 0.0}
+        },
+        "violations": {},
+        "violation_total": 0
+    }
+
+def update_session_summary(summary, question_index, matched, total):
+    """Fold one scored answer into the session aggregates in O(1)"""
+    coverage = matched / total if total else 0.0
     
-    # Count keyword matches
-    matches = sum(1 for keyword in keywords if keyword.lower() in response.lower())
+    summary["answered"] += 1
+    summary["coverage_total"] += coverage
+    summary["mean_coverage"] = summary["coverage_total"] / summary["answered"]
+    summary["last_coverage"] = coverage
     
-    # Generate feedback based on matches
-    if matches >= len(keywords) * 0.7:
-        feedback = "Excellent answer! You've covered the key concepts well. "
-    elif matches >= len(keywords) * 0.4:
-        feedback = "Good answer! You've touched on several important points. "
-    else:
-        feedback = "Thank you for your response. Let's explore this topic further. "
+    # JSON object keys are strings, so key questions the way they will be saved
+    question_stats = summary["questions"].setdefault(str(question_index), {
+        "attempts": 0,
+        "matched": 0,
+        "keywords": total,
+        "coverage": 0.0,
+        "best_coverage": 0.0
+    })
+    question_stats["attempts"] += 1
+    question_stats["matched"] = matched
+    question_stats["coverage"] = coverage
+    question_stats["best_coverage"] = max(question_stats["best_coverage"], coverage)
+    
+    for category in summary["categories"].values():
+        category["answered"] += 1
+        category["coverage_total"] += coverage
+        category["mean_coverage"] = category["coverage_total"] / category["answered"]
+
+def count_session_violation(session_id, violation_type):
+    """Add a violation to the aggregates of an active session, if there is one"""
+    session = interview_sessions.get(session_id)
+    if session is None:
+        return
+    summary = session["summary"]
+    summary["violations"][violation_type] = summary["violations"].get(violation_type, 0) + 1
+    summary["violation_total"] += 1
+
+@app.route('/api/sessions', methods=['GET'])
+def list_sessions():
+    """Query the session catalog with filters, sorting and cursor pagination"""
+    if not admin_authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    
+    args = request.args
+    terminated = args.get('terminated')
+    try:
+        sessions, next_cursor = session_catalog.query(
+            interview_type=args.get('type'),
+            terminated=None if terminated is None else terminated.lower() in ('1', 'true', 'yes'),
+            min_score=args.get('min_score', type=float),
+            max_score=args.get('max_score', type=float),
+            min_violations=args.get('min_violations', type=int),
+            started_after=args.get('started_after'),
+            started_before=args.get('started_before'),
+            sort=args.get('sort', 'started_at'),
+            order=args.get('order', 'desc').lower(),
+            limit=max(1, min(args.get('limit', 20, type=int), 100)),
+            cursor=args.get('cursor')
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify({
+        "sessions": sessions,
+        "next_cursor": next_cursor
+    })
+
+@app.route('/api/search', methods=['GET'])
+def search_answers():
+    """Full-text search over candidate answers, newest first, for reviewers holding the admin token"""
+    if not admin_authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    
+    args = request.args
+    query = args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+    try:
+        with tracer.span("search"):
+            answers, next_cursor = answer_index.search(
+                query,
+                interview_type=args.get('type'),
+                answered_after=args.get('answered_after'),
+                answered_before=args.get('answered_before'),
+                limit=max(1, min(args.get('limit', 20, type=int), 100)),
+                cursor=args.get('cursor')
+            )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify({
+        "answers": answers,
+        "next_cursor": next_cursor
+    })
+
+@app.route('/api/sessions/<session_id>/telemetry', methods=['GET'])
+def session_telemetry(session_id):
+    """Fraction of a time range each device was on, with its on/off intervals; times are epoch seconds"""
+    if not admin_authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    
+    args = request.args
+    devices = args.get('devices')
+    devices = devices.split(',') if devices else None
+    if devices and not set(devices) <= set(DEVICES):
+        return jsonify({"error": f"devices must be among: {', '.join(DEVICES)}"}), 400
+    
+    telemetry = device_telemetry.summary(
+        session_id,
+        start=args.get('start', type=float),
+        end=args.get('end', type=float),
+        devices=devices,
+        include_intervals=args.get('intervals', '1') != '0'
+    )
+    if telemetry is None:
+        return jsonify({"error": "No device telemetry for this session"}), 404
+    
+    return jsonify({
+        "session_id": session_id,
+        "devices": telemetry
+    })
+
+def format_sse(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+@app.route('/api/sessions/<session_id>/events', methods=['GET'])
+def session_events(session_id):
+    """Stream next questions, feedback, violation warnings and termination as server-sent events
+
+    Open to admins, and to the candidate's page with the events_token that
+    start_interview returned, passed as ?token= since EventSource cannot
+    send headers.
+    """
+    if not session_authorized(session_id):
+        return jsonify({"error": "Forbidden"}), 403
+    # 204 tells EventSource not to reconnect, so the client falls back to polling
+    if not stream_slots.acquire(blocking=False):
+        return '', 204
+    
+    # Subscribe before responding so nothing published in between is lost
+    try:
+        subscription = event_broker.subscribe(session_channel(session_id))
+    except Exception:
+        stream_slots.release()
+        raise
     
-    # Add specific feedback based on missing keywords
-    missing_keywords = [k for k in keywords if k.lower() not in response.lower()]
-    if missing_keywords:
-        feedback += f"Consider discussing: {', '.join(missing_keywords)}. "
+    def stream():
+        yield "retry: 3000\n\n"
+        reason = rules_engine.termination_reason(session_id)
+        if reason is not None:
+            yield format_sse({"type": "terminated", "reason": reason})
+            return
+        while True:
+            event = subscription.get(timeout=SSE_KEEPALIVE_SECONDS)
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            yield format_sse(event)
+            if event["type"] == "terminated":
+                return
     
-    # Add follow-up question
-    feedback += question_data["follow_up"]
+    response = Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    response.call_on_close(subscription.close)
+    response.call_on_close(stream_slots.release)
+    return response
+
+@app.route('/api/sessions/<session_id>/summary', methods=['GET'])
+def get_session_summary(session_id):
+    """Return the running score aggregates for a session, to admins and to the holder of its events_token"""
+    if not session_authorized(session_id):
+        return jsonify({"error": "Forbidden"}), 403
     
-    return feedback
+    session = interview_sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": "No active interview session"}), 404
+    
+    return jsonify({
+        "session_id": session_id,
+        "type": session["type"],
+        "summary": session["summary"]
+    })
 
 @app.route('/api/save_interview', methods=['POST'])
 def save_interview():
@@ -429,20 +901,127 @@ def save_interview():
         return jsonify({"error": "No active interview session"}), 400
     
     session = interview_sessions[session_id]
-    filename = f"interview_record_{session_id}.json"
     
     try:
-        with open(filename, 'w') as f:
-            json.dump({
-                "timestamp": session_id,
-                "type": session["type"],
-                "history": session["history"]
-            }, f, indent=4)
-        return jsonify({"message": f"Interview saved to {filename}"})
+        record = {
+            "timestamp": session_id,
+            "type": session["type"],
+            "history": serialize(session["history"]),
+            "summary": session["summary"],
+            "question_version": session["question_version"],
+            "device_telemetry": device_telemetry.snapshot(session_id)
+        }
+        with tracer.span("store"):
+            # A finished interview goes straight to the compressed archive, with its anti-cheating file
+            if record_store.archive is not None:
+                record_store.archive_document(session_id, record)
+                segment, offset, _ = record_store.archive.locate(session_id)
+                message = f"Interview archived as {session_id} in {segment} at offset {offset}"
+            else:
+                message = f"Interview saved to {record_store.write(session_id, record, indent=4)}"
+            session_store.archive_document(session_id)
+        update_catalog(session_catalog.upsert, session_id, session["type"],
+                       ended_at=datetime.now().isoformat(),
+                       score=session["summary"]["mean_coverage"],
+                       answered=session["summary"]["answered"])
+        # Answers were indexed as they came in; flush so every worker can search them now
+        try:
+            answer_index.flush()
+        except Exception as e:
+            print(f"Error indexing answer: {str(e)}")
+        return jsonify({"message": message})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def record_violation(session_id, violation_type, create=False):
+    """Append a violation to the session file and aggregates, then apply the termination rules"""
+    count_session_violation(session_id, violation_type)
+    update_catalog(session_catalog.add_violation, session_id, violation_type)
+    push_event(session_id, "violation_warning", violation=violation_type)
+    
+    violation = ViolationRecord(violation_type)
+    
+    def add_violation(session_data):
+        # Add violation to session data
+        if 'violations' not in session_data:
+            session_data['violations'] = []
+            
+        session_data['violations'].append(violation.to_dict())
+    
+    # Create the session file if it doesn't exist and the caller asks for it
+    new_session_file = None
+    if create:
+        new_session_file = lambda: {
+            'session_id': session_id,
+            'timestamp': datetime.now().isoformat(),
+            'violations': []
+        }
+    
+    try:
+        with tracer.span("store"):
+            session_store.update(session_id, add_violation, default=new_session_file, indent=4)
+    except Exception as e:
+        print(f"Error updating session data: {str(e)}")
+    
+    return rules_engine.record(session_id, violation_type)
+
+def mark_session_terminated(session_id, reason, client_violations=None):
+    """Persist a termination decision to the session file and catalog"""
+    update_catalog(session_catalog.mark_terminated, session_id, reason)
+    
+    def add_termination(session_data):
+        # Count violations from what the server recorded rather than what the client reports
+        violation_counts = {}
+        for violation in session_data.get('violations', []):
+            violation_counts[violation['type']] = violation_counts.get(violation['type'], 0) + 1
+        
+        # Add termination information
+        session_data['terminated'] = True
+        session_data['termination_reason'] = reason
+        session_data['termination_timestamp'] = datetime.now().isoformat()
+        session_data['violation_counts'] = violation_counts
+        if client_violations is not None:
+            session_data['client_violation_counts'] = client_violations
+    
+    try:
+        with tracer.span("store"):
+            session_store.update(session_id, add_termination, indent=4)
+    except Exception as e:
+        print(f"Error updating session data: {str(e)}")
+
+def on_rule_termination(session_id, rule):
+    """Terminate a session as soon as one of the violation rules trips"""
+    print(f"Interview terminated for session {session_id} by rule {rule.name}")
+    mark_session_terminated(session_id, rule.name)
+    push_event(session_id, "terminated", reason=rule.name)
+
+rules_engine.add_listener(on_rule_termination)
+
+def check_plagiarism(session_id, entry):
+    """Record a plagiarism violation if an answer nearly duplicates another session's"""
+    try:
+        with tracer.span("plagiarism"):
+            match = plagiarism_detector.check(session_id, entry.question, entry.response)
+    except Exception as e:
+        print(f"Error checking for plagiarism: {str(e)}")
+        return
+    if match is not None:
+        print(f"WARNING: Answer in session {session_id} matches session {match['session_id']} "
+              f"({match['similarity']:.0%} similar)")
+        record_violation(session_id, 'plagiarism', create=True)
+
+def violation_status(session_id, message):
+    """Build an anti-cheating response carrying the server's termination decision"""
+    reason = rules_engine.termination_reason(session_id)
+    return jsonify({
+        'success': True,
+        'message': message,
+        'terminated': reason is not None,
+        'termination_reason': reason
+    })
+
 @app.route('/api/anti_cheating/camera_status', methods=['POST'])
+@idempotent(idempotency_store)
 def update_camera_status():
     """Update camera status and log potential violations"""
     try:
@@ -450,46 +1029,18 @@ def update_camera_status():
         is_active = data.get('is_active', False)
         session_id = data.get('session_id', '')
         
+        if session_id:
+            record_telemetry(session_id, 'camera', is_active)
+        
         # Log the camera status change
         if not is_active:
             print(f"WARNING: Camera disabled for session {session_id}")
             
             # Log the violation in session data if available
             if session_id:
-                session_file = f"sessions/{session_id}.json"
-                
-                # Create the session file if it doesn't exist
-                if not os.path.exists(session_file):
-                    with open(session_file, 'w') as f:
-                        json.dump({
-                            'session_id': session_id,
-                            'timestamp': datetime.now().isoformat(),
-                            'violations': []
-                        }, f, indent=4)
-                
-                try:
-                    with open(session_file, 'r') as f:
-                        session_data = json.load(f)
-                        
-                    # Add violation to session data
-                    if 'violations' not in session_data:
-                        session_data['violations'] = []
-                        
-                    session_data['violations'].append({
-                        'type': 'camera_off',
-                        'timestamp': datetime.now().isoformat()
-                    })
-                    
-                    # Save updated session data
-                    with open(session_file, 'w') as f:
-                        json.dump(session_data, f, indent=4)
-                except Exception as e:
-                    print(f"Error updating session data: {str(e)}")
+                record_violation(session_id, 'camera_off', create=True)
         
-        return jsonify({
-            'success': True,
-            'message': 'Camera status updated'
-        })
+        return violation_status(session_id, 'Camera status updated')
     except Exception as e:
         print(f"Error updating camera status: {str(e)}")
         return jsonify({
@@ -498,6 +1049,7 @@ def update_camera_status():
         }), 500
 
 @app.route('/api/anti_cheating/microphone_status', methods=['POST'])
+@idempotent(idempotency_store)
 def update_microphone_status():
     """Update microphone status and log potential violations"""
     try:
@@ -505,46 +1057,18 @@ def update_microphone_status():
         is_active = data.get('is_active', False)
         session_id = data.get('session_id', '')
         
+        if session_id:
+            record_telemetry(session_id, 'microphone', is_active)
+        
         # Log the microphone status change
         if not is_active:
             print(f"WARNING: Microphone disabled for session {session_id}")
             
             # Log the violation in session data if available
             if session_id:
-                session_file = f"sessions/{session_id}.json"
-                
-                # Create the session file if it doesn't exist
-                if not os.path.exists(session_file):
-                    with open(session_file, 'w') as f:
-                        json.dump({
-                            'session_id': session_id,
-                            'timestamp': datetime.now().isoformat(),
-                            'violations': []
-                        }, f, indent=4)
-                
-                try:
-                    with open(session_file, 'r') as f:
-                        session_data = json.load(f)
-                        
-                    # Add violation to session data
-                    if 'violations' not in session_data:
-                        session_data['violations'] = []
-                        
-                    session_data['violations'].append({
-                        'type': 'microphone_off',
-                        'timestamp': datetime.now().isoformat()
-                    })
-                    
-                    # Save updated session data
-                    with open(session_file, 'w') as f:
-                        json.dump(session_data, f, indent=4)
-                except Exception as e:
-                    print(f"Error updating session data: {str(e)}")
+                record_violation(session_id, 'microphone_off', create=True)
         
-        return jsonify({
-            'success': True,
-            'message': 'Microphone status updated'
-        })
+        return violation_status(session_id, 'Microphone status updated')
     except Exception as e:
         print(f"Error updating microphone status: {str(e)}")
         return jsonify({
@@ -553,6 +1077,7 @@ def update_microphone_status():
         }), 500
 
 @app.route('/api/anti_cheating/tab_focus', methods=['POST'])
+@idempotent(idempotency_store)
 def update_tab_focus():
     """Update tab focus status and log potential violations"""
     try:
@@ -560,37 +1085,18 @@ def update_tab_focus():
         is_focused = data.get('is_focused', True)
         session_id = data.get('session_id', '')
         
+        if session_id:
+            record_telemetry(session_id, 'tab_focus', is_focused)
+        
         # Log the tab focus change
         if not is_focused:
             print(f"WARNING: Tab focus lost for session {session_id}")
             
             # Log the violation in session data if available
             if session_id:
-                session_file = f"sessions/{session_id}.json"
-                if os.path.exists(session_file):
-                    try:
-                        with open(session_file, 'r') as f:
-                            session_data = json.load(f)
-                            
-                        # Add violation to session data
-                        if 'violations' not in session_data:
-                            session_data['violations'] = []
-                            
-                        session_data['violations'].append({
-                            'type': 'tab_switch',
-                            'timestamp': datetime.now().isoformat()
-                        })
-                        
-                        # Save updated session data
-                        with open(session_file, 'w') as f:
-                            json.dump(session_data, f)
-                    except Exception as e:
-                        print(f"Error updating session data: {str(e)}")
+                record_violation(session_id, 'tab_switch')
         
-        return jsonify({
-            'success': True,
-            'message': 'Tab focus status updated'
-        })
+        return violation_status(session_id, 'Tab focus status updated')
     except Exception as e:
         print(f"Error updating tab focus: {str(e)}")
         return jsonify({
@@ -599,6 +1105,7 @@ def update_tab_focus():
         }), 500
 
 @app.route('/api/anti_cheating/copy_paste_attempt', methods=['POST'])
+@idempotent(idempotency_store)
 def report_copy_paste_attempt():
     """Report copy-paste attempts and log violations"""
     try:
@@ -609,31 +1116,9 @@ def report_copy_paste_attempt():
         
         # Log the violation in session data if available
         if session_id:
-            session_file = f"sessions/{session_id}.json"
-            if os.path.exists(session_file):
-                try:
-                    with open(session_file, 'r') as f:
-                        session_data = json.load(f)
-                        
-                    # Add violation to session data
-                    if 'violations' not in session_data:
-                        session_data['violations'] = []
-                        
-                    session_data['violations'].append({
-                        'type': 'copy_paste',
-                        'timestamp': datetime.now().isoformat()
-                    })
-                    
-                    # Save updated session data
-                    with open(session_file, 'w') as f:
-                        json.dump(session_data, f)
-                except Exception as e:
-                    print(f"Error updating session data: {str(e)}")
+            record_violation(session_id, 'copy_paste')
         
-        return jsonify({
-            'success': True,
-            'message': 'Copy-paste attempt recorded'
-        })
+        return violation_status(session_id, 'Copy-paste attempt recorded')
     except Exception as e:
         print(f"Error recording copy-paste attempt: {str(e)}")
         return jsonify({
@@ -642,8 +1127,9 @@ def report_copy_paste_attempt():
         }), 500
 
 @app.route('/api/anti_cheating/terminate_interview', methods=['POST'])
+@idempotent(idempotency_store)
 def terminate_interview():
-    """Terminate an interview due to excessive violations"""
+    """Terminate an interview at the client's request"""
     try:
         data = request.json
         session_id = data.get('session_id', '')
@@ -651,27 +1137,13 @@ def terminate_interview():
         violations = data.get('violations', {})
         
         print(f"Interview terminated for session {session_id} due to {reason}")
-        print(f"Violation counts: {violations}")
+        print(f"Client violation counts: {violations}")
         
         # Update session data if available
-        if session_id:
-            session_file = f"sessions/{session_id}.json"
-            if os.path.exists(session_file):
-                try:
-                    with open(session_file, 'r') as f:
-                        session_data = json.load(f)
-                    
-                    # Add termination information
-                    session_data['terminated'] = True
-                    session_data['termination_reason'] = reason
-                    session_data['termination_timestamp'] = datetime.now().isoformat()
-                    session_data['violation_counts'] = violations
-                    
-                    # Save updated session data
-                    with open(session_file, 'w') as f:
-                        json.dump(session_data, f)
-                except Exception as e:
-                    print(f"Error updating session data: {str(e)}")
+        if session_id and not rules_engine.is_terminated(session_id):
+            rules_engine.terminate(session_id, reason)
+            mark_session_terminated(session_id, reason, client_violations=violations)
+            push_event(session_id, "terminated", reason=reason)
         
         return jsonify({
             'success': True,
@@ -684,9 +1156,63 @@ def terminate_interview():
             'message': str(e)
         }), 500
 
+def admin_authorized():
+    """Admin endpoints need ADMIN_TOKEN to be configured and sent as X-Admin-Token"""
+    token = os.environ.get('ADMIN_TOKEN')
+    return bool(token) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token)
+
+def session_token(session_id):
+    """Token proving a client started the session, accepted by its event stream and summary"""
+    return hmac.new(SESSION_TOKEN_SECRET, session_id.encode(), 'sha256').hexdigest()
+
+def session_authorized(session_id):
+    """Admins, or the client holding the session's token as X-Session-Token or ?token= (EventSource cannot send headers)"""
+    token = request.headers.get('X-Session-Token') or request.args.get('token', '')
+    return admin_authorized() or hmac.compare_digest(token, session_token(session_id))
+
+@app.route('/api/admin/profile', methods=['GET'])
+def admin_profile():
+    """Collapsed stacks sampled over the last `seconds` seconds, ready for flamegraph.pl or speedscope"""
+    if not admin_authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    if not sampling_profiler.running:
+        return jsonify({"error": "Profiling is disabled; start the server with PROFILING=1"}), 409
+    
+    seconds = max(1, min(request.args.get('seconds', 60, type=int), sampling_profiler.retention))
+    return Response(sampling_profiler.collapsed(seconds), mimetype='text/plain')
+
+@app.route('/api/admin/memory', methods=['GET'])
+def admin_memory():
+    """Resident memory of this process and, under a preloading master, of the master and every worker"""
+    if not admin_authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    
+    processes = {"this": {"pid": os.getpid(), **(profiler.memory_usage() or {})}}
+    if PRELOADED:
+        master = os.getppid()
+        processes["master"] = {"pid": master, **(profiler.memory_usage(master) or {})}
+        processes["workers"] = [{"pid": pid, **(profiler.memory_usage(pid) or {})}
+                                for pid in profiler.child_pids(master)]
+        processes["workers_pss_total"] = sum(worker.get("pss", 0) for worker in processes["workers"])
+    return jsonify(processes)
+
+@app.route('/api/admin/spans', methods=['GET'])
+def admin_spans():
+    """Process-wide totals of the trace spans around feedback, store, catalog and JSON work"""
+    if not admin_authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    
+    return jsonify({"enabled": tracer.enabled, "spans": tracer.totals(), "llm_gateway": feedback_gateway.stats(),
+                    "feedback_batcher": feedback_batcher.stats(), "prompts": prompt_builder.stats(),
+                    "grading_queue": grading_jobs.stats() if GRADING_QUEUE else None,
+                    "answer_index": answer_index.stats(), "question_bank": QUESTION_BANK.stats(),
+                    "archive": {"records": record_store.archive.stats(), "sessions": session_store.archive.stats()}
+                    if record_store.archive is not None else None,
+                    "plagiarism": plagiarism_detector.stats() if PLAGIARISM_DETECTION else None})
+
 if __name__ == '__main__':
     # Create frontend directory if it doesn't exist
     os.makedirs('frontend', exist_ok=True)
     # Create sessions directory if it doesn't exist
-    os.makedirs('sessions', exist_ok=True)
+    os.makedirs(SESSIONS_DIR, exist_ok=True)
     app.run(port=8000, debug=True) 
\ No newline at end of file
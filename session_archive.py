@@ -0,0 +1,384 @@
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    segment INTEGER PRIMARY KEY,
+    size INTEGER NOT NULL DEFAULT 0,
+    sealed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS records (
+    key TEXT PRIMARY KEY,
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    stored_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_records_segment ON records (segment);
+CREATE INDEX IF NOT EXISTS idx_records_stored ON records (stored_at);
+"""
+
+# Codec ids written into each frame. A codec id also pins the dictionary it was written
+# with, so DICTIONARY must never change; new dictionary text needs new ids.
+TOMBSTONE = 0
+CODEC_DEFLATE = 1
+CODEC_ZSTD = 2
+CODECS = {"deflate": CODEC_DEFLATE, "zstd": CODEC_ZSTD}
+
+# codec, key length, stored_at, payload length, CRC-32 of key and payload
+FRAME = struct.Struct(">BHdII")
+
+ZSTD_LEVEL = 10
+
+# Preset dictionary: the field names, violation types and feedback boilerplate every record
+# repeats. Each record is compressed on its own so it can be read back alone, and without
+# this a record would pay for these strings again every time. Most frequent text goes last.
+DICTIONARY = "".join([
+    " I would use the and to of in that is for with it as we this on be by our team data an are "
+    "which can have from was not or when would they their more how about make sure also because ",
+    "design system performance scalability testing experience project customer process approach ",
+    '"client_violation_counts":{"tab_switch":', '"termination_timestamp":"2026-',
+    '"terminated":true,"termination_reason":"', '"violation_counts":{"camera_off":',
+    '"company":"","role":"","questions":[', '"answers":[],"feedback":[]',
+    '{"session_id":"', '","violations":[', '{"type":"microphone_off","timestamp":"2026-',
+    '{"type":"copy_paste","timestamp":"2026-', '{"type":"plagiarism","timestamp":"2026-',
+    '{"type":"camera_off","timestamp":"2026-', '{"type":"tab_switch","timestamp":"2026-',
+    '"device_telemetry":{"camera":{"resolution":0.5,"starts":"', '","on_before":"AAAAAAAAAAA',
+    '","states":"', '"},"microphone":{"resolution":0.5,"starts":"', '"},"tab_focus":{"resolution":0.5,"starts":"',
+    '"question_version":"', '"categories":{"Technical":{"answered":', ',"violations":{},"violation_total":0}',
+    '"summary":{"answered":', ',"coverage_total":', ',"mean_coverage":', ',"last_coverage":',
+    ',"questions":{"0":{"attempts":1,"matched":', ',"keywords":', ',"coverage":0.', ',"best_coverage":0.',
+    "Excellent answer! You've covered the key concepts well. ",
+    "Good answer! You've touched on several important points. ",
+    "Thank you for your response. Let's explore this topic further. Consider discussing: ",
+    '","grading_job":', '{"timestamp":"', '","type":"Technical","history":[{"timestamp":"2026-',
+    '","question":"Can you explain ', '","response":"', '","feedback":"', '"},{"timestamp":"2026-',
+]).encode()
+
+_zstd_dictionary = zstandard.ZstdCompressionDict(DICTIONARY, dict_type=zstandard.DICT_TYPE_RAWCONTENT) \
+    if zstandard is not None else None
+
+
+def compress(codec, data):
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=_zstd_dictionary).compress(data)
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=DICTIONARY)
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress(codec, payload):
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Archived record is zstd-compressed; install zstandard to read it")
+        return zstandard.ZstdDecompressor(dict_data=_zstd_dictionary).decompress(payload)
+    if codec != CODEC_DEFLATE:
+        raise ValueError(f"Unknown archive codec {codec}")
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS, zdict=DICTIONARY)
+    return decompressor.decompress(payload) + decompressor.flush()
+
+
+def encode_frame(codec, key, payload, stored_at):
+    key_bytes = key.encode()
+    checksum = zlib.crc32(payload, zlib.crc32(key_bytes))
+    return FRAME.pack(codec, len(key_bytes), stored_at, len(payload), checksum) + key_bytes + payload
+
+
+def decode_frame(data, offset=0):
+    """(codec, key, stored_at, payload, end) of the frame at offset; ValueError if it is torn or corrupt"""
+    if len(data) < offset + FRAME.size:
+        raise ValueError("Truncated archive frame")
+    codec, key_length, stored_at, payload_length, checksum = FRAME.unpack_from(data, offset)
+    key_start = offset + FRAME.size
+    end = key_start + key_length + payload_length
+    if len(data) < end:
+        raise ValueError("Truncated archive frame")
+    key_bytes = bytes(data[key_start:key_start + key_length])
+    payload = data[key_start + key_length:end]
+    if zlib.crc32(payload, zlib.crc32(key_bytes)) != checksum:
+        raise ValueError("Archive frame checksum mismatch")
+    return codec, key_bytes.decode(), stored_at, payload, end
+
+
+class SessionArchive:
+    """Finished session documents, compressed into append-only segment files
+
+    Each document is serialised as compact JSON, compressed on its own
+    against a shared preset dictionary (zstd when zstandard is installed,
+    DEFLATE otherwise) and appended to the open segment as a checksummed
+    frame. A SQLite index maps every key to the segment, offset and
+    length of its latest frame, so a read is one index lookup and one
+    pread. Segments are sealed at `segment_bytes`.
+
+    Appends run inside an IMMEDIATE transaction on the index, so processes
+    sharing the archive take turns, and a frame only counts once its
+    index row commits; an append that dies half way is overwritten by the
+    next. Records older than `retention` seconds are dropped by gc(),
+    which also rewrites sealed segments that are mostly dead space.
+    """
+
+    def __init__(self, root, codec=None, segment_bytes=64 * 1024 * 1024, retention=None, clock=time.time):
+        self.root = root
+        codec = codec or ("zstd" if zstandard is not None else "deflate")
+        if codec not in CODECS:
+            raise ValueError(f"Unknown archive codec {codec!r}; use one of {', '.join(CODECS)}")
+        if codec == "zstd" and zstandard is None:
+            print("zstandard is not installed; archiving with deflate instead")
+            codec = "deflate"
+        self.codec = codec
+        self.segment_bytes = segment_bytes
+        self.retention = retention
+        self.clock = clock
+        self.path = os.path.join(root, "index.db")
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self, create=False):
+        """This thread's connection to the index
+
+        Until something is archived, and unless create is set, an empty
+        in-memory index stands in for it, so reading an archive never
+        creates its directory.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if not create and not os.path.exists(self.path):
+                conn = sqlite3.connect(":memory:", isolation_level=None)
+                conn.executescript(SCHEMA)
+                return conn
+            os.makedirs(self.root, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def segment_path(self, segment):
+        return os.path.join(self.root, f"{segment:06d}.seg")
+
+    def put(self, key, document, stored_at=None):
+        """Append a document, superseding any archived copy of the key; returns its size on disk"""
+        data = json.dumps(document, separators=(",", ":")).encode()
+        payload = compress(CODECS[self.codec], data)
+        conn = self._connect(create=True)
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT stored_at FROM records WHERE key = ?", (key,)).fetchone()
+            # Retention runs from when a session was first archived, even if it came back to life since
+            if row is not None:
+                stored_at = row[0]
+            elif stored_at is None:
+                stored_at = self.clock()
+            frame = encode_frame(CODECS[self.codec], key, payload, stored_at)
+            segment, offset = self._append(conn, frame)
+            conn.execute(
+                """
+                INSERT INTO records (key, segment, offset, length, stored_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET segment = excluded.segment, offset = excluded.offset,
+                    length = excluded.length
+                """,
+                (key, segment, offset, len(frame), stored_at)
+            )
+        return len(frame)
+
+    def _append(self, conn, frame):
+        """Write a frame at the end of the open segment; the caller holds the write transaction"""
+        row = conn.execute("SELECT segment, size FROM segments WHERE sealed = 0 ORDER BY segment DESC LIMIT 1").fetchone()
+        if row is None or (row[1] and row[1] + len(frame) > self.segment_bytes):
+            if row is not None:
+                conn.execute("UPDATE segments SET sealed = 1 WHERE segment = ?", (row[0],))
+            latest = conn.execute("SELECT MAX(segment) FROM segments").fetchone()[0]
+            row = ((latest or 0) + 1, 0)
+            conn.execute("INSERT INTO segments (segment, size) VALUES (?, 0)", (row[0],))
+        segment, offset = row
+        fd = os.open(self.segment_path(segment), os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            os.pwrite(fd, frame, offset)
+            # Drop whatever an interrupted append left past the new end
+            os.ftruncate(fd, offset + len(frame))
+            # The hot copy is deleted once this returns, so the frame must be on disk first
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        conn.execute("UPDATE segments SET size = ? WHERE segment = ?", (offset + len(frame), segment))
+        return segment, offset
+
+    def get(self, key):
+        """Return the archived document, or None if the key is not archived"""
+        conn = self._connect()
+        # A compaction may move the frame between the lookup and the read; look it up again then
+        for _ in range(3):
+            row = conn.execute("SELECT segment, offset, length FROM records WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            segment, offset, length = row
+            try:
+                fd = os.open(self.segment_path(segment), os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                data = os.pread(fd, length, offset)
+            finally:
+                os.close(fd)
+            codec, frame_key, _, payload, _ = decode_frame(data)
+            if frame_key != key:
+                raise ValueError(f"Archive index for {key} points at the frame of {frame_key}")
+            return json.loads(decompress(codec, payload))
+        raise RuntimeError(f"Archived record {key} kept moving while being read")
+
+    def locate(self, key):
+        """(segment path, offset, length) of the key's frame, or None if the key is not archived
+
+        Compaction moves frames, so this is where the record is now, not for good.
+        """
+        row = self._connect().execute("SELECT segment, offset, length FROM records WHERE key = ?",
+                                      (key,)).fetchone()
+        if row is None:
+            return None
+        return self.segment_path(row[0]), row[1], row[2]
+
+    def __contains__(self, key):
+        return self._connect().execute("SELECT 1 FROM records WHERE key = ?", (key,)).fetchone() is not None
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def keys(self):
+        return [row[0] for row in self._connect().execute("SELECT key FROM records ORDER BY key")]
+
+    def delete(self, key):
+        """Forget a key; a tombstone frame keeps rebuild_index() from bringing it back"""
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("DELETE FROM records WHERE key = ?", (key,)).rowcount:
+                self._append(conn, encode_frame(TOMBSTONE, key, b"", self.clock()))
+
+    def gc(self, now=None, min_live=0.5):
+        """Drop records past retention, then compact; returns (records expired, segments rewritten, bytes freed)"""
+        expired = 0
+        if self.retention:
+            cutoff = (self.clock() if now is None else now) - self.retention
+            conn = self._connect()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                expired = conn.execute("DELETE FROM records WHERE stored_at < ?", (cutoff,)).rowcount
+        rewritten, freed = self.compact(min_live)
+        return expired, rewritten, freed
+
+    def compact(self, min_live=0.5):
+        """Copy the live frames out of sealed segments less than min_live full, then delete those segments
+
+        Live frames are copied byte for byte, so nothing is recompressed.
+        Expired frames are left behind, as retention has passed for them.
+        A tombstone is copied forward while an older segment survives, as
+        it may still hold the frame the tombstone deleted, and is dropped
+        once none does or its key has been archived again since.
+        """
+        conn = self._connect()
+        rewritten = freed = 0
+        sealed = conn.execute(
+            """
+            SELECT s.segment, s.size, COALESCE(SUM(r.length), 0) FROM segments s
+            LEFT JOIN records r ON r.segment = s.segment WHERE s.sealed = 1 GROUP BY s.segment
+            """
+        ).fetchall()
+        for segment, size, live in sealed:
+            if size and live / size >= min_live:
+                continue
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                rows = conn.execute("SELECT key, offset, length FROM records WHERE segment = ? ORDER BY offset",
+                                    (segment,)).fetchall()
+                if rows:
+                    with open(self.segment_path(segment), "rb") as f:
+                        for key, offset, length in rows:
+                            f.seek(offset)
+                            moved_segment, moved_offset = self._append(conn, f.read(length))
+                            conn.execute("UPDATE records SET segment = ?, offset = ? WHERE key = ?",
+                                         (moved_segment, moved_offset, key))
+                if conn.execute("SELECT 1 FROM segments WHERE segment < ? LIMIT 1", (segment,)).fetchone():
+                    for tombstone in self._tombstones(conn, segment):
+                        self._append(conn, tombstone)
+                conn.execute("DELETE FROM segments WHERE segment = ?", (segment,))
+            # Only unlinked once the index no longer points into it; readers retry a missing file
+            try:
+                os.remove(self.segment_path(segment))
+            except FileNotFoundError:
+                pass
+            rewritten += 1
+            freed += size - live
+        return rewritten, freed
+
+    def _tombstones(self, conn, segment):
+        """The segment's tombstone frames for keys that have not been archived again since"""
+        with open(self.segment_path(segment), "rb") as f:
+            data = f.read()
+        tombstones = []
+        offset = 0
+        while offset < len(data):
+            try:
+                codec, key, _, _, end = decode_frame(data, offset)
+            except ValueError:
+                break
+            if codec == TOMBSTONE and conn.execute("SELECT 1 FROM records WHERE key = ?", (key,)).fetchone() is None:
+                tombstones.append(data[offset:end])
+            offset = end
+        return tombstones
+
+    def rebuild_index(self):
+        """Recreate the index from the segment files, e.g. after index.db was lost; returns the records found"""
+        conn = self._connect(create=True)
+        cutoff = self.clock() - self.retention if self.retention else None
+        segments = sorted(int(name[:-4]) for name in os.listdir(self.root)
+                          if name.endswith(".seg") and name[:-4].isdigit())
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM records")
+            conn.execute("DELETE FROM segments")
+            for segment in segments:
+                with open(self.segment_path(segment), "rb") as f:
+                    data = f.read()
+                offset = 0
+                while offset < len(data):
+                    try:
+                        codec, key, stored_at, _, end = decode_frame(data, offset)
+                    except ValueError:
+                        # A torn tail from an append that never committed
+                        break
+                    if codec == TOMBSTONE or (cutoff is not None and stored_at < cutoff):
+                        conn.execute("DELETE FROM records WHERE key = ?", (key,))
+                    else:
+                        conn.execute(
+                            """
+                            INSERT INTO records (key, segment, offset, length, stored_at) VALUES (?, ?, ?, ?, ?)
+                            ON CONFLICT(key) DO UPDATE SET segment = excluded.segment, offset = excluded.offset,
+                                length = excluded.length, stored_at = MIN(records.stored_at, excluded.stored_at)
+                            """,
+                            (key, segment, offset, end - offset, stored_at)
+                        )
+                    offset = end
+                conn.execute("INSERT INTO segments (segment, size, sealed) VALUES (?, ?, ?)",
+                             (segment, offset, int(segment != segments[-1])))
+        return len(self)
+
+    def stats(self):
+        conn = self._connect()
+        records, live = conn.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM records").fetchone()
+        segments, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM segments").fetchone()
+        return {"codec": self.codec, "records": records, "segments": segments, "segment_bytes": size,
+                "live_bytes": live, "retention_days": self.retention / 86400 if self.retention else None}
@@ -0,0 +1,279 @@
+import base64
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+SORT_COLUMNS = ("started_at", "score", "violation_count")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    type TEXT,
+    started_at TEXT NOT NULL,
+    ended_at TEXT,
+    score REAL NOT NULL DEFAULT 0,
+    answered INTEGER NOT NULL DEFAULT 0,
+    violation_count INTEGER NOT NULL DEFAULT 0,
+    terminated INTEGER NOT NULL DEFAULT 0,
+    termination_reason TEXT
+);
+CREATE TABLE IF NOT EXISTS session_violations (
+    session_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (session_id, type)
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_started ON sessions (started_at, session_id);
+CREATE INDEX IF NOT EXISTS idx_sessions_score ON sessions (score, session_id);
+CREATE INDEX IF NOT EXISTS idx_sessions_violations ON sessions (violation_count, session_id);
+CREATE INDEX IF NOT EXISTS idx_sessions_type_started ON sessions (type, started_at, session_id);
+CREATE INDEX IF NOT EXISTS idx_sessions_terminated_started ON sessions (terminated, started_at, session_id);
+"""
+
+
+class SessionCatalog:
+    """SQLite index over interview sessions, kept current as sessions are written"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def upsert(self, session_id, interview_type=None, started_at=None, ended_at=None,
+               score=None, answered=None):
+        """Insert a session or update the fields that are given"""
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO sessions (session_id, type, started_at, ended_at, score, answered)
+                VALUES (?, ?, ?, ?, COALESCE(?, 0), COALESCE(?, 0))
+                ON CONFLICT(session_id) DO UPDATE SET
+                    type = COALESCE(excluded.type, sessions.type),
+                    ended_at = COALESCE(excluded.ended_at, sessions.ended_at),
+                    score = COALESCE(?, sessions.score),
+                    answered = COALESCE(?, sessions.answered)
+                """,
+                (session_id, interview_type, started_at or datetime.now().isoformat(),
+                 ended_at, score, answered, score, answered)
+            )
+
+    def add_violation(self, session_id, violation_type):
+        """Count one violation against a session, creating its row if needed"""
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO sessions (session_id, started_at) VALUES (?, ?)",
+                (session_id, datetime.now().isoformat())
+            )
+            conn.execute(
+                "UPDATE sessions SET violation_count = violation_count + 1 WHERE session_id = ?",
+                (session_id,)
+            )
+            conn.execute(
+                """
+                INSERT INTO session_violations (session_id, type, count) VALUES (?, ?, 1)
+                ON CONFLICT(session_id, type) DO UPDATE SET count = count + 1
+                """,
+                (session_id, violation_type)
+            )
+
+    def mark_terminated(self, session_id, reason, ended_at=None):
+        """Flag a session as terminated"""
+        ended_at = ended_at or datetime.now().isoformat()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO sessions (session_id, started_at, ended_at, terminated, termination_reason)
+                VALUES (?, ?, ?, 1, ?)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    ended_at = excluded.ended_at,
+                    terminated = 1,
+                    termination_reason = excluded.termination_reason
+                """,
+                (session_id, ended_at, ended_at, reason)
+            )
+
+    def get(self, session_id):
+        """Return one catalogued session, or None"""
+        row = self._connect().execute(
+            "SELECT * FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return self._with_violations([row])[0]
+
+    def query(self, interview_type=None, terminated=None, min_score=None, max_score=None,
+              min_violations=None, started_after=None, started_before=None,
+              sort="started_at", order="desc", limit=20, cursor=None):
+        """Return one page of sessions and the cursor for the next page
+
+        Pages are keyset-paginated on (sort column, session_id), so every page
+        is an index range scan no matter how deep into the catalog it is.
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"sort must be one of: {', '.join(SORT_COLUMNS)}")
+        if order not in ("asc", "desc"):
+            raise ValueError("order must be 'asc' or 'desc'")
+
+        clauses = []
+        params = []
+        if interview_type is not None:
+            clauses.append("type = ?")
+            params.append(interview_type)
+        if terminated is not None:
+            clauses.append("terminated = ?")
+            params.append(1 if terminated else 0)
+        if min_score is not None:
+            clauses.append("score >= ?")
+            params.append(min_score)
+        if max_score is not None:
+            clauses.append("score <= ?")
+            params.append(max_score)
+        if min_violations is not None:
+            clauses.append("violation_count >= ?")
+            params.append(min_violations)
+        if started_after is not None:
+            clauses.append("started_at >= ?")
+            params.append(started_after)
+        if started_before is not None:
+            clauses.append("started_at < ?")
+            params.append(started_before)
+        if cursor is not None:
+            last_value, last_id = decode_cursor(cursor)
+            comparison = "<" if order == "desc" else ">"
+            clauses.append(f"({sort}, session_id) {comparison} (?, ?)")
+            params.extend([last_value, last_id])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        direction = order.upper()
+        rows = self._connect().execute(
+            f"SELECT * FROM sessions {where} ORDER BY {sort} {direction}, session_id {direction} LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][sort], rows[-1]["session_id"])
+        return self._with_violations(rows), next_cursor
+
+    def _with_violations(self, rows):
+        sessions = [row_to_dict(row) for row in rows]
+        if not sessions:
+            return sessions
+        by_id = {session["session_id"]: session for session in sessions}
+        placeholders = ",".join("?" * len(by_id))
+        for session_id, violation_type, count in self._connect().execute(
+            f"SELECT session_id, type, count FROM session_violations WHERE session_id IN ({placeholders})",
+            list(by_id)
+        ):
+            by_id[session_id]["violations"][violation_type] = count
+        return sessions
+
+    def rebuild(self, session_store, record_store):
+        """Index every existing session and interview record file"""
+        indexed = 0
+        for key in record_store.keys():
+            try:
+                record = record_store.read(key)
+            except Exception as e:
+                print(f"Skipping record {key}: {str(e)}")
+                continue
+            session_id = record.get("timestamp") or key
+            summary = record.get("summary") or {}
+            history = record.get("history") or []
+            started_at = history[0].get("timestamp") if history and isinstance(history[0], dict) else None
+            ended_at = history[-1].get("timestamp") if history and isinstance(history[-1], dict) else None
+            self.upsert(session_id, record.get("type"), started_at=started_at, ended_at=ended_at,
+                        score=summary.get("mean_coverage"), answered=summary.get("answered", len(history)))
+            indexed += 1
+
+        for key in session_store.keys():
+            try:
+                session_data = session_store.read(key)
+            except Exception as e:
+                print(f"Skipping session {key}: {str(e)}")
+                continue
+            session_id = session_data.get("session_id") or key
+            self._replace_violations(session_id, session_data.get("violations") or [],
+                                     started_at=session_data.get("timestamp"))
+            if session_data.get("terminated"):
+                self.mark_terminated(session_id, session_data.get("termination_reason"),
+                                     ended_at=session_data.get("termination_timestamp"))
+            indexed += 1
+        return indexed
+
+    def _replace_violations(self, session_id, violations, started_at=None):
+        counts = {}
+        for violation in violations:
+            counts[violation.get("type")] = counts.get(violation.get("type"), 0) + 1
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO sessions (session_id, started_at) VALUES (?, ?)",
+                (session_id, started_at or datetime.now().isoformat())
+            )
+            conn.execute("DELETE FROM session_violations WHERE session_id = ?", (session_id,))
+            conn.executemany(
+                "INSERT INTO session_violations (session_id, type, count) VALUES (?, ?, ?)",
+                [(session_id, violation_type, count) for violation_type, count in counts.items()]
+            )
+            conn.execute(
+                "UPDATE sessions SET violation_count = ? WHERE session_id = ?",
+                (sum(counts.values()), session_id)
+            )
+
+
+def row_to_dict(row):
+    session = dict(row)
+    session["terminated"] = bool(session["terminated"])
+    session["violations"] = {}
+    return session
+
+
+def encode_cursor(value, session_id):
+    return base64.urlsafe_b64encode(json.dumps([value, session_id]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        value, session_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return value, session_id
+
+
+if __name__ == "__main__":
+    # python session_catalog.py rebuild [catalog_path]
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print("Usage: python session_catalog.py rebuild [catalog_path]")
+        sys.exit(1)
+    import session_storage
+    sessions_dir = os.environ.get("SESSIONS_DIR", "sessions")
+    path = sys.argv[2] if len(sys.argv) > 2 else os.environ.get("SESSION_CATALOG_PATH", os.path.join(sessions_dir, "catalog.db"))
+    indexed = SessionCatalog(path).rebuild(session_storage.sessions_store_from_environment(),
+                                           session_storage.records_store_from_environment())
+    print(f"Indexed {indexed} files into {path}")
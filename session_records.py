@@ -0,0 +1,85 @@
+import sys
+import time
+from datetime import datetime
+
+
+def now_ms():
+    """Wall-clock time as integer epoch milliseconds"""
+    return time.time_ns() // 1000000
+
+
+def isoformat(epoch_ms):
+    """The ISO-8601 local time the JSON files and API have always used"""
+    return datetime.fromtimestamp(epoch_ms / 1000).isoformat()
+
+
+class HistoryEntry:
+    """One answered question in a live server session
+
+    Timestamps are epoch milliseconds and question text is interned, so
+    the thousands of entries asking the same question share one string.
+    The dict form exists only at the API and persistence boundary.
+    """
+
+    __slots__ = ("timestamp", "question", "response", "feedback", "grading_job")
+
+    def __init__(self, question, response, feedback=None, grading_job=None, timestamp=None):
+        self.timestamp = timestamp if timestamp is not None else now_ms()
+        self.question = sys.intern(question)
+        self.response = response
+        self.feedback = feedback
+        self.grading_job = grading_job
+
+    def to_dict(self):
+        entry = {
+            "timestamp": isoformat(self.timestamp),
+            "question": self.question,
+            "response": self.response,
+            "feedback": self.feedback
+        }
+        if self.grading_job is not None:
+            entry["grading_job"] = self.grading_job
+        return entry
+
+
+class BotExchange:
+    """One candidate answer and the feedback spoken back, in the conference bot's history
+
+    `delivery` holds the speech_analytics metrics when the answer was heard
+    rather than typed.
+    """
+
+    __slots__ = ("timestamp", "candidate_response", "ai_feedback", "delivery")
+
+    def __init__(self, candidate_response, ai_feedback, delivery=None, timestamp=None):
+        self.timestamp = timestamp if timestamp is not None else now_ms()
+        self.candidate_response = candidate_response
+        self.ai_feedback = ai_feedback
+        self.delivery = delivery
+
+    def to_dict(self):
+        entry = {
+            "timestamp": isoformat(self.timestamp),
+            "candidate_response": self.candidate_response,
+            "ai_feedback": self.ai_feedback
+        }
+        if self.delivery is not None:
+            entry["delivery"] = self.delivery
+        return entry
+
+
+class ViolationRecord:
+    """One anti-cheating violation; the type is interned as there are only a handful"""
+
+    __slots__ = ("type", "timestamp")
+
+    def __init__(self, violation_type, timestamp=None):
+        self.type = sys.intern(violation_type)
+        self.timestamp = timestamp if timestamp is not None else now_ms()
+
+    def to_dict(self):
+        return {"type": self.type, "timestamp": isoformat(self.timestamp)}
+
+
+def serialize(records):
+    return [record.to_dict() for record in records]
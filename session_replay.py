@@ -0,0 +1,491 @@
+import argparse
+import contextlib
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; resource use is then reported as unknown
+    resource = None
+
+import session_storage
+
+START_PATH = "/api/start_interview"
+SUBMIT_PATH = "/api/submit_response"
+SAVE_PATH = "/api/save_interview"
+TERMINATE_PATH = "/api/anti_cheating/terminate_interview"
+
+# Violation type recorded in a session file -> the client call that produced it
+VIOLATION_REQUESTS = {
+    "camera_off": ("/api/anti_cheating/camera_status", {"is_active": False}),
+    "microphone_off": ("/api/anti_cheating/microphone_status", {"is_active": False}),
+    "tab_switch": ("/api/anti_cheating/tab_focus", {"is_focused": False}),
+    "copy_paste": ("/api/anti_cheating/copy_paste_attempt", {}),
+}
+
+# Session IDs from the server (20250412_171906) and the frontend (20250412234717-1400)
+SESSION_ID_FORMATS = (("%Y%m%d_%H%M%S", 15), ("%Y%m%d%H%M%S", 14))
+
+
+class ReplayEvent:
+    """One recorded client request, at its original wall-clock time (epoch seconds)"""
+
+    __slots__ = ("at", "path", "body")
+
+    def __init__(self, at, path, body):
+        self.at = at
+        self.path = path
+        self.body = body
+
+
+class ReplaySession:
+    """The requests of one recorded session, replayed in order on one connection"""
+
+    __slots__ = ("session_id", "events")
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.events = []
+
+    @property
+    def started(self):
+        return self.events[0].at
+
+    def add(self, at, path, body):
+        self.events.append(ReplayEvent(at, path, body))
+
+    def finish(self):
+        # Interleave interview and anti-cheating requests by time; a start
+        # request stays first when it ties with the earliest violation
+        self.events.sort(key=lambda event: (event.at, event.path != START_PATH))
+
+
+def parse_time(value):
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def session_id_time(session_id):
+    for fmt, length in SESSION_ID_FORMATS:
+        try:
+            return datetime.strptime(session_id[:length], fmt).timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+def add_record(sessions, key, record, default_gap):
+    """Add an interview record: a start, one submit per answer, then the save"""
+    history = [item for item in record.get("history") or [] if isinstance(item, dict)]
+    answered = [(parse_time(item.get("timestamp")), item.get("response", "")) for item in history]
+    answered = [(at, response) for at, response in answered if at is not None]
+    started = session_id_time(record.get("timestamp") or key)
+    if started is None:
+        if not answered:
+            return
+        started = answered[0][0] - default_gap
+
+    session = sessions.setdefault(key, ReplaySession(key))
+    session.add(started, START_PATH, {"type": record.get("type") or "Technical"})
+    for at, response in answered:
+        session.add(at, SUBMIT_PATH, {"response": response})
+    session.add(answered[-1][0] if answered else started, SAVE_PATH, {})
+
+
+def add_session_file(sessions, key, session_data, default_gap, interview_type):
+    """Add a session file: anti-cheating violations, or the bot's question/answer log"""
+    if "violations" in session_data or "terminated" in session_data:
+        session = sessions.setdefault(key, ReplaySession(key))
+        for violation in session_data.get("violations") or []:
+            request = VIOLATION_REQUESTS.get(violation.get("type"))
+            at = parse_time(violation.get("timestamp"))
+            if request is None or at is None:
+                continue
+            path, body = request
+            session.add(at, path, dict(body))
+        if session_data.get("terminated"):
+            at = parse_time(session_data.get("termination_timestamp"))
+            if at is not None:
+                session.add(at, TERMINATE_PATH, {
+                    "reason": session_data.get("termination_reason") or "excessive_violations",
+                    "violations": session_data.get("client_violation_counts") or {}
+                })
+        return
+
+    # The desktop bot records answers without timestamps, so space them out evenly
+    started = session_id_time(key)
+    if started is None or "answers" not in session_data:
+        return
+    session = sessions.setdefault(key, ReplaySession(key))
+    session.add(started, START_PATH, {"type": interview_type})
+    for i, answer in enumerate(session_data.get("answers") or []):
+        session.add(started + default_gap * (i + 1), SUBMIT_PATH, {"response": answer})
+
+
+def read_documents(store):
+    for key in store.keys():
+        try:
+            document = store.read(key)
+        except Exception as e:
+            print(f"Skipping {key}: {str(e)}")
+            continue
+        if isinstance(document, dict):
+            yield key, document
+
+
+def load_corpus(session_store, record_store, default_gap=30.0, interview_type="Technical"):
+    """Build replay sessions from stored interview records and session files, oldest first"""
+    sessions = {}
+    for key, record in read_documents(record_store):
+        add_record(sessions, key, record, default_gap)
+    for key, session_data in read_documents(session_store):
+        add_session_file(sessions, key, session_data, default_gap, interview_type)
+
+    replay = [session for session in sessions.values() if session.events]
+    for session in replay:
+        session.finish()
+    replay.sort(key=lambda session: session.started)
+    return replay
+
+
+def build_timeline(sessions, speed=1.0, max_gap=None):
+    """Map each recorded event time to seconds after the replay starts
+
+    Times are scaled by 1/speed, and any idle stretch in the combined
+    timeline longer than max_gap (after scaling) is cut down to max_gap,
+    so overnight lulls do not stall a replay while sessions that overlapped
+    in the recording still overlap.
+    """
+    times = sorted({event.at for session in sessions for event in session.events})
+    timeline = {}
+    offset = 0.0
+    previous = None
+    for at in times:
+        if previous is not None:
+            gap = (at - previous) / speed
+            offset += gap if max_gap is None else min(gap, max_gap)
+        timeline[at] = offset
+        previous = at
+    return timeline
+
+
+class InProcessTarget:
+    """Sends requests to a Flask app through its test client"""
+
+    def __init__(self, app):
+        self.app = app
+        self.name = "in-process"
+
+    def connect(self):
+        client = self.app.test_client()
+
+        def post(path, body):
+            response = client.post(path, json=body)
+            return response.status_code, response.get_json(silent=True)
+
+        return post
+
+
+class HTTPTarget:
+    """Sends requests to a running server, one keep-alive connection per session"""
+
+    def __init__(self, url, timeout=30):
+        parts = urlsplit(url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.name = url
+
+    def connect(self):
+        connection = self.connection_class(self.host, self.port, timeout=self.timeout)
+
+        def post(path, body):
+            payload = json.dumps(body).encode()
+            try:
+                connection.request("POST", self.prefix + path, body=payload,
+                                   headers={"Content-Type": "application/json"})
+                response = connection.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                return 0, None
+            try:
+                return response.status, json.loads(data)
+            except ValueError:
+                return response.status, None
+
+        return post
+
+
+class Replayer:
+    """Plays recorded sessions against a target, keeping their timing and overlap
+
+    Every session runs on its own thread, started when the session started
+    in the recording, and sleeps until each of its requests is due. How
+    late requests went out (schedule lag) is reported alongside latency,
+    since a replayer that cannot keep up understates the load.
+    """
+
+    def __init__(self, target, speed=1.0, max_gap=None, run_tag=None):
+        self.target = target
+        self.speed = speed
+        self.max_gap = max_gap
+        self.run_tag = run_tag or datetime.now().strftime("%H%M%S")
+        self._lock = threading.Lock()
+        self._samples = []
+        self._skipped = 0
+        self._active = 0
+        self._peak_active = 0
+
+    def run(self, sessions):
+        timeline = build_timeline(sessions, self.speed, self.max_gap)
+        usage_before = resource_usage()
+        started = time.perf_counter()
+        threads = []
+        for session in sessions:
+            delay = started + timeline[session.started] - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            thread = threading.Thread(target=self._play, args=(session, timeline, started), daemon=True)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        return summarize(self._samples, elapsed, len(sessions), self._peak_active, self._skipped,
+                         usage_before, resource_usage(), self.target.name, self.speed, self.max_gap)
+
+    def _play(self, session, timeline, started):
+        with self._lock:
+            self._active += 1
+            self._peak_active = max(self._peak_active, self._active)
+        try:
+            post = self.target.connect()
+            # Requests made before the server assigns an ID use one private to this run
+            live_id = f"replay-{self.run_tag}-{session.session_id}"
+            for i, event in enumerate(session.events):
+                delay = started + timeline[event.at] - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                body = dict(event.body)
+                if event.path != START_PATH:
+                    body["session_id"] = live_id
+
+                sent = time.perf_counter()
+                status, payload = post(event.path, body)
+                latency = time.perf_counter() - sent
+                with self._lock:
+                    self._samples.append((event.path, status, latency, max(0.0, -delay)))
+
+                if event.path == START_PATH:
+                    if status != 200 or not payload or "session_id" not in payload:
+                        # Without a live interview the remaining answers cannot be replayed
+                        with self._lock:
+                            self._skipped += len(session.events) - i - 1
+                        return
+                    live_id = payload["session_id"]
+        finally:
+            with self._lock:
+                self._active -= 1
+
+
+def resource_usage():
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        "user_cpu_s": usage.ru_utime,
+        "system_cpu_s": usage.ru_stime,
+        "max_rss_kb": usage.ru_maxrss,
+        "voluntary_switches": usage.ru_nvcsw,
+        "involuntary_switches": usage.ru_nivcsw,
+    }
+
+
+def process_usage(pid):
+    """CPU and memory of another process on Linux, read from /proc"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Fields after the parenthesised command name; utime and stime are 14 and 15
+            fields = f.read().rsplit(")", 1)[1].split()
+        ticks = os.sysconf("SC_CLK_TCK")
+        usage = {"user_cpu_s": int(fields[11]) / ticks, "system_cpu_s": int(fields[12]) / ticks}
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    usage["max_rss_kb"] = int(line.split()[1])
+        return usage
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(samples, elapsed, session_count, peak_active, skipped, usage_before, usage_after,
+              target, speed, max_gap):
+    endpoints = {}
+    for path, status, latency, lag in samples:
+        endpoints.setdefault(path, []).append((status, latency, lag))
+
+    def stats(rows):
+        latencies = sorted(latency for _, latency, _ in rows)
+        lags = sorted(lag for _, _, lag in rows)
+        statuses = {}
+        for status, _, _ in rows:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        return {
+            "requests": len(rows),
+            "errors": sum(1 for status, _, _ in rows if status == 0 or status >= 400),
+            "statuses": statuses,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+            "lag_p99_ms": percentile(lags, 0.99) * 1000,
+        }
+
+    summary = {
+        "target": target,
+        "speed": speed,
+        "max_gap": max_gap,
+        "sessions": session_count,
+        "peak_concurrent_sessions": peak_active,
+        "skipped_requests": skipped,
+        "elapsed_s": elapsed,
+        "throughput_rps": len(samples) / elapsed if elapsed else 0.0,
+        "overall": stats([(status, latency, lag) for _, status, latency, lag in samples]),
+        "endpoints": {path: stats(rows) for path, rows in sorted(endpoints.items())},
+    }
+    if usage_before is not None and usage_after is not None:
+        summary["resources"] = {
+            "user_cpu_s": usage_after["user_cpu_s"] - usage_before["user_cpu_s"],
+            "system_cpu_s": usage_after["system_cpu_s"] - usage_before["system_cpu_s"],
+            "max_rss_kb": usage_after["max_rss_kb"],
+            "voluntary_switches": usage_after["voluntary_switches"] - usage_before["voluntary_switches"],
+            "involuntary_switches": usage_after["involuntary_switches"] - usage_before["involuntary_switches"],
+        }
+    return summary
+
+
+def print_summary(summary, baseline=None):
+    print(f"Replayed {summary['sessions']} sessions against {summary['target']} at {summary['speed']}x "
+          f"in {summary['elapsed_s']:.1f} s ({summary['throughput_rps']:.1f} req/s, "
+          f"peak {summary['peak_concurrent_sessions']} concurrent sessions)")
+    if summary["skipped_requests"]:
+        print(f"Skipped {summary['skipped_requests']} requests of sessions whose start failed")
+
+    print(f"{'endpoint':40} {'reqs':>6} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'max ms':>8} {'lag p99':>8}")
+    rows = list(summary["endpoints"].items()) + [("all", summary["overall"])]
+    for path, row in rows:
+        line = (f"{path:40} {row['requests']:>6} {row['errors']:>6} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} "
+                f"{row['p99_ms']:>8.2f} {row['max_ms']:>8.2f} {row['lag_p99_ms']:>8.2f}")
+        before = (baseline or {}).get("endpoints", {}).get(path) if path != "all" else (baseline or {}).get("overall")
+        if before and before["p99_ms"]:
+            line += f"  p99 {(row['p99_ms'] / before['p99_ms'] - 1) * 100:+.1f}% vs baseline"
+        print(line)
+
+    replayer_label = "Replayer and server process" if summary["target"] == "in-process" else "Replayer process"
+    for label, key in ((replayer_label, "resources"), ("Server process", "server_resources")):
+        usage = summary.get(key)
+        if usage:
+            line = (f"{label}: {usage['user_cpu_s']:.2f} s user, {usage['system_cpu_s']:.2f} s system CPU, "
+                    f"peak RSS {usage.get('max_rss_kb', 0) / 1024:.1f} MB")
+            if "voluntary_switches" in usage:
+                line += (f", {usage['voluntary_switches']} voluntary / "
+                         f"{usage['involuntary_switches']} involuntary context switches")
+            print(line)
+
+
+def in_process_target(workdir):
+    """Import server.py with its state in a scratch directory and rate limiting off"""
+    os.environ["SESSIONS_DIR"] = os.path.join(workdir, "sessions")
+    os.environ["RECORDS_DIR"] = os.path.join(workdir, "records")
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    os.environ.setdefault("PRELOAD_STATIC_ASSETS", "0")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    # Legacy record files are resolved against the working directory; keep replays out of the real ones
+    os.chdir(workdir)
+    import server
+    return InProcessTarget(server.app)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay recorded interview sessions against the server and report latency and resource use"
+    )
+    parser.add_argument("--target", default=None,
+                        help="base URL of a running server; by default server.py is loaded in this process")
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression factor, e.g. 60 replays an hour in a minute")
+    parser.add_argument("--max-gap", type=float, default=None, help="cap idle stretches of the timeline at this many seconds")
+    parser.add_argument("--default-gap", type=float, default=30.0,
+                        help="seconds between answers when the recording has no timestamps")
+    parser.add_argument("--limit", type=int, default=None, help="replay only the first N sessions")
+    parser.add_argument("--server-pid", type=int, default=None, help="report CPU and memory of this server process")
+    parser.add_argument("--json", default=None, help="write the summary to this file")
+    parser.add_argument("--baseline", default=None, help="summary JSON of an earlier run to compare p99 against")
+    parser.add_argument("--show-server-output", action="store_true", help="keep in-process server logging")
+    args = parser.parse_args()
+
+    # The corpus is read from SESSIONS_DIR and RECORDS_DIR before an in-process server repoints them
+    sessions = load_corpus(session_storage.sessions_store_from_environment(),
+                           session_storage.records_store_from_environment(),
+                           default_gap=args.default_gap)
+    if args.limit is not None:
+        sessions = sessions[:args.limit]
+    if not sessions:
+        print("No recorded sessions found")
+        sys.exit(1)
+    print(f"Loaded {len(sessions)} sessions with {sum(len(s.events) for s in sessions)} requests")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    if args.target:
+        target = HTTPTarget(args.target)
+    else:
+        target = in_process_target(tempfile.mkdtemp(prefix="session_replay_"))
+
+    server_before = process_usage(args.server_pid) if args.server_pid else None
+    replayer = Replayer(target, speed=args.speed, max_gap=args.max_gap)
+    if args.show_server_output or args.target:
+        summary = replayer.run(sessions)
+    else:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            summary = replayer.run(sessions)
+    if server_before is not None:
+        server_after = process_usage(args.server_pid)
+        if server_after is not None:
+            summary["server_resources"] = {
+                "user_cpu_s": server_after["user_cpu_s"] - server_before["user_cpu_s"],
+                "system_cpu_s": server_after["system_cpu_s"] - server_before["system_cpu_s"],
+                "max_rss_kb": server_after.get("max_rss_kb", 0),
+            }
+
+    print_summary(summary, baseline)
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(summary, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import quote, unquote
+
+try:
+    import fcntl
+except ImportError:  # Windows: updates are only serialised within one process
+    fcntl = None
+
+from session_archive import SessionArchive
+
+# Session IDs start with their creation date (20250412_171906, 20250412234717-1400)
+DATED_KEY = re.compile(r"^(\d{4})(\d{2})\d{2}")
+
+DEFAULT_MAX_FILES_PER_DIR = 10000
+# Hash levels a full shard directory may overflow into
+MAX_OVERFLOW_DEPTH = 2
+LOCK_STRIPES = 64
+
+
+class ShardedJSONStore:
+    """JSON documents spread over date partitions and hash-prefix directories
+
+    A key maps to <root>/<yyyy>/<mm>/<h0h1>/<prefix><key>.json, where
+    the date comes from the key and the hex prefix from a hash of it, so a
+    lookup never lists a directory and no directory grows without bound.
+    A new file whose shard directory already holds `max_files_per_dir`
+    files goes one hash level deeper instead, up to MAX_OVERFLOW_DEPTH
+    levels, so reads look there after the usual path. Files written by
+    the old flat layout are still read until migrated.
+
+    update() and archive_document() hold a lock per key stripe, taken
+    with flock on a file under <root>/.locks as well, so worker
+    processes sharing the tree do not lose each other's changes.
+
+    With an `archive`, finished documents move out of the tree into it
+    (archive_document, archive_idle) and are read back from it when no
+    file exists. Updating an archived document brings it back as a file.
+    """
+
+    def __init__(self, root, filename_prefix="", depth=1, width=2, date_partition=True, legacy_dir=None,
+                 archive=None, max_files_per_dir=DEFAULT_MAX_FILES_PER_DIR):
+        self.root = root
+        self.filename_prefix = filename_prefix
+        self.depth = depth
+        self.width = width
+        self.date_partition = date_partition
+        self.legacy_dir = legacy_dir
+        self.archive = archive
+        self.max_files_per_dir = max_files_per_dir
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        # Files per shard directory, counted once and then kept up to date by this process's writes
+        self._file_counts = {}
+
+    def filename(self, key):
+        return f"{self.filename_prefix}{quote(key, safe='')}.json"
+
+    def key_from_filename(self, filename):
+        if not (filename.startswith(self.filename_prefix) and filename.endswith(".json")):
+            return None
+        return unquote(filename[len(self.filename_prefix):-len(".json")])
+
+    def path_for(self, key, overflow=0):
+        digest = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+        parts = [self.root]
+        if self.date_partition:
+            match = DATED_KEY.match(key)
+            parts.extend(match.groups() if match else ("undated",))
+        parts.extend(digest[i * self.width:(i + 1) * self.width] for i in range(self.depth + overflow))
+        parts.append(self.filename(key))
+        return os.path.join(*parts)
+
+    def _shard_paths(self, key):
+        """The key's path at its own depth, then in each overflow level"""
+        return [self.path_for(key, overflow) for overflow in range(MAX_OVERFLOW_DEPTH + 1)]
+
+    def _files_in(self, directory):
+        count = self._file_counts.get(directory)
+        if count is None:
+            try:
+                with os.scandir(directory) as entries:
+                    count = sum(1 for entry in entries if entry.is_file())
+            except FileNotFoundError:
+                count = 0
+            self._file_counts[directory] = count
+        return count
+
+    def _write_path(self, key):
+        """The key's existing shard file, else the shallowest level with room for one more"""
+        paths = self._shard_paths(key)
+        for path in paths:
+            if os.path.exists(path):
+                return path
+        for path in paths:
+            if self._files_in(os.path.dirname(path)) < self.max_files_per_dir:
+                return path
+        return paths[-1]
+
+    def _stripe(self, key):
+        # Stable across processes, unlike hash()
+        return hashlib.blake2b(key.encode(), digest_size=2).digest()[0] % LOCK_STRIPES
+
+    @contextmanager
+    def _locked(self, key):
+        """Hold the key's stripe lock in this process and, where flock exists, across processes"""
+        stripe = self._stripe(key)
+        with self._locks[stripe]:
+            if fcntl is None:
+                yield
+                return
+            directory = os.path.join(self.root, ".locks")
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, f"{stripe:02d}"), "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def legacy_path(self, key):
+        if self.legacy_dir is None:
+            return None
+        return os.path.join(self.legacy_dir, self.filename(key))
+
+    def _existing_path(self, key):
+        for path in self._shard_paths(key):
+            if os.path.exists(path):
+                return path
+        legacy = self.legacy_path(key)
+        if legacy is not None and os.path.exists(legacy):
+            return legacy
+        return None
+
+    def exists(self, key):
+        if self._existing_path(key) is not None:
+            return True
+        return self.archive is not None and key in self.archive
+
+    def read(self, key):
+        """Return the stored document, or None if there is none"""
+        path = self._existing_path(key)
+        if path is None:
+            return self.archive.get(key) if self.archive is not None else None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def write(self, key, document, indent=None):
+        """Atomically replace the document, returning the path it was written to"""
+        path = self._write_path(key)
+        created = not os.path.exists(path)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(document, f, indent=indent)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if created:
+            self._file_counts[directory] = self._files_in(directory) + 1
+        # The sharded copy now supersedes any file left in the flat layout
+        legacy = self.legacy_path(key)
+        if legacy is not None and os.path.exists(legacy):
+            os.remove(legacy)
+        return path
+
+    def update(self, key, mutate, default=None, indent=None):
+        """Read-modify-write a document under the key's stripe lock
+
+        If the document does not exist it starts from default(), or the
+        update is skipped when no default is given. Returns the document
+        written, or None if skipped.
+        """
+        with self._locked(key):
+            document = self.read(key)
+            if document is None:
+                if default is None:
+                    return None
+                document = default()
+            mutate(document)
+            self.write(key, document, indent=indent)
+            return document
+
+    def delete(self, key):
+        self._delete_files(key)
+        if self.archive is not None:
+            self.archive.delete(key)
+
+    def _delete_files(self, key):
+        for path in self._shard_paths(key) + [self.legacy_path(key)]:
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+                directory = os.path.dirname(path)
+                if directory in self._file_counts:
+                    self._file_counts[directory] -= 1
+
+    def archive_document(self, key, document=None):
+        """Move a finished document into the archive, from its file unless the document is given
+
+        Returns the archived size in bytes, or None if there is no archive or nothing to move.
+        """
+        if self.archive is None:
+            return None
+        with self._locked(key):
+            if document is None:
+                path = self._existing_path(key)
+                if path is None:
+                    return None
+                with open(path, 'r') as f:
+                    document = json.load(f)
+            size = self.archive.put(key, document)
+            self._delete_files(key)
+            return size
+
+    def archive_idle(self, max_age, now=None):
+        """Archive every file not written for max_age seconds; returns how many were moved"""
+        cutoff = (now or time.time()) - max_age
+        moved = 0
+        for key in list(self.keys(include_archived=False)):
+            path = self._existing_path(key)
+            try:
+                if path is None or os.path.getmtime(path) >= cutoff:
+                    continue
+                if self.archive_document(key) is not None:
+                    moved += 1
+            except (OSError, ValueError) as e:
+                print(f"Error archiving {key}: {str(e)}")
+        return moved
+
+    def keys(self, include_archived=True):
+        """Yield every stored key, sharded, legacy and archived"""
+        seen = set()
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                key = self.key_from_filename(filename)
+                if key is not None and key not in seen:
+                    seen.add(key)
+                    yield key
+        for key in self.legacy_keys():
+            if key not in seen:
+                seen.add(key)
+                yield key
+        if include_archived and self.archive is not None:
+            for key in self.archive.keys():
+                if key not in seen:
+                    yield key
+
+    def legacy_keys(self):
+        if self.legacy_dir is None or not os.path.isdir(self.legacy_dir):
+            return
+        with os.scandir(self.legacy_dir) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    key = self.key_from_filename(entry.name)
+                    if key is not None:
+                        yield key
+
+    def migrate(self, dry_run=False):
+        """Move flat-layout files into their shards while the server keeps running
+
+        Reads fall back to the flat file and writes always land in the
+        shard, so a shard that already exists is newer and the flat copy
+        is dropped; otherwise the flat file is renamed into place.
+        """
+        moved = dropped = 0
+        for key in list(self.legacy_keys()):
+            legacy = self.legacy_path(key)
+            target = self._write_path(key)
+            if os.path.exists(target):
+                dropped += 1
+                if not dry_run:
+                    os.remove(legacy)
+                continue
+            moved += 1
+            if not dry_run:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.rename(legacy, target)
+                self._file_counts[os.path.dirname(target)] = self._files_in(os.path.dirname(target)) + 1
+        return moved, dropped
+
+    def directory_fanout(self):
+        """Return (largest, total files, directories) over the sharded tree"""
+        largest = total = directories = 0
+        for _, _, filenames in os.walk(self.root):
+            largest = max(largest, len(filenames))
+            total += len(filenames)
+            directories += 1
+        return largest, total, directories
+
+
+def shard_depth():
+    # 256 hash directories per month hold ~2.5M sessions a month under the default cap
+    return int(os.environ.get('SESSION_SHARD_DEPTH', '1'))
+
+
+def max_files_per_dir():
+    return int(os.environ.get('SESSION_MAX_FILES_PER_DIR', str(DEFAULT_MAX_FILES_PER_DIR)))
+
+
+def archive_from_environment(name):
+    """Archive tier for one store under ARCHIVE_DIR, or None when SESSION_ARCHIVE=0"""
+    if os.environ.get('SESSION_ARCHIVE', '1') != '1':
+        return None
+    archive_dir = os.environ.get('ARCHIVE_DIR', os.path.join(os.environ.get('SESSIONS_DIR', 'sessions'), 'archive'))
+    # Archived records are kept forever unless ARCHIVE_RETENTION_DAYS is set
+    retention_days = float(os.environ.get('ARCHIVE_RETENTION_DAYS', '0'))
+    return SessionArchive(os.path.join(archive_dir, name), codec=os.environ.get('ARCHIVE_CODEC') or None,
+                          segment_bytes=int(float(os.environ.get('ARCHIVE_SEGMENT_MB', '64')) * 1024 * 1024),
+                          retention=retention_days * 86400 or None)
+
+
+def sessions_store_from_environment():
+    """Store for per-session anti-cheating files, in SESSIONS_DIR"""
+    sessions_dir = os.environ.get('SESSIONS_DIR', 'sessions')
+    return ShardedJSONStore(os.path.join(sessions_dir, 'shards'), depth=shard_depth(), legacy_dir=sessions_dir,
+                            archive=archive_from_environment('sessions'), max_files_per_dir=max_files_per_dir())
+
+
+def records_store_from_environment():
+    """Store for saved interview records, in RECORDS_DIR"""
+    return ShardedJSONStore(os.environ.get('RECORDS_DIR', 'interview_records'), filename_prefix='interview_record_',
+                            depth=shard_depth(), legacy_dir='.', archive=archive_from_environment('records'),
+                            max_files_per_dir=max_files_per_dir())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the sharded session file layout and its archive")
+    parser.add_argument("command", choices=["migrate", "check", "archive", "gc"])
+    parser.add_argument("--dry-run", action="store_true", help="report what migrate would move")
+    parser.add_argument("--max-files-per-dir", type=int, default=max_files_per_dir())
+    parser.add_argument("--idle-hours", type=float, default=float(os.environ.get('ARCHIVE_IDLE_HOURS', '24')),
+                        help="archive files not written for this long")
+    args = parser.parse_args()
+
+    failed = False
+    for name, store in (("sessions", sessions_store_from_environment()),
+                        ("records", records_store_from_environment())):
+        if args.command == "migrate":
+            moved, dropped = store.migrate(dry_run=args.dry_run)
+            print(f"{name}: moved {moved}, dropped {dropped} superseded flat files into {store.root}")
+        if args.command in ("archive", "gc") and store.archive is None:
+            print(f"{name}: archiving is off (SESSION_ARCHIVE=0)")
+            continue
+        if args.command == "archive":
+            moved = store.archive_idle(args.idle_hours * 3600)
+            print(f"{name}: archived {moved} files idle for {args.idle_hours:g} hours")
+        if args.command == "gc":
+            expired, rewritten, freed = store.archive.gc()
+            print(f"{name}: expired {expired} archived records, rewrote {rewritten} segments, freed {freed} bytes")
+        if store.archive is not None:
+            print(f"{name}: archive {store.archive.stats()}")
+        largest, total, directories = store.directory_fanout()
+        print(f"{name}: {total} files in {directories} directories, largest directory holds {largest} files")
+        if largest > args.max_files_per_dir:
+            print(f"{name}: over the {args.max_files_per_dir} files per directory cap; increase the shard depth "
+                  "or SESSION_MAX_FILES_PER_DIR")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
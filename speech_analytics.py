@@ -0,0 +1,129 @@
+import re
+
+import numpy as np
+
+# Hesitations and verbal tics; plain "so" and "like" are left out as they are usually real words
+FILLERS = re.compile(
+    r"\b(?:u+m+|u+h+|erm|er|a+h+|hm+|basically|literally|actually|you know|i mean|sort of|kind of)\b",
+    re.IGNORECASE
+)
+WORD = re.compile(r"[A-Za-z0-9']+")
+
+# Upper edges of the pause-length histogram bins, in seconds; the last bin is open-ended
+PAUSE_BINS = (0.5, 1.0, 2.0, 4.0)
+
+
+class DeliveryAnalyzer:
+    """Delivery metrics for one spoken answer, folded in frame by frame
+
+    Frames are cut into `window_ms` analysis windows and each window's
+    loudness is computed in one vectorised pass per frame. Only running
+    totals are kept: counts, the loudness mean and variance (merged with
+    Chan's parallel update), the index of the last voiced window, a pause
+    histogram and the few samples left over from the last frame. Memory
+    stays the same however long the answer runs.
+
+    A window is voiced when it is louder than `silence_db` dBFS, and a
+    silence of at least `min_pause` seconds between voiced windows counts
+    as a pause. Word-based metrics come from the transcript, once the
+    answer is over.
+    """
+
+    def __init__(self, rate=16000, window_ms=20, silence_db=-40.0, min_pause=0.25):
+        self.rate = rate
+        self.window = max(1, rate * window_ms // 1000)
+        self.window_seconds = self.window / rate
+        self.silence_db = silence_db
+        self.min_pause_windows = int(np.ceil(min_pause / self.window_seconds))
+        self._carry = np.zeros(0, dtype=np.float32)
+        self._windows = 0
+        self._voiced = 0
+        self._first_voiced = None
+        self._last_voiced = None
+        self._loudness_mean = 0.0
+        self._loudness_m2 = 0.0
+        self._pause_edges = np.array([edge / self.window_seconds for edge in PAUSE_BINS])
+        self._pause_histogram = np.zeros(len(PAUSE_BINS) + 1, dtype=np.int64)
+        self._pause_windows = 0
+        self._longest_pause = 0
+
+    def feed(self, frame):
+        """Add captured audio: float32 PCM bytes as PyAudio delivers them, or an array of samples"""
+        if isinstance(frame, (bytes, bytearray, memoryview)):
+            samples = np.frombuffer(frame, dtype=np.float32)
+        else:
+            samples = np.asarray(frame, dtype=np.float32)
+        if self._carry.size:
+            samples = np.concatenate((self._carry, samples))
+        count = samples.size // self.window
+        self._carry = samples[count * self.window:].copy()
+        if count == 0:
+            return
+
+        windows = samples[:count * self.window].reshape(count, self.window)
+        power = np.einsum("ij,ij->i", windows, windows) / self.window
+        loudness = 10.0 * np.log10(power + 1e-12)
+        voiced_at = np.flatnonzero(loudness > self.silence_db)
+        self._fold_loudness(loudness[voiced_at])
+
+        if voiced_at.size:
+            voiced_at += self._windows
+            if self._first_voiced is None:
+                self._first_voiced = int(voiced_at[0])
+            else:
+                # A silence that began in an earlier frame ends at this frame's first voiced window
+                voiced_at = np.concatenate(([self._last_voiced], voiced_at))
+            self._fold_pauses(np.diff(voiced_at) - 1)
+            self._last_voiced = int(voiced_at[-1])
+        self._windows += count
+
+    def _fold_loudness(self, values):
+        count = values.size
+        if not count:
+            return
+        mean = float(values.mean())
+        m2 = float(np.square(values - mean).sum())
+        total = self._voiced + count
+        delta = mean - self._loudness_mean
+        self._loudness_mean += delta * count / total
+        self._loudness_m2 += m2 + delta * delta * self._voiced * count / total
+        self._voiced = total
+
+    def _fold_pauses(self, gaps):
+        pauses = gaps[gaps >= self.min_pause_windows]
+        if not pauses.size:
+            return
+        self._pause_histogram += np.bincount(np.searchsorted(self._pause_edges, pauses, side="right"),
+                                             minlength=self._pause_histogram.size)
+        self._pause_windows += int(pauses.sum())
+        self._longest_pause = max(self._longest_pause, int(pauses.max()))
+
+    def finish(self, transcript=""):
+        """The metrics for the answer so far, given what the candidate was heard to say"""
+        seconds = self.window_seconds
+        speaking = (self._last_voiced - self._first_voiced + 1) * seconds if self._first_voiced is not None else 0.0
+        minutes = speaking / 60
+        words = len(WORD.findall(transcript))
+        fillers = len(FILLERS.findall(transcript))
+        pauses = int(self._pause_histogram.sum())
+
+        labels = [f"<{PAUSE_BINS[0]:g}s"] + [f"{low:g}-{high:g}s" for low, high in zip(PAUSE_BINS, PAUSE_BINS[1:])] + \
+            [f"{PAUSE_BINS[-1]:g}s+"]
+        return {
+            "duration_s": round(self._windows * seconds, 2),
+            "speaking_s": round(speaking, 2),
+            "voiced_s": round(self._voiced * seconds, 2),
+            "words": words,
+            "words_per_minute": round(words / minutes, 1) if minutes else None,
+            "filler_words": fillers,
+            "fillers_per_minute": round(fillers / minutes, 2) if minutes else None,
+            "filler_ratio": round(fillers / words, 3) if words else 0.0,
+            "pauses": {
+                "count": pauses,
+                "mean_s": round(self._pause_windows * seconds / pauses, 2) if pauses else 0.0,
+                "longest_s": round(self._longest_pause * seconds, 2),
+                "histogram": dict(zip(labels, self._pause_histogram.tolist()))
+            },
+            "loudness_db_mean": round(self._loudness_mean, 1) if self._voiced else None,
+            "loudness_db_variance": round(self._loudness_m2 / self._voiced, 2) if self._voiced else None
+        }
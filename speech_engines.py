@@ -0,0 +1,76 @@
+import os
+import threading
+
+# No audio stack at all: questions are printed instead of spoken and answers are typed
+HEADLESS = os.environ.get("INTERVIEW_HEADLESS", "0") == "1"
+
+
+class SpeechEngines:
+    """Text-to-speech, speech recognition and microphone capture, loaded on first use
+
+    The audio libraries are slow to import and fail outright on hosts
+    without sound devices, so nothing is imported or initialised until
+    something is first said or heard. In headless mode, or once loading
+    has failed, speech is printed and there is no voice input.
+    """
+
+    def __init__(self, headless=None):
+        self.headless = HEADLESS if headless is None else headless
+        self._tts = None
+        self._recognition = None
+        self._lock = threading.Lock()
+
+    def _go_headless(self, what, error):
+        print(f"Audio unavailable ({what}: {str(error)}); continuing without audio")
+        self.headless = True
+
+    def tts(self):
+        """The pyttsx3 engine, or None without audio"""
+        if self._tts is None and not self.headless:
+            with self._lock:
+                if self._tts is None and not self.headless:
+                    try:
+                        import pyttsx3
+                        self._tts = pyttsx3.init()
+                    except Exception as e:
+                        self._go_headless("text-to-speech", e)
+        return self._tts
+
+    def recognition(self):
+        """The speech_recognition module and a Recognizer, or None without audio"""
+        if self._recognition is None and not self.headless:
+            with self._lock:
+                if self._recognition is None and not self.headless:
+                    try:
+                        import speech_recognition
+                        self._recognition = (speech_recognition, speech_recognition.Recognizer())
+                    except Exception as e:
+                        self._go_headless("speech recognition", e)
+        return self._recognition
+
+    def speak(self, text):
+        engine = self.tts()
+        if engine is None:
+            print(f"[speech] {text}")
+            return
+        engine.say(text)
+        engine.runAndWait()
+
+    def open_microphone(self, format_name, channels, rate, frames_per_buffer):
+        """A PyAudio input stream and its PyAudio instance, or None without audio"""
+        if self.headless:
+            return None
+        try:
+            import pyaudio
+            audio = pyaudio.PyAudio()
+        except Exception as e:
+            self._go_headless("microphone", e)
+            return None
+        try:
+            stream = audio.open(format=getattr(pyaudio, format_name), channels=channels, rate=rate,
+                                input=True, frames_per_buffer=frames_per_buffer)
+        except Exception as e:
+            audio.terminate()
+            self._go_headless("microphone", e)
+            return None
+        return stream, audio
@@ -16,6 +16,7 @@ class AntiCheatingSystem {
     this.warningCount = 0;
     this.maxWarnings = 3;
     this.interviewTerminated = false;
+    this.streaming = false; // Whether an event stream is open; see subscribeToServerEvents
 
     // Bind methods
     this.initializeAntiCheating = this.initializeAntiCheating.bind(this);
@@ -25,6 +26,7 @@ class AntiCheatingSystem {
     this.preventCopyPaste = this.preventCopyPaste.bind(this);
     this.reportViolation = this.reportViolation.bind(this);
     this.terminateInterview = this.terminateInterview.bind(this);
+    this.applyServerDecision = this.applyServerDecision.bind(this);
   }
 
   /**
@@ -149,6 +151,7 @@ class AntiCheatingSystem {
         this.isCameraActive = newStatus;
         this.interviewServer
           .update_camera_status(newStatus)
+          .then(this.applyServerDecision)
           .catch((error) =>
             console.error("Error updating camera status:", error)
           );
@@ -184,6 +187,7 @@ class AntiCheatingSystem {
         this.isMicrophoneActive = newStatus;
         this.interviewServer
           .update_microphone_status(newStatus)
+          .then(this.applyServerDecision)
           .catch((error) =>
             console.error("Error updating microphone status:", error)
           );
@@ -212,6 +216,7 @@ class AntiCheatingSystem {
       this.isTabFocused = false;
       this.interviewServer
         .update_tab_focus(false)
+        .then(this.applyServerDecision)
         .catch((error) => console.error("Error updating tab focus:", error));
 
       this.reportViolation("Tab switching detected", "tab_switch");
@@ -237,6 +242,7 @@ class AntiCheatingSystem {
         this.isTabFocused = false;
         this.interviewServer
           .update_tab_focus(false)
+          .then(this.applyServerDecision)
           .catch((error) => console.error("Error updating tab focus:", error));
 
         this.reportViolation(
@@ -264,6 +270,7 @@ class AntiCheatingSystem {
       this.reportViolation("Copy attempt detected", "copy_paste");
       this.interviewServer
         .report_copy_paste_attempt()
+        .then(this.applyServerDecision)
         .catch((error) =>
           console.error("Error reporting copy attempt:", error)
         );
@@ -277,6 +284,7 @@ class AntiCheatingSystem {
       this.reportViolation("Paste attempt detected", "copy_paste");
       this.interviewServer
         .report_copy_paste_attempt()
+        .then(this.applyServerDecision)
         .catch((error) =>
           console.error("Error reporting paste attempt:", error)
         );
@@ -306,6 +314,7 @@ class AntiCheatingSystem {
         );
         this.interviewServer
           .report_copy_paste_attempt()
+          .then(this.applyServerDecision)
           .catch((error) =>
             console.error("Error reporting copy/paste attempt:", error)
           );
@@ -358,10 +367,54 @@ class AntiCheatingSystem {
       }, 500);
     }, 5000);
 
-    // Check if max warnings reached
-    if (this.warningCount >= this.maxWarnings) {
+    // Termination is decided by the server's violation rules, see applyServerDecision
+  }
+
+  /**
+   * Listen on the session's server-sent event stream so termination
+   * decided by the server arrives without polling. eventsToken is the
+   * one start_interview returned; handlers maps other event types
+   * (feedback, next_question) to callbacks taking the event. A server at
+   * its stream limit answers 204 and the stream closes for good, leaving
+   * streaming false so the page polls instead.
+   */
+  subscribeToServerEvents(sessionId, eventsToken, handlers = {}) {
+    if (!window.EventSource || !sessionId || !eventsToken) return;
+    if (this.eventSource) this.eventSource.close();
+    this.streaming = false;
+
+    this.eventSource = new EventSource(
+      `/api/sessions/${sessionId}/events?token=${encodeURIComponent(eventsToken)}`
+    );
+    this.eventSource.addEventListener("open", () => {
+      this.streaming = true;
+    });
+    this.eventSource.addEventListener("error", () => {
+      // A reconnecting stream is CONNECTING; a refused one is CLOSED
+      if (this.eventSource.readyState === EventSource.CLOSED) {
+        this.streaming = false;
+      }
+    });
+    this.eventSource.addEventListener("terminated", () => {
+      this.eventSource.close();
+      this.streaming = false;
+      this.terminateInterview();
+    });
+    Object.entries(handlers).forEach(([type, handler]) => {
+      this.eventSource.addEventListener(type, (message) => {
+        handler(JSON.parse(message.data));
+      });
+    });
+  }
+
+  /**
+   * Terminate the interview when the server reports that its rules tripped
+   */
+  applyServerDecision(result) {
+    if (result && result.terminated) {
       this.terminateInterview();
     }
+    return result;
   }
 
   /**
@@ -448,6 +501,9 @@ class AntiCheatingSystem {
       this.mediaStream.getTracks().forEach((track) => track.stop());
     }
 
+    // Close the server event stream
+    if (this.eventSource) this.eventSource.close();
+
     console.log("Anti-cheating system cleaned up");
   }
 }
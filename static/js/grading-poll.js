@@ -0,0 +1,29 @@
+/**
+ * Grading job polling for PrepMate
+ * With GRADING_QUEUE on, feedback arrives after the answer is accepted,
+ * pushed over the session's event stream. A page without a stream (the
+ * server serves a limited number at once and turns the rest away) polls
+ * the job instead.
+ */
+
+async function pollGradingJob(sessionId, jobId, onFeedback, { interval = 2000, attempts = 60 } = {}) {
+  if (!sessionId || !jobId) return;
+  for (let attempt = 0; attempt < attempts; attempt++) {
+    await new Promise((resolve) => setTimeout(resolve, interval));
+    try {
+      const res = await fetch(
+        `/api/grading/${jobId}?session_id=${encodeURIComponent(sessionId)}`
+      );
+      if (!res.ok) return;
+      const job = await res.json();
+      if (job.state === "done" || job.state === "failed") {
+        if (job.feedback) onFeedback(job.feedback);
+        return;
+      }
+    } catch (error) {
+      console.error("Error polling grading job:", error);
+    }
+  }
+}
+
+window.pollGradingJob = pollGradingJob;
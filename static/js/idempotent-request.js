@@ -0,0 +1,46 @@
+/**
+ * Idempotent requests for PrepMate
+ * Sends one Idempotency-Key per logical submit and reuses it on every
+ * retry, so a retried answer or violation report is recorded once and the
+ * server replays the first response instead of processing it again.
+ */
+
+function newIdempotencyKey() {
+  if (window.crypto && window.crypto.randomUUID) {
+    return window.crypto.randomUUID();
+  }
+  const bytes = new Uint8Array(16);
+  window.crypto.getRandomValues(bytes);
+  return Array.from(bytes, (b) => b.toString(16).padStart(2, "0")).join("");
+}
+
+// 409 means the first attempt with this key is still running on the server
+function isRetryableStatus(status) {
+  return status === 409 || status === 429 || status >= 500;
+}
+
+/**
+ * Run send(key) with a fresh key, retrying network errors and retryable
+ * statuses with the same key. send may return a fetch Response or an axios
+ * response, or throw an axios error.
+ */
+async function idempotentRequest(send, { attempts = 3, delay = 500 } = {}) {
+  const key = newIdempotencyKey();
+  for (let attempt = 1; ; attempt++) {
+    try {
+      const response = await send(key);
+      if (attempt >= attempts || !isRetryableStatus(response.status)) {
+        return response;
+      }
+    } catch (error) {
+      const status = error.response && error.response.status;
+      if (attempt >= attempts || (status && !isRetryableStatus(status))) {
+        throw error;
+      }
+    }
+    await new Promise((resolve) => setTimeout(resolve, delay * attempt));
+  }
+}
+
+window.newIdempotencyKey = newIdempotencyKey;
+window.idempotentRequest = idempotentRequest;
@@ -0,0 +1,48 @@
+import os
+
+from session_archive import SessionArchive
+
+# Ten of the small records below fill a segment, so the next frame opens another
+SEGMENT_BYTES = 370
+
+
+def open_archive(root):
+    return SessionArchive(str(root), codec="deflate", segment_bytes=SEGMENT_BYTES)
+
+
+def segments(archive):
+    return archive._connect().execute("SELECT segment FROM segments ORDER BY segment").fetchall()
+
+
+def delete_into_own_segment(archive, key):
+    """Leave the key's tombstone alone in a sealed segment, behind the sealed segment holding its frame"""
+    for i in range(10):
+        archive.put(f"k{i}", {"answer": "x" * 100, "i": i})
+    archive.delete(key)
+    # Too big to share a segment, so this seals the tombstone's segment and opens another
+    archive.put("big", {"answer": os.urandom(SEGMENT_BYTES).hex()})
+    assert segments(archive) == [(1,), (2,), (3,)]
+
+
+def test_delete_survives_compaction_and_rebuild(tmp_path):
+    archive = open_archive(tmp_path)
+    delete_into_own_segment(archive, "k0")
+    # Only the tombstone's segment is mostly dead, so the one holding k0's frame stays
+    assert archive.compact(0.5)[0] == 1
+
+    os.remove(archive.path)
+    rebuilt = open_archive(tmp_path)
+    rebuilt.rebuild_index()
+    assert "k0" not in rebuilt
+    assert rebuilt.get("k0") is None
+    assert rebuilt.get("k1") == {"answer": "x" * 100, "i": 1}
+
+
+def test_put_after_delete_survives_compaction_and_rebuild(tmp_path):
+    archive = open_archive(tmp_path)
+    delete_into_own_segment(archive, "k0")
+    archive.put("k0", {"answer": "again"})
+    archive.compact(0.5)
+
+    archive.rebuild_index()
+    assert archive.get("k0") == {"answer": "again"}
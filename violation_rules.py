@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Matches every violation type
+ANY_VIOLATION = "*"
+
+# Mirrors the browser's old behaviour (three warnings of any kind end the
+# interview) and adds tighter windows for the noisier violation types
+DEFAULT_RULES = [
+    {"name": "tab_switch_burst", "type": "tab_switch", "limit": 3, "window": 60},
+    {"name": "copy_paste_burst", "type": "copy_paste", "limit": 3, "window": 60},
+    {"name": "repeated_plagiarism", "type": "plagiarism", "limit": 2, "window": None},
+    {"name": "excessive_violations", "type": ANY_VIOLATION, "limit": 3, "window": None},
+]
+
+
+class ViolationRule:
+    """Terminate once `limit` violations of `type` land within `window` seconds
+
+    A window of None counts violations over the whole session.
+    """
+
+    __slots__ = ("name", "violation_type", "limit", "window")
+
+    def __init__(self, name, violation_type, limit, window=None):
+        if limit < 1:
+            raise ValueError(f"Rule {name} needs a limit of at least 1")
+        self.name = name
+        self.violation_type = violation_type
+        self.limit = limit
+        self.window = window
+
+    def matches(self, violation_type):
+        return self.violation_type == ANY_VIOLATION or self.violation_type == violation_type
+
+    def to_dict(self):
+        return {"name": self.name, "type": self.violation_type, "limit": self.limit, "window": self.window}
+
+
+def load_rules(source=None):
+    """Build rules from a JSON file path, a JSON string or a list of dicts or rules"""
+    if source is None:
+        source = DEFAULT_RULES
+    if isinstance(source, str):
+        if os.path.exists(source):
+            with open(source, 'r') as f:
+                source = json.load(f)
+        else:
+            source = json.loads(source)
+    return [rule if isinstance(rule, ViolationRule) else
+            ViolationRule(rule.get("name") or rule["type"], rule["type"], int(rule["limit"]), rule.get("window"))
+            for rule in source]
+
+
+class ViolationRulesEngine:
+    """Sliding-window violation counters per session that decide termination
+
+    For each rule a session keeps only the timestamps of its last `limit`
+    matching violations, in a deque bounded to that length. A rule fires
+    when the oldest of those is still inside the window, so recording an
+    event costs O(rules) regardless of how many violations came before it.
+    """
+
+    def __init__(self, rules=None, max_sessions=100000, clock=time.monotonic):
+        self.rules = load_rules(rules)
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self._sessions = OrderedDict()
+        self._terminated = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback):
+        """Call callback(session_id, rule) whenever a rule terminates a session"""
+        self._listeners.append(callback)
+
+    def record(self, session_id, violation_type):
+        """Count a violation and return the rule it tripped, if any"""
+        now = self.clock()
+        triggered = None
+        with self._lock:
+            if session_id in self._terminated:
+                return None
+
+            windows = self._sessions.get(session_id)
+            if windows is None:
+                windows = [deque(maxlen=rule.limit) for rule in self.rules]
+                self._sessions[session_id] = windows
+                if len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+
+            for rule, timestamps in zip(self.rules, windows):
+                if not rule.matches(violation_type):
+                    continue
+                timestamps.append(now)
+                if triggered is None and len(timestamps) == rule.limit and (
+                        rule.window is None or now - timestamps[0] <= rule.window):
+                    triggered = rule
+
+            if triggered is not None:
+                self._mark_terminated(session_id, triggered.name)
+
+        if triggered is not None:
+            for listener in self._listeners:
+                try:
+                    listener(session_id, triggered)
+                except Exception as e:
+                    print(f"Error in termination listener: {str(e)}")
+        return triggered
+
+    def terminate(self, session_id, reason):
+        """Mark a session terminated for a reason decided outside the rules"""
+        with self._lock:
+            self._mark_terminated(session_id, reason)
+
+    def _mark_terminated(self, session_id, reason):
+        self._sessions.pop(session_id, None)
+        self._terminated[session_id] = reason
+        if len(self._terminated) > self.max_sessions:
+            self._terminated.pop(next(iter(self._terminated)))
+
+    def termination_reason(self, session_id):
+        """Return why a session was terminated, or None if it is still running"""
+        return self._terminated.get(session_id)
+
+    def is_terminated(self, session_id):
+        return session_id in self._terminated
+
+    def forget(self, session_id):
+        """Drop the counters of a finished session"""
+        with self._lock:
+            self._sessions.pop(session_id, None)